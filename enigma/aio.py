@@ -0,0 +1,223 @@
+"""Encryption for asyncio programs
+
+The machine encrypts a message in one go, so encrypting a large message
+in a coroutine stalls the event loop until it is done.  The helpers here
+encrypt text in the output format of StreamEncryptor one bounded piece at
+a time, and let the loop run between pieces: small pieces are encrypted
+in the loop's thread, larger ones in an executor (the loop's default one
+unless given).  Streams are read from an asyncio.StreamReader only as
+fast as the encrypted pieces are consumed, or written to a StreamWriter
+(waiting for it to drain), so a slow peer holds the reading back.
+
+Encryption honours cancellation and deadlines between pieces.  A piece
+already handed to the executor cannot be stopped: it is finished before
+the cancellation (or timeout) is raised, so that the machine is never
+used by two threads at once.  The machine is then left after the last
+piece encrypted; use its snapshot() and restore() to start a message
+again.
+"""
+
+import asyncio
+from enigma import stream
+
+# characters (or bytes) encrypted per piece
+CHUNK_SIZE = stream.CHUNK_SIZE
+
+# largest piece encrypted in the loop's thread, about a millisecond
+INLINE_SIZE = 1 << 12
+
+
+class AsyncEncryptor:
+    """Encrypts text in pieces without blocking the event loop"""
+
+    def __init__(self, machine, chunk_size=CHUNK_SIZE, inline_size=INLINE_SIZE,
+                 executor=None, **options):
+        """
+        Arguments:
+
+        -machine: EnigmaMachine used to encrypt the letters
+
+        -chunk_size: most characters (or bytes) encrypted per piece
+
+        -inline_size: pieces up to this size are encrypted in the loop's
+        thread, larger ones in the executor
+
+        -executor: concurrent.futures executor of large pieces (the loop's
+        default executor if None)
+
+        -options: formatting options, see StreamEncryptor
+        """
+
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.__encryptor = stream.StreamEncryptor(machine, **options)
+        self.__chunkSize = chunk_size
+        self.__inlineSize = inline_size
+        self.__executor = executor
+        self.__lock = None
+
+    async def encrypt(self, text, timeout=None):
+        """encrypt the next piece of text and return it formatted
+
+        Arguments:
+
+        -text: string encrypted
+
+        -timeout: seconds after which asyncio.TimeoutError is raised
+        """
+
+        deadline = _deadline(timeout)
+        size = self.__chunkSize
+        output = []
+        async with self.__locked():
+            for start in range(0, len(text), size):
+                output.append(await self.__run(self.__encryptor.encrypt,
+                                               text[start:start + size],
+                                               deadline))
+        return "".join(output)
+
+    async def encrypt_bytes(self, data, timeout=None):
+        """encrypt the next piece of UTF-8 encoded text and return it
+        formatted (as ASCII bytes), see encrypt()
+
+        Pieces must not split multi-byte characters.
+        """
+
+        deadline = _deadline(timeout)
+        output = []
+        async with self.__locked():
+            for piece in stream.utf8_pieces(data, self.__chunkSize):
+                output.append(await self.__run(self.__encryptor.encrypt_bytes,
+                                               piece, deadline))
+        return b"".join(output)
+
+    async def encrypt_reader(self, reader, timeout=None):
+        """encrypt UTF-8 text read from a stream, yielding formatted pieces
+        (as ASCII bytes)
+
+        The reader is only read when the next piece is asked for.
+
+        Arguments:
+
+        -reader: asyncio.StreamReader, or any object with a coroutine
+        read(n) returning b"" at the end
+
+        -timeout: seconds for the whole stream after which
+        asyncio.TimeoutError is raised
+        """
+
+        deadline = _deadline(timeout)
+        tail = b""
+        async with self.__locked():
+            while True:
+                data = await _wait(reader.read(self.__chunkSize), deadline)
+                if not data:
+                    if tail:
+                        raise UnicodeDecodeError("utf-8", tail, 0, len(tail),
+                                                 "unexpected end of data")
+                    return
+
+                # a multi-byte character split by the read waits for the
+                # rest of its bytes
+                data, tail = stream.split_utf8(tail + data)
+                output = await self.__run(self.__encryptor.encrypt_bytes,
+                                          data, deadline)
+                if output:
+                    yield output
+
+    async def pipe(self, reader, writer, timeout=None):
+        """encrypt UTF-8 text from a stream reader into a stream writer,
+        waiting for the writer to drain after each piece
+
+        Arguments:
+
+        -reader: asyncio.StreamReader
+
+        -writer: asyncio.StreamWriter (not closed)
+
+        -timeout: seconds for the whole stream after which
+        asyncio.TimeoutError is raised
+
+        Returns the number of bytes written
+        """
+
+        deadline = _deadline(timeout)
+        written = 0
+        pieces = self.encrypt_reader(reader, timeout)
+        try:
+            async for output in pieces:
+                writer.write(output)
+                written += len(output)
+                await _wait(writer.drain(), deadline)
+        finally:
+            await pieces.aclose()
+        return written
+
+    def __locked(self):
+        """return the lock of the pieces, created in the running loop
+        (before Python 3.10, a lock is bound to the loop current when it is
+        created, which is not that of asyncio.run() for an encryptor created
+        beforehand)"""
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        return self.__lock
+
+    async def __run(self, function, piece, deadline):
+        """encrypt a piece, in the executor if it is large"""
+
+        if deadline is not None and _loop().time() >= deadline:
+            raise asyncio.TimeoutError()
+
+        if len(piece) <= self.__inlineSize:
+            output = function(piece)
+            await asyncio.sleep(0)
+            return output
+
+        future = _loop().run_in_executor(self.__executor, function, piece)
+        try:
+            return await _wait(asyncio.shield(future), deadline)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            await _finish(future)
+            raise
+
+
+async def encrypt(machine, text, timeout=None, **options):
+    """encrypt text without blocking the event loop, see AsyncEncryptor"""
+    return await AsyncEncryptor(machine, **options).encrypt(text, timeout)
+
+
+async def encrypt_reader(machine, reader, timeout=None, **options):
+    """encrypt UTF-8 text read from a stream, yielding formatted pieces (as
+    ASCII bytes), see AsyncEncryptor.encrypt_reader()"""
+    encryptor = AsyncEncryptor(machine, **options)
+    async for output in encryptor.encrypt_reader(reader, timeout):
+        yield output
+
+
+def _loop():
+    return asyncio.get_running_loop()
+
+
+def _deadline(timeout):
+    """return the loop time of a timeout (None for no deadline)"""
+    if timeout is None:
+        return None
+    return _loop().time() + timeout
+
+
+async def _wait(awaitable, deadline):
+    """await with a deadline (loop time, None for no deadline)"""
+    if deadline is None:
+        return await awaitable
+    return await asyncio.wait_for(awaitable, max(0.0, deadline - _loop().time()))
+
+
+async def _finish(future):
+    """wait for an executor future to finish, even if cancelled again"""
+    while not future.done():
+        try:
+            await asyncio.wait({future})
+        except asyncio.CancelledError:
+            pass
+    if not future.cancelled():
+        future.exception()
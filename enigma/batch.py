@@ -0,0 +1,191 @@
+"""Encryption of many messages with their own keys
+
+Records are JSON objects, one per line:
+
+    {"id": 7, "message": "...", "config": "User",
+     "fast": "1,5,1", "plugs": "AB,CD", "preferences": {"group": "0"}}
+
+config names a configuration (the selected one if omitted), and the
+machine settings model, fast, middle, slow, static, reflect and plugs
+(as accepted by enigma_driver.update_config) override its settings.
+preferences override the formatting preferences.  Each record gives a
+JSON line of result, in the order of the records: {"ciphertext": "..."}
+or {"error": "..."}, with the id of the record if it has one.
+
+Machines are assembled once for each configuration and settings met, and
+compiled once they have encrypted a few messages; every message starts
+from the configured rotor positions (rotor positions are never
+remembered from one record to the next).  Only the machines used last
+are kept (MAX_MACHINES by default), so records with ever new keys do not
+grow memory.
+Records are read and written in chunks, and with several jobs the chunks
+are encrypted by a pool of worker processes, each with its own machines,
+while only a few chunks are held in memory.
+"""
+
+import collections
+import json
+import multiprocessing
+from enigma import server
+from enigma import stream
+
+# records sent to a worker process at a time
+CHUNK_RECORDS = 256
+
+# chunks waiting for or being encrypted by each worker process
+CHUNKS_PER_JOB = 4
+
+# messages encrypted by a machine before it is compiled (compiling costs
+# a few milliseconds, saved after about as many short messages)
+COMPILE_AFTER = 8
+
+# machines kept by an encryptor, the least recently used are discarded
+MAX_MACHINES = 256
+
+# machine settings of a record, see enigma_driver.update_config
+SETTINGS = ("model", "fast", "middle", "slow", "static", "reflect", "plugs")
+
+# encryptor of a worker process, see _init_worker()
+_encryptor = None
+
+
+class BatchEncryptor:
+    """Encrypts records with machines kept by configuration and settings"""
+
+    def __init__(self, factory, max_machines=MAX_MACHINES):
+        """
+        Arguments:
+
+        - factory: function(config, options) assembling a machine, where
+        config is a configuration name (None for the selected one) and
+        options a dict of machine settings; returns the EnigmaMachine, a
+        dict of preferences and the name of the configuration
+
+        - max_machines: number of machines kept, the least recently used
+        are discarded (and assembled again if needed)
+        """
+
+        self.__factory = factory
+        self.__maxMachines = max(1, max_machines)
+        self.__machines = collections.OrderedDict()
+        self.__uses = collections.Counter()
+
+    def encrypt(self, record):
+        """return the result (a dict) of a record (a dict)"""
+
+        try:
+            result = self.__encrypt(record)
+        except Exception as error:
+            result = {"error": str(error) or type(error).__name__}
+
+        if "id" in record:
+            result = dict(id=record["id"], **result)
+        return result
+
+    def encrypt_line(self, line):
+        """return the JSON result of a JSON record"""
+
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("record must be a JSON object")
+        except ValueError as error:
+            return json.dumps({"error": "Invalid record: %s" % error})
+        return json.dumps(self.encrypt(record))
+
+    def __encrypt(self, record):
+        """encrypt the message of a record"""
+
+        message = record.get("message")
+        if not isinstance(message, str):
+            return {"error": "No message given"}
+
+        config = record.get("config")
+        key = (config,) + tuple([record.get(s) for s in SETTINGS])
+        entry = self.__machines.get(key)
+        if entry is None:
+            options = {s: record[s] for s in SETTINGS if record.get(s) is not None}
+            machine, preferences, name = self.__factory(config, options)
+            entry = self.__machines[key] = server._Entry(
+                machine, preferences, name, machine.snapshot())
+            if len(self.__machines) > self.__maxMachines:
+                discarded, x = self.__machines.popitem(last=False)
+                del self.__uses[discarded]
+        else:
+            self.__machines.move_to_end(key)
+
+        preferences = entry.preferences
+        if record.get("preferences"):
+            preferences = dict(preferences)
+            preferences.update(record["preferences"])
+
+        machine = entry.machine
+        machine.restore(entry.state)
+        self.__uses[key] += 1
+        if self.__uses[key] == COMPILE_AFTER:
+            machine.compile(lazy=True)
+
+        encryptor = stream.message_encryptor(
+            machine, len(message), **stream.preference_options(preferences))
+        return {"ciphertext": encryptor.encrypt(message)}
+
+
+def encrypt_lines(lines, factory, jobs=1, chunk_size=CHUNK_RECORDS):
+    """encrypt JSON records, yielding JSON results in the same order
+
+    Arguments:
+
+    - lines: iterable of JSON records (strings), blank lines are skipped
+
+    - factory: machine factory, see BatchEncryptor; with several jobs it
+    is pickled to the worker processes
+
+    - jobs: number of worker processes (1 encrypts in this process)
+
+    - chunk_size: records sent to a worker process at a time
+
+    Yields strings of JSON, without newlines
+    """
+
+    chunks = _chunks(lines, chunk_size)
+    if jobs < 2:
+        encryptor = BatchEncryptor(factory)
+        for chunk in chunks:
+            for line in chunk:
+                yield encryptor.encrypt_line(line)
+        return
+
+    # chunks are submitted as results are written, so that only a few
+    # are in memory however many records there are
+    pending = collections.deque()
+    with multiprocessing.Pool(jobs, _init_worker, (factory,)) as pool:
+        for chunk in chunks:
+            pending.append(pool.apply_async(_encrypt_chunk, (chunk,)))
+            if len(pending) >= jobs * CHUNKS_PER_JOB:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def _chunks(lines, size):
+    """yield lists of up to size non-blank lines"""
+    chunk = []
+    for line in lines:
+        if line.strip():
+            chunk.append(line)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker(factory):
+    """keep an encryptor (and its machines) in the worker"""
+    global _encryptor
+    _encryptor = BatchEncryptor(factory)
+
+
+def _encrypt_chunk(chunk):
+    """encrypt a chunk of records in a worker"""
+    return [_encryptor.encrypt_line(line) for line in chunk]
@@ -0,0 +1,232 @@
+"""Benchmark runner with a throughput history
+
+Benchmarks are functions registered with the case() decorator in modules
+named bench_*.py (see the benchmarks directory of the package).  A case
+function does its set up and returns a function to time along with the
+number of items (letters, machines, files...) processed by each call.
+Each case is timed like timeit: the call is repeated until a sample takes
+at least min_time seconds, and the best of several samples is kept.
+
+Runs are appended to a JSON history file, and the throughput of each case
+is compared with that of a baseline run; a case running slower than the
+baseline by more than a threshold is flagged as a regression.
+"""
+
+import collections
+import datetime
+import fnmatch
+import glob
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+
+# benchmark suite shipped with the package
+SUITE = os.path.join(os.path.dirname(__file__), "benchmarks")
+
+# history of the runs of the user
+HISTORY = os.path.join(
+    os.environ.get("XDG_DATA_HOME") or
+    os.path.join(os.path.expanduser("~"), ".local", "share"),
+    "enigma", "bench-history.json")
+
+Case = collections.namedtuple("Case", ["name", "unit", "function"])
+Case.__doc__ = """registered benchmark
+
+- name: string identifying the benchmark (e.g. "encrypt/EnigmaI/letter")
+- unit: string naming the items processed (e.g. "letters")
+- function: set up function, returning the timed function and its items
+"""
+
+Result = collections.namedtuple("Result", ["name", "unit", "seconds", "rate"])
+Result.__doc__ = """timing of a benchmark
+
+- name: name of the case
+- unit: string naming the items processed
+- seconds: best time of one call of the timed function
+- rate: items processed per second
+"""
+
+Change = collections.namedtuple("Change", ["name", "rate", "baseline",
+                                           "ratio", "regression"])
+Change.__doc__ = """throughput of a case compared with a baseline run
+
+- name: name of the case
+- rate: items per second of the run
+- baseline: items per second of the baseline run
+- ratio: rate / baseline
+- regression: True if the ratio is below 1 - threshold
+"""
+
+# cases registered by the modules loaded, in order of registration
+_cases = []
+
+
+def case(name, unit="calls"):
+    """register a benchmark
+
+    Arguments:
+
+    - name: string identifying the benchmark
+
+    - unit: string naming the items processed
+
+    Returns the decorator of a set up function, which takes no arguments
+    and returns the function to time and the number of items it processes
+    """
+
+    def register(function):
+        _cases.append(Case(name, unit, function))
+        return function
+    return register
+
+
+def load(directory):
+    """import the bench_*.py modules of a directory
+
+    Returns the list of Cases registered by them
+    """
+
+    start = len(_cases)
+    for path in sorted(glob.glob(os.path.join(directory, "bench_*.py"))):
+        name = "_enigma_bench_" + os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return _cases[start:]
+
+
+def run(cases, pattern="*", repeat=5, min_time=0.05, callback=None):
+    """time benchmarks
+
+    Arguments:
+
+    - cases: list of Cases
+
+    - pattern: shell-style pattern of the names of the cases run
+
+    - repeat: number of samples of each case (the best is kept)
+
+    - min_time: shortest time of a sample in seconds
+
+    - callback: function called with each Result as it is timed
+
+    Returns a list of Results
+    """
+
+    results = []
+    for c in cases:
+        if not fnmatch.fnmatchcase(c.name, pattern):
+            continue
+        function, items = c.function()
+        seconds = _time(function, repeat, min_time)
+        result = Result(c.name, c.unit, seconds, items / seconds)
+        results.append(result)
+        if callback is not None:
+            callback(result)
+    return results
+
+
+def _time(function, repeat, min_time):
+    """return the best time of one call of a function"""
+
+    # calls per sample, doubled until a sample is long enough
+    number = 1
+    while True:
+        elapsed = _sample(function, number)
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for x in range(1, repeat):
+        best = min(best, _sample(function, number) / number)
+    return best
+
+
+def _sample(function, number):
+    """return the time of number calls of a function"""
+    start = time.perf_counter()
+    for x in range(0, number):
+        function()
+    return time.perf_counter() - start
+
+
+def read_history(path):
+    """return the runs saved in a history file (empty if there is none)"""
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_run(path, results, label=None):
+    """append a run to a history file
+
+    Arguments:
+
+    - path: path of the JSON history file
+
+    - results: list of Results
+
+    - label: string naming the run (e.g. a commit or "baseline")
+
+    Returns the run saved (a dict)
+    """
+
+    entry = {
+        "label": label,
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "results": {r.name: {"unit": r.unit, "seconds": r.seconds,
+                             "rate": r.rate} for r in results},
+    }
+
+    history = read_history(path)
+    history.append(entry)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(history, file, indent=1)
+    os.replace(temporary, path)
+    return entry
+
+
+def baseline(history, label=None):
+    """return the latest run of a history with a label (the latest run if
+    label is None), or None if there is none"""
+    for entry in reversed(history):
+        if label is None or entry.get("label") == label:
+            return entry
+    return None
+
+
+def compare(results, base, threshold=0.1):
+    """compare the throughput of results with a baseline run
+
+    Arguments:
+
+    - results: list of Results
+
+    - base: baseline run from the history (a dict)
+
+    - threshold: fraction of throughput lost that is flagged as a
+    regression
+
+    Returns a list of Changes, for the cases run by both
+    """
+
+    changes = []
+    for r in results:
+        old = base["results"].get(r.name)
+        if old is None:
+            continue
+        ratio = r.rate / old["rate"]
+        changes.append(Change(r.name, r.rate, old["rate"], ratio,
+                              ratio < 1 - threshold))
+    return changes
@@ -0,0 +1,40 @@
+"""Benchmarks of the command line tool: configuration and whole runs"""
+
+import atexit
+import os
+import shutil
+import tempfile
+from click.testing import CliRunner
+from enigma import bench
+import enigma_driver
+
+# size of the file encrypted end to end
+FILE_SIZE = 1 << 20
+
+
+@bench.case("config/load", unit="loads")
+def load_config():
+    def run():
+        enigma_driver.load_config("User")
+    return run, 1
+
+
+@bench.case("cli/encrypt/file", unit="bytes")
+def encrypt_file():
+    directory = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, directory, True)
+    source = os.path.join(directory, "plain.txt")
+    destination = os.path.join(directory, "cipher.txt")
+    line = "THE QUICK BROWN FOX JUMPS OVER THE LAZY DOG\n"
+    with open(source, "w") as file:
+        file.write(line * (FILE_SIZE // len(line)))
+
+    runner = CliRunner()
+    args = ["encrypt", "-c", "Default", "-k", "False", "-f", source,
+            "-o", destination]
+
+    def run():
+        result = runner.invoke(enigma_driver.cli, args)
+        if result.exit_code != 0:
+            raise RuntimeError(result.output)
+    return run, os.path.getsize(source)
@@ -0,0 +1,60 @@
+"""Benchmarks of the machine: construction and encryption"""
+
+from enigma import bench
+from enigma import enigma_machine
+from enigma import vectorized
+
+PLUGS = ["AK", "BC", "UD", "PI", "QX", "EZ", "FM", "GN", "HT", "JR"]
+
+MACHINES = {
+    "EnigmaI": ([[1, 1, 1], [2, 1, 1], [3, 1, 1]], "UKW-B"),
+    "M3": ([[6, 1, 1], [7, 1, 1], [8, 1, 1]], "UKW-C"),
+    "M4": ([[1, 1, 1], [2, 1, 1], [3, 1, 1], [9, 1, 1]], "UKW-B_THIN"),
+}
+
+TEXT = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 30
+
+
+def machine(model, plugs=()):
+    rotors, reflector = MACHINES[model]
+    return enigma_machine.EnigmaMachine(model, [list(r) for r in rotors],
+                                        reflector, list(plugs))
+
+
+@bench.case("construct/EnigmaI", unit="machines")
+def construct():
+    return lambda: machine("EnigmaI", PLUGS), 1
+
+
+def _letters(model, plugs):
+    def setup():
+        e = machine(model, plugs)
+        encrypt = e.encrypt
+
+        def run():
+            for c in TEXT:
+                encrypt(c)
+        return run, len(TEXT)
+    return setup
+
+
+for _model in sorted(MACHINES):
+    bench.case("encrypt/%s/letter" % _model, unit="letters")(
+        _letters(_model, ()))
+    bench.case("encrypt/%s/letter/plugs" % _model, unit="letters")(
+        _letters(_model, PLUGS))
+
+
+@bench.case("encrypt/EnigmaI/text", unit="letters")
+def encrypt_text():
+    e = machine("EnigmaI", PLUGS)
+    text = TEXT * 100
+    return lambda: e.encrypt_text(text), len(text)
+
+
+if vectorized.available():
+    @bench.case("encrypt/EnigmaI/vectorized", unit="letters")
+    def encrypt_vectorized():
+        e = machine("EnigmaI", PLUGS)
+        text = TEXT * 1000
+        return lambda: vectorized.encrypt_text(e, text), len(text)
@@ -0,0 +1,416 @@
+"""Turing-Welchman Bombe
+
+A crib (plaintext known to sit at a place in the ciphertext) pairs each
+plaintext letter with its cipher letter.  The pairs form the menu: a graph
+of letters joined at the scrambler position where they were swapped.  The
+plugboard is unknown, but if letter A is steckered to a, a menu edge A-B at
+position i forces B to be steckered to the letter the scrambler (rotors and
+reflector alone) swaps with a at position i.  The diagonal board adds that
+a is then steckered to A.
+
+For every rotor order and start position the bombe assumes a stecker for
+the test letter and lights every stecker it implies.  When all 26 steckers
+of the test letter light up, the position contradicts itself whatever the
+stecker and is rejected.  The remaining stops are checked stecker by
+stecker, and the plugs they deduce are verified by decrypting the crib
+with an EnigmaMachine.  NumPy is optional; without it each position is
+tested in pure Python, which is much slower.
+"""
+
+import collections
+import itertools
+import multiprocessing
+import os
+from enigma import enigma_exception
+from enigma import enigma_machine
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+Menu = collections.namedtuple("Menu", ["edges", "letters", "test", "loops"])
+Menu.__doc__ = """letter-pair graph of a crib
+
+- edges: tuple of (plain letter, cipher letter, ciphertext index), letters
+  as integers (0-25), of the part of the menu joined to the test letter
+- letters: frozenset of the letters in those edges
+- test: letter with the most edges, whose stecker is assumed
+- loops: number of independent loops (more loops, fewer false stops)
+"""
+
+Stop = collections.namedtuple("Stop", ["rotors", "positions", "steckers",
+                                       "score"])
+Stop.__doc__ = """bombe stop, verified with an EnigmaMachine
+
+- rotors: rotor IDs (fast, middle, slow)
+- positions: start positions (1-26) of the fast, middle and slow rotors
+- steckers: tuple of deduced steckers as 2 character strings ("AA" for a
+  letter found to be unplugged)
+- score: number of crib letters reproduced by the machine with the
+  deduced plugs (other letters left unplugged)
+"""
+
+# number of fast, middle and slow rotor positions
+_STATES = enigma_machine._STATES
+
+# bombe searching the rotor orders of a worker process, see _init_worker()
+_bombe = None
+
+
+def menu(ciphertext, crib, offset=0):
+    """build the menu of a crib
+
+    Arguments:
+
+    - ciphertext: string of letters (A-Z, any case)
+
+    - crib: string of plaintext letters (A-Z, any case)
+
+    - offset: index of the first crib letter in the ciphertext
+
+    Returns a Menu
+    """
+
+    ciphertext = _codes(ciphertext)
+    crib = _codes(crib)
+    if offset < 0 or offset + len(crib) > len(ciphertext):
+        raise ValueError("crib does not fit in the ciphertext at offset " +
+                         str(offset))
+
+    # no letter encrypts to itself
+    pairs = [(p, ciphertext[offset + i], offset + i)
+             for i, p in enumerate(crib)]
+    for p, c, i in pairs:
+        if p == c:
+            raise ValueError("crib letter " + chr(65 + p) +
+                             " encrypts to itself at index " + str(i))
+
+    if not pairs:
+        raise ValueError("crib is empty")
+
+    degree = collections.Counter()
+    for p, c, i in pairs:
+        degree[p] += 1
+        degree[c] += 1
+    test = max(sorted(degree), key=lambda x: degree[x])
+
+    # keep the part of the menu joined to the test letter
+    letters = {test}
+    edges = []
+    remaining = pairs
+    while True:
+        joined = [e for e in remaining if e[0] in letters or e[1] in letters]
+        if not joined:
+            break
+        edges.extend(joined)
+        for p, c, i in joined:
+            letters.update((p, c))
+        remaining = [e for e in remaining if e not in joined]
+
+    edges.sort(key=lambda e: e[2])
+    loops = len(edges) - len(letters) + 1
+    return Menu(tuple(edges), frozenset(letters), test, loops)
+
+
+class Bombe:
+    """Bombe searching the keys of a three rotor machine for a crib"""
+
+    def __init__(self, ciphertext, crib, offset=0, model="ENIGMAI",
+                 reflector="UKW-B", rotors=(1, 2, 3, 4, 5), rings=(1, 1, 1),
+                 max_plugs=10):
+        """Bombe set up
+
+        Arguments:
+
+        - ciphertext, crib, offset: see menu()
+
+        - model: string containing the Enigma Machine war model
+
+        - reflector: string containing reflector ID
+
+        - rotors: rotor IDs tried in every order
+
+        - rings: ring settings (1-26) assumed for the fast, middle and slow
+        rotors
+
+        - max_plugs: stops deducing more plugs than this are rejected
+        """
+
+        self.__menu = menu(ciphertext, crib, offset)
+        self.__ciphertext = _codes(ciphertext)
+        self.__crib = _codes(crib)
+        self.__offset = offset
+        self.__model = model
+        self.__reflector = reflector
+        self.__rotors = tuple(rotors)
+        self.__rings = tuple(rings)
+        self.__maxPlugs = max_plugs
+
+    @property
+    def menu(self):
+        """return the Menu of the crib"""
+        return self.__menu
+
+    @property
+    def orders(self):
+        """return the rotor orders (fast, middle, slow) searched by run()"""
+        return list(itertools.permutations(self.__rotors, 3))
+
+    def run(self, jobs=None):
+        """search every rotor order and start position
+
+        Arguments:
+
+        - jobs: number of worker processes searching rotor orders (defaults
+        to the number of CPUs)
+
+        Returns a list of Stops, best score first
+        """
+
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+
+        orders = self.orders
+        if jobs < 2 or len(orders) < 2:
+            results = [self.test(order) for order in orders]
+        else:
+            with multiprocessing.Pool(jobs, _init_worker, (self,)) as pool:
+                results = pool.map(_test_order, orders, chunksize=1)
+
+        stops = [stop for result in results for stop in result]
+        stops.sort(key=lambda s: (-s.score, s.rotors, s.positions))
+        return stops
+
+    def test(self, order, positions=None):
+        """search the start positions of one rotor order
+
+        Arguments:
+
+        - order: rotor IDs (fast, middle, slow)
+
+        - positions: start positions (fast, middle, slow; 1-26) to test,
+        defaults to all 17,576
+
+        Returns a list of Stops
+        """
+
+        machine = self.__machine(order, (1, 1, 1))
+        if positions is None:
+            starts = list(range(0, _STATES))
+        else:
+            starts = [(p0 - 1) + 26 * (p1 - 1) + 676 * (p2 - 1)
+                      for p0, p1, p2 in positions]
+
+        perms = self.__scramblers(machine, starts)
+        if numpy is not None:
+            stops = self.__search_vectorized(perms, starts)
+        else:
+            stops = zip(starts, perms)
+
+        result = []
+        for start, row in stops:
+            positions = (start % 26 + 1, start // 26 % 26 + 1,
+                         start // 676 + 1)
+            for wire in self.__candidates(row):
+                stop = self.__verify(order, positions, row, wire)
+                if stop is not None:
+                    result.append(stop)
+
+        return result
+
+    def __machine(self, order, positions, plugs=()):
+        """assemble an EnigmaMachine for a rotor order and start position"""
+        rot = [[order[r], positions[r], self.__rings[r]] for r in range(0, 3)]
+        machine = enigma_machine.EnigmaMachine(self.__model, rot,
+                                               self.__reflector, [])
+        if plugs:
+            machine.add_many_plugs(list(plugs))
+        return machine
+
+    def __scramblers(self, machine, starts):
+        """return the scrambler permutation at each menu edge, per start
+
+        Returns a NumPy array (start, edge, letter), or without NumPy a list
+        with a list of permutations per start
+        """
+
+        positions, fast_in, fast_out, mid_fwd, mid_inv, inner, \
+            notch0, notch1 = machine._tables()
+        successor = [p0 + 26 * p1 + 676 * p2 for p0, p1, p2 in
+                     (enigma_machine._press(s % 26, s // 26 % 26, s // 676,
+                                            notch0, notch1)
+                      for s in range(0, _STATES))]
+        indexes = [i for a, b, i in self.__menu.edges]
+
+        if numpy is not None:
+            successor = numpy.array(successor, dtype=numpy.intp)
+            fi, fo, mf, mi, inn = [numpy.array(t, dtype=numpy.uint8) for t in
+                                   (fast_in, fast_out, mid_fwd, mid_inv, inner)]
+            states = numpy.array(starts, dtype=numpy.intp)
+            perms = numpy.empty((len(starts), len(indexes), 26),
+                                dtype=numpy.uint8)
+            press = 0
+            for e, index in enumerate(indexes):
+                while press <= index:
+                    states = successor[states]
+                    press += 1
+                p0 = (states % 26)[:, None]
+                p1 = (states // 26 % 26)[:, None]
+                p2 = (states // 676)[:, None]
+                x = fi[p0, numpy.arange(26)]
+                x = mi[p1, inn[p2, mf[p1, x]]]
+                perms[:, e] = fo[p0, x]
+            return perms
+
+        perms = []
+        for state in starts:
+            row = []
+            press = 0
+            for index in indexes:
+                while press <= index:
+                    state = successor[state]
+                    press += 1
+                p0, p1, p2 = state % 26, state // 26 % 26, state // 676
+                row.append([fast_out[p0][mid_inv[p1][inner[p2][
+                    mid_fwd[p1][fast_in[p0][x]]]]] for x in range(0, 26)])
+            perms.append(row)
+        return perms
+
+    def __search_vectorized(self, perms, starts):
+        """light the steckers implied by the test letter at every start
+
+        Returns (start, permutations) of the starts not rejected
+        """
+
+        test = self.__menu.test
+        edges = [(a, b, e) for e, (a, b, i) in enumerate(self.__menu.edges)]
+
+        # wires lit by letter, start and stecker, assuming the test letter
+        # is steckered to A
+        lit = numpy.zeros((26, len(starts), 26), dtype=bool)
+        lit[test, :, 0] = True
+        index = numpy.arange(len(starts))
+        flat = None
+        count = -1
+        while True:
+            # flat indexes of each start's permutation into a letter's wires
+            if flat is None:
+                base = (numpy.arange(len(index)) * 26)[:, None]
+                flat = [perms[index, e].astype(numpy.intp) + base
+                        for a, b, e in edges]
+
+            for (a, b, e), f in zip(edges, flat):
+                lit[b] |= lit[a].reshape(-1).take(f)
+                lit[a] |= lit[b].reshape(-1).take(f)
+
+            # diagonal board
+            lit |= lit.transpose(2, 1, 0)
+
+            # drop the starts that contradict themselves
+            keep = ~lit[test].all(axis=1)
+            if not keep.all():
+                lit = lit[:, keep]
+                index = index[keep]
+                flat = None
+
+            total = int(lit.sum())
+            if total == count:
+                break
+            count = total
+
+        return [(starts[s], perms[s].tolist()) for s in index.tolist()]
+
+    def __candidates(self, row):
+        """return the steckers of the test letter worth verifying"""
+        test = self.__menu.test
+        lit = _light(row, self.__menu.edges, test, 0)
+        wires = {w for letter, w in lit if letter == test}
+        if len(wires) == 26:
+            return []
+
+        # the assumption, if consistent, else any stecker it did not light
+        if _steckers(lit) is not None:
+            return [0] + [w for w in range(0, 26) if w not in wires]
+        return [w for w in range(0, 26) if w not in wires]
+
+    def __verify(self, order, positions, row, wire):
+        """decrypt the crib with the plugs deduced from a stop"""
+        steckers = _steckers(_light(row, self.__menu.edges, self.__menu.test,
+                                    wire))
+        if steckers is None:
+            return None
+
+        plugs = [chr(65 + a) + chr(65 + b) for a, b in steckers.items()
+                 if a < b]
+        if len(plugs) > self.__maxPlugs:
+            return None
+
+        machine = self.__machine(order, positions, plugs)
+        machine.advance(self.__offset)
+        plain = machine.encrypt_codes(
+            self.__ciphertext[self.__offset:self.__offset + len(self.__crib)])
+        score = sum(1 for p, c in zip(plain, self.__crib) if p == c)
+
+        pairs = tuple(sorted(chr(65 + a) + chr(65 + b)
+                             for a, b in steckers.items() if a <= b))
+        return Stop(tuple(order), positions, pairs, score)
+
+
+def _codes(text):
+    """return a string of letters as bytes of integers (0-25)"""
+    text = text.upper()
+    invalid = enigma_machine._INVALID.search(text)
+    if invalid is not None:
+        raise enigma_exception.InvalidCharacter(invalid.group())
+    return text.encode("ascii").translate(enigma_machine._TO_CODES)
+
+
+def _light(row, edges, test, wire):
+    """return the (letter, stecker) pairs implied by a test letter stecker
+
+    Arguments:
+
+    - row: scrambler permutation of each menu edge
+
+    - edges: menu edges
+
+    - test, wire: test letter and its assumed stecker
+    """
+
+    adjacent = [[] for x in range(0, 26)]
+    for e, (a, b, i) in enumerate(edges):
+        adjacent[a].append((b, row[e]))
+        adjacent[b].append((a, row[e]))
+
+    lit = {(test, wire)}
+    queue = [(test, wire)]
+    while queue:
+        letter, w = queue.pop()
+        implied = [(w, letter)] + [(b, perm[w]) for b, perm in adjacent[letter]]
+        for pair in implied:
+            if pair not in lit:
+                lit.add(pair)
+                queue.append(pair)
+
+    return lit
+
+
+def _steckers(lit):
+    """return the stecker of each letter, or None if any letter has two"""
+    steckers = {}
+    for letter, w in lit:
+        if steckers.setdefault(letter, w) != w:
+            return None
+    return steckers
+
+
+def _init_worker(bombe):
+    """keep the bombe in the worker process"""
+    global _bombe
+    _bombe = bombe
+
+
+def _test_order(order):
+    """search one rotor order in a worker process"""
+    return _bombe.test(order)
@@ -0,0 +1,279 @@
+"""Ciphertext-only key search
+
+Decrypted with the right rotor order and start positions, a message keeps
+some of the letter frequencies of its language even without its plugs,
+whereas a wrong key leaves letters almost evenly spread.  The index of
+coincidence (the chance that two letters drawn from the text are equal)
+measures this: about 0.038 for random letters and 0.06-0.08 for German or
+English.
+
+Every rotor order and reflector of a model is tried at all 17,576 start
+positions with an empty plugboard and ring settings of 1.  The best
+candidates are then refined by trying every ring setting of the fast and
+middle rotors, which only changes where the rotors turn over.  NumPy is
+optional; without it each start position is decrypted with the bulk path
+of EnigmaMachine, which is much slower.
+"""
+
+import collections
+import itertools
+import multiprocessing
+import os
+from enigma import enigma_machine
+from enigma import registry
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+Candidate = collections.namedtuple("Candidate", [
+    "ioc", "rotors", "reflector", "positions", "rings"])
+Candidate.__doc__ = """candidate key, without plugs
+
+- ioc: index of coincidence of the decrypted message
+- rotors: rotor IDs (fast, middle, slow)
+- reflector: string containing reflector ID
+- positions: start positions (1-26) of the fast, middle and slow rotors
+- rings: ring settings (1-26) of the fast, middle and slow rotors
+"""
+
+# number of fast, middle and slow rotor positions
+_STATES = enigma_machine._STATES
+
+# search settings of a worker process, see _init_worker()
+_settings = None
+
+
+def index_of_coincidence(codes):
+    """return the index of coincidence of letters (integers 0-25)"""
+    if len(codes) < 2:
+        return 0.0
+    counts = collections.Counter(codes)
+    total = sum(n * (n - 1) for n in counts.values())
+    return total / (len(codes) * (len(codes) - 1))
+
+
+def search(ciphertext, model="EnigmaI", rotors=None, reflectors=None,
+           static=None, top=10, refine=True, jobs=None):
+    """return the best candidate keys of a ciphertext
+
+    See search_iter() for the arguments.
+
+    Returns a list of Candidates, best first
+    """
+
+    candidates = []
+    for candidates in search_iter(ciphertext, model, rotors, reflectors,
+                                  static, top, refine, jobs):
+        pass
+    return candidates
+
+
+def search_iter(ciphertext, model="EnigmaI", rotors=None, reflectors=None,
+                static=None, top=10, refine=True, jobs=None):
+    """search the keys of a ciphertext, reporting the best as they improve
+
+    Arguments:
+
+    - ciphertext: string of letters (A-Z, any case)
+
+    - model: string containing the Enigma Machine war model
+
+    - rotors: rotor IDs tried in every order (defaults to those of the
+    model)
+
+    - reflectors: reflector IDs tried (defaults to those of the model)
+
+    - static: static rotor list of ID, position and ring setting (M4)
+
+    - top: number of candidates kept
+
+    - refine: try the ring settings of the fast and middle rotors of the
+    best candidates
+
+    - jobs: number of worker processes searching rotor orders (defaults
+    to the number of CPUs)
+
+    Yields the list of the best Candidates (best first) each time it
+    improves, and once more after refining
+    """
+
+    codes = _codes(ciphertext)
+    spec = registry.model(model)
+    if rotors is None:
+        rotors = spec.rotors
+    if reflectors is None:
+        reflectors = spec.reflectors
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    settings = (codes, model, static, top)
+    tasks = [(order, reflector) for reflector in reflectors
+             for order in itertools.permutations(rotors, 3)]
+
+    pool = None
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(jobs, _init_worker, (settings,))
+
+    try:
+        if pool is None:
+            results = (_search_order(settings, task) for task in tasks)
+        else:
+            results = pool.imap_unordered(_search_task, tasks)
+
+        best = []
+        for result in results:
+            if _merge(best, result, top):
+                yield list(best)
+
+        if refine and best:
+            if pool is None:
+                refined = [_refine(settings, c) for c in best]
+            else:
+                refined = pool.map(_refine_task, best)
+            best = []
+            _merge(best, refined, top)
+            yield list(best)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def decrypt(ciphertext, candidate, model="EnigmaI", static=None):
+    """decrypt a ciphertext with a candidate key and an empty plugboard"""
+    machine = _machine(model, candidate.rotors, candidate.reflector,
+                       static, candidate.positions, candidate.rings)
+    return machine.encrypt_text(ciphertext.upper())
+
+
+def _codes(text):
+    """return the letters of a string (others dropped) as integers (0-25)"""
+    text = enigma_machine._INVALID.sub("", text.upper())
+    if len(text) < 2:
+        raise ValueError("ciphertext needs at least two letters")
+    return text.encode("ascii").translate(enigma_machine._TO_CODES)
+
+
+def _machine(model, order, reflector, static, positions, rings):
+    """assemble an EnigmaMachine without plugs"""
+    rot = [[order[r], positions[r], rings[r]] for r in range(0, 3)]
+    if static is not None:
+        rot.append(list(static))
+    return enigma_machine.EnigmaMachine(model, rot, reflector, [])
+
+
+def _merge(best, candidates, top):
+    """merge candidates into the sorted best list, True if it changed"""
+    changed = False
+    for candidate in candidates:
+        if len(best) < top or candidate.ioc > best[-1].ioc:
+            best.append(candidate)
+            best.sort(key=lambda c: (-c.ioc, c.rotors, c.reflector,
+                                     c.positions, c.rings))
+            del best[top:]
+            changed = changed or candidate in best
+    return changed
+
+
+def _search_order(settings, task):
+    """return the best candidates of one rotor order and reflector"""
+    codes, model, static, top = settings
+    order, reflector = task
+    machine = _machine(model, order, reflector, static, (1, 1, 1), (1, 1, 1))
+    ioc = _scores(machine, codes)
+
+    if numpy is not None:
+        starts = numpy.argsort(-ioc, kind="stable")[:top].tolist()
+    else:
+        starts = sorted(range(0, _STATES), key=lambda s: -ioc[s])[:top]
+
+    return [Candidate(float(ioc[s]), tuple(order), reflector,
+                      (s % 26 + 1, s // 26 % 26 + 1, s // 676 + 1),
+                      (1, 1, 1)) for s in starts]
+
+
+def _scores(machine, codes):
+    """return the index of coincidence after decrypting from every start
+    (states numbered fast + 26 * middle + 676 * slow)"""
+
+    if numpy is None:
+        ioc = []
+        for state in range(0, _STATES):
+            machine._set_positions((state % 26, state // 26 % 26,
+                                    state // 676))
+            ioc.append(index_of_coincidence(machine.encrypt_codes(codes)))
+        return ioc
+
+    positions, fast_in, fast_out, mid_fwd, mid_inv, inner, \
+        notch0, notch1 = machine._tables()
+    successor = numpy.array(
+        [p0 + 26 * p1 + 676 * p2 for p0, p1, p2 in
+         (enigma_machine._press(s % 26, s // 26 % 26, s // 676, notch0, notch1)
+          for s in range(0, _STATES))], dtype=numpy.intp)
+    fi, fo, mf, mi, inn = [numpy.array(t, dtype=numpy.intp) for t in
+                           (fast_in, fast_out, mid_fwd, mid_inv, inner)]
+    mf, mi, inn, fo = [t.ravel() for t in (mf, mi, inn, fo)]
+
+    states = numpy.arange(_STATES)
+    rows = numpy.arange(_STATES)
+    counts = numpy.zeros((_STATES, 26), dtype=numpy.int32)
+    for c in codes:
+        states = successor[states]
+        p0 = states % 26 * 26
+        p1 = states // 26 % 26 * 26
+        p2 = states // 676 * 26
+        x = fi[:, c][p0 // 26]
+        x = mi[p1 + inn[p2 + mf[p1 + x]]]
+        counts[rows, fo[p0 + x]] += 1
+
+    n = len(codes)
+    return (counts * (counts - 1)).sum(axis=1) / (n * (n - 1))
+
+
+def _refine(settings, candidate):
+    """return the candidate with the best fast and middle ring settings"""
+    codes, model, static, top = settings
+    machine = _machine(model, candidate.rotors, candidate.reflector, static,
+                       candidate.positions, candidate.rings)
+    key = machine.snapshot(True)
+
+    # moving a ring and its rotor together keeps the wiring in place and
+    # only moves the turnover, which can leave the middle and slow rotors a
+    # step off for the letters before it
+    best = candidate
+    shifts = list(itertools.product((-1, 0, 1), repeat=2))
+    for r in (0, 1, 0):
+        start = best
+        for ring, shift in itertools.product(range(1, 27), shifts):
+            positions = list(start.positions)
+            rings = list(start.rings)
+            positions[r] = (positions[r] - rings[r] + ring - 1) % 26 + 1
+            rings[r] = ring
+            positions[1] = (positions[1] + shift[0] - 1) % 26 + 1
+            positions[2] = (positions[2] + shift[1] - 1) % 26 + 1
+            rotors = tuple([(key.rotors[x][0], positions[x], rings[x])
+                            for x in range(0, 3)]) + key.rotors[3:]
+            machine.restore(key._replace(rotors=rotors))
+            ioc = index_of_coincidence(machine.encrypt_codes(codes))
+            if ioc > best.ioc:
+                best = candidate._replace(ioc=ioc, positions=tuple(positions),
+                                          rings=tuple(rings))
+
+    return best
+
+
+def _init_worker(settings):
+    """keep the search settings in the worker process"""
+    global _settings
+    _settings = settings
+
+
+def _search_task(task):
+    """search one rotor order and reflector in a worker process"""
+    return _search_order(_settings, task)
+
+
+def _refine_task(candidate):
+    """refine the ring settings of a candidate in a worker process"""
+    return _refine(_settings, candidate)
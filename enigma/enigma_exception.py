@@ -13,6 +13,12 @@ class MaxPlugsReached(Exception):
         Exception.__init__(self, "Cannot add.  Not enough plugs available")
 
 
+class InvalidCharacter(Exception):
+    def __init__(self, character):
+        Exception.__init__(self, (repr(character) +
+                           " cannot be entered into the machine"))
+
+
 class DuplicateRotor(Exception):
     def __init__(self, rotor):
         Exception.__init__(self, ("Rotor " + str(rotor.rotorId) +
@@ -42,3 +48,15 @@ class InvalidReflector(Exception):
             Exception.__init__(self, "Reflector must be of type: UKW-B Thin, or UKW-C Thin")
         else:
             Exception.__init__(self, "Reflector must be of type: UKW-B, or UKW-C")
+
+
+class InvalidMessageKey(Exception):
+    def __init__(self, key, length):
+        Exception.__init__(self, (repr(key) + " must be " + str(length) +
+                           " letters (A-Z)"))
+
+
+class InvalidIndicator(Exception):
+    def __init__(self, indicator):
+        Exception.__init__(self, (repr(indicator) +
+                           " does not decrypt to a doubled message key"))
@@ -1,16 +1,40 @@
-import configparser
+import collections
+import functools
+import re
 from enigma import rotor
 from enigma import reflect
 from enigma import plugboard
 from enigma import enigma_exception
 
-config = configparser.ConfigParser(interpolation=configparser.
-                                   ExtendedInterpolation())
+# translation between letters (A-Z) and integer codes (0-25)
+_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_TO_CODES = bytes.maketrans(_ALPHABET, bytes(range(0, 26)))
+_TO_LETTERS = bytes.maketrans(bytes(range(0, 26)), _ALPHABET)
+_INVALID = re.compile("[^A-Z]")
+
+# number of distinct fast, middle and slow rotor positions
+_STATES = 26 * 26 * 26
+
+# full machine key, see EnigmaMachine.snapshot()
+MachineKey = collections.namedtuple("MachineKey", [
+    "model", "rotors", "reflector", "plugboard"])
+MachineKey.__doc__ = """hashable machine key
+
+- model: string containing the Enigma Machine war model
+- rotors: tuple of (rotor ID, position, ring setting) per rotor, in the
+  order given to EnigmaMachine
+- reflector: string containing reflector ID
+- plugboard: tuple of the letter (0-25) each socket is wired to
+"""
 
 
 class EnigmaMachine:
     """Enigma Machine"""
 
+    __slots__ = ("__model", "__compileOptions", "__compiled",
+                 "__compiledBlocks", "__rotors", "__reflect", "__plugboard",
+                 "__stats")
+
     def __init__(self, model, rot, ref, plugs):
         """Assembly of Enigma Machine
 
@@ -29,6 +53,15 @@ class EnigmaMachine:
 
         # obtain war model
         self.__model = model
+
+        # combined substitution tables, see compile()
+        self.__compileOptions = None
+        self.__compiled = None
+        self.__compiledBlocks = None
+
+        # optional counters and timings, see the stats property
+        self.__stats = None
+
         # instantiate rotors
         self.__rotors = []
         for r in range(0, len(rot)):
@@ -45,6 +78,35 @@ class EnigmaMachine:
         if len(plugs) > 1:
             self.add_many_plugs(plugs)
 
+    def __getstate__(self):
+        """drop compiled tables and stats when pickled, the tables are
+        rebuilt on use"""
+        return (self.__model, self.__compileOptions, self.__rotors,
+                self.__reflect, self.__plugboard)
+
+    def __setstate__(self, state):
+        (self.__model, self.__compileOptions, self.__rotors,
+         self.__reflect, self.__plugboard) = state
+        self.__compiled = None
+        self.__compiledBlocks = None
+        self.__stats = None
+
+    @property
+    def stats(self):
+        """return the stats.Stats collected by the machine (None if not
+        collected)"""
+        return self.__stats
+
+    @stats.setter
+    def stats(self, stats):
+        """collect counters and timings of the letters encrypted
+
+        Arguments:
+
+        - stats: stats.Stats object, or None to stop collecting
+        """
+        self.__stats = stats
+
     def add_many_plugs(self, plugs):
         """add many plugs, if not already present
 
@@ -58,6 +120,7 @@ class EnigmaMachine:
         """
 
         self.__plugboard.add_all(plugs)
+        self.__compiled = None
 
     def remove_plug(self, plug):
         """remove plug if present
@@ -72,6 +135,100 @@ class EnigmaMachine:
         """
 
         self.__plugboard.remove_plug(plug)
+        self.__compiled = None
+
+    def snapshot(self, full=False):
+        """return the machine state as an immutable value
+
+        Arguments:
+
+        - full: if True, return the full machine key (MachineKey) rather
+        than the rotor positions alone
+
+        Returns a tuple of rotor positions (1-26), or a MachineKey
+        """
+
+        if not full:
+            return tuple([r.position for r in self.__rotors])
+
+        return MachineKey(self.__model,
+                          tuple([(r.rotorId, r.position, r.ringSetting)
+                                 for r in self.__rotors]),
+                          self.__reflect.reflectId,
+                          self.__plugboard.mapping)
+
+    def restore(self, state):
+        """return the machine to a state returned by snapshot()
+
+        Rotors, reflector and plugboard are rewired in place rather than
+        rebuilt, and the key is not validated again.
+
+        Arguments:
+
+        - state: tuple of rotor positions, or MachineKey of the same model
+        and number of rotors
+
+        Side Effects:
+
+        - rotor positions changed
+        - for a MachineKey, rotors, ring settings, reflector and plugs
+        changed (compiled tables discarded if the key differs)
+        """
+
+        if not isinstance(state, MachineKey):
+            for r, position in zip(self.__rotors, state):
+                r.position = position
+            return
+
+        if (state.model != self.__model or
+                len(state.rotors) != len(self.__rotors)):
+            raise ValueError("machine key is for a different machine")
+
+        if state[1:] == self.snapshot(True)[1:]:
+            return
+
+        for r, (rotorId, position, ringSetting) in zip(self.__rotors,
+                                                       state.rotors):
+            if r.rotorId != rotorId:
+                r.rotorId = rotorId
+            r.ringSetting = ringSetting
+            r.position = position
+
+        if self.__reflect.reflectId != state.reflector:
+            self.__reflect.reflectId = state.reflector
+
+        if self.__plugboard.mapping != state.plugboard:
+            self.__plugboard.clear()
+            self.__plugboard.add_all(_plugs(state.plugboard))
+
+        self.__compiled = None
+
+    def to_bytes(self):
+        """return the full machine key as bytes, see from_bytes()"""
+
+        key = self.snapshot(True)
+        model = key.model.encode("ascii")
+        reflector = key.reflector.encode("ascii")
+        data = bytearray([len(model)]) + model
+        data += bytearray([len(reflector)]) + reflector
+        data.append(len(key.rotors))
+        for rotorId, position, ringSetting in key.rotors:
+            data += bytearray([rotorId, position, ringSetting])
+        data += bytearray(key.plugboard)
+
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """assemble a machine from bytes returned by to_bytes()"""
+
+        key = _key_from_bytes(data)
+        machine = cls(key.model, [list(r) for r in key.rotors],
+                      key.reflector, [])
+        plugs = _plugs(key.plugboard)
+        if plugs:
+            machine.add_many_plugs(plugs)
+        return machine
 
     def step(self):
         """Increment rotors according to notches"""
@@ -86,6 +243,49 @@ class EnigmaMachine:
         for item in queue:
             item.step()
 
+    def advance(self, n):
+        """move the rotors to their positions n key presses later
+
+        The positions are computed from the stepping schedule rather than
+        by stepping n times, so the cost does not depend on n.
+
+        Arguments:
+
+        - n: number of key presses, negative to rewind to the positions
+        n key presses earlier
+
+        Side Effects:
+
+        - fast, middle and slow rotor positions changed
+        """
+
+        notch0, notch1 = self._notches()
+        press = _press if n >= 0 else _unpress
+        p0, p1, p2 = (r.position - 1 for r in self.__rotors[0:3])
+
+        # one revolution of the fast rotor leaves it where it started, and
+        # the middle rotor ends where it does regardless of the slow rotor,
+        # so whole revolutions repeat with a period of at most 26
+        revolutions, rest = divmod(abs(n), 26)
+        seen = {}
+        while revolutions:
+            if p1 in seen:
+                first, slow = seen[p1]
+                period = len(seen) - first
+                p2 = (p2 + (revolutions // period) * (p2 - slow)) % 26
+                revolutions %= period
+                seen = {}
+                continue
+            seen[p1] = (len(seen), p2)
+            for x in range(0, 26):
+                p0, p1, p2 = press(p0, p1, p2, notch0, notch1)
+            revolutions -= 1
+
+        for x in range(0, rest):
+            p0, p1, p2 = press(p0, p1, p2, notch0, notch1)
+
+        self._set_positions((p0, p1, p2))
+
     def step_single(self, r):
         """Manually increment a single rotor"""
         self.__rotors[r].step()
@@ -96,6 +296,9 @@ class EnigmaMachine:
 
     def encrypt(self, letter):
         """pass a character through the machine"""
+        if self.__stats is not None:
+            return self.__stats.measure(self, EnigmaMachine.encrypt, letter)
+
         self.step()
         start = ord(letter.upper()) - 65
         stage1 = self.__plugboard.encrypt(start)
@@ -120,6 +323,275 @@ class EnigmaMachine:
 
         return chr(stage9 + 65)
 
+    def encrypt_text(self, text):
+        """pass a whole string of letters through the machine
+
+        Arguments:
+
+        - text: string of letters (A-Z, any case)
+
+        Side Effects:
+
+        - rotors left in the same positions as after encrypting each
+        letter with encrypt()
+
+        Returns the encrypted string in upper case
+        """
+
+        text = text.upper()
+        invalid = _INVALID.search(text)
+        if invalid is not None:
+            raise enigma_exception.InvalidCharacter(invalid.group())
+
+        codes = text.encode("ascii").translate(_TO_CODES)
+        return self.encrypt_codes(codes).translate(_TO_LETTERS).decode("ascii")
+
+    def encrypt_codes(self, codes):
+        """pass a sequence of letters (as integers 0-25) through the machine
+
+        Arguments:
+
+        - codes: sequence of integers (0-25), e.g. a list or bytes object
+
+        Side Effects:
+
+        - rotors left in the same positions as after encrypting each
+        letter with encrypt()
+
+        Returns the encrypted letters as a bytes object of integers (0-25)
+        """
+
+        if self.__stats is not None:
+            return self.__stats.measure(self, EnigmaMachine.encrypt_codes,
+                                        codes)
+
+        compiled = self._compiled()
+        if compiled is not None:
+            return self.__encrypt_compiled(codes, compiled)
+
+        (p0, p1, p2), fast_in, fast_out, mid_fwd, mid_inv, inner, \
+            notch0, notch1 = self._tables()
+        succ = list(range(1, 26)) + [0]
+
+        result = bytearray(len(codes))
+        i = 0
+        for c in codes:
+            # step rotors (slow and double step when middle is at turnover)
+            if notch1[p1]:
+                p1 = succ[p1]
+                p2 = succ[p2]
+            elif notch0[p0]:
+                p1 = succ[p1]
+            p0 = succ[p0]
+
+            c = fast_in[p0][c]
+            c = mid_fwd[p1][c]
+            c = inner[p2][c]
+            c = mid_inv[p1][c]
+            result[i] = fast_out[p0][c]
+            i += 1
+
+        # write final rotor positions back once
+        self._set_positions((p0, p1, p2))
+
+        return bytes(result)
+
+    def compile(self, lazy=False, max_states=1024):
+        """precompute one combined substitution table per rotor state
+
+        For a fixed machine key the path from plugboard to plugboard is a
+        single substitution for each of the 17,576 fast, middle and slow
+        rotor positions.  Once compiled, encrypt_text() and encrypt_codes()
+        encrypt each letter with a state update and one table lookup.
+
+        Arguments:
+
+        - lazy: instead of all 17,576 tables (457 KB) up front, build the
+        tables for a block of 26 states sharing a middle and slow rotor
+        position on first use
+
+        - max_states: number of state tables kept in lazy mode, the oldest
+        blocks are discarded first
+
+        Side Effects:
+
+        - tables rebuilt automatically after plugs are changed or the M4
+        static rotor is moved
+        """
+
+        self.__compileOptions = (lazy, max_states)
+        self.__compiled = None
+        self._compiled()
+
+    def decompile(self):
+        """discard the tables built by compile()"""
+        self.__compileOptions = None
+        self.__compiled = None
+
+    @property
+    def compiled(self):
+        """return True if the machine has been compiled"""
+        return self.__compileOptions is not None
+
+    def _compiled(self):
+        """return the compiled tables, or None if not compiled
+
+        Returns a tuple of:
+
+        - successor: list giving the rotor state after a key press, with
+        states numbered fast + 26 * middle + 676 * slow
+
+        - table: bytes of 26 letters per state, or in lazy mode a list
+        with the tables of each block of 26 states sharing a middle and
+        slow rotor position (None until built)
+
+        - build: function returning the tables of a block
+        """
+
+        if self.__compileOptions is None:
+            return None
+
+        # the static rotor of the M4 is folded into the tables
+        static = None
+        if self.__model == 'M4':
+            static = self.__rotors[3].position
+        if self.__compiled is not None and self.__compiled[0] == static:
+            return self.__compiled[1]
+
+        lazy = self.__compileOptions[0]
+        positions, fast_in, fast_out, mid_fwd, mid_inv, inner, \
+            notch0, notch1 = self._tables()
+
+        successor = _successors(*self._turnovers())
+
+        # compose tables with bytes.translate (tables padded to 256 bytes)
+        pad = bytes(230)
+        fast_in = [bytes(t) for t in fast_in]
+        fast_out = [bytes(t) + pad for t in fast_out]
+
+        def build(block):
+            """return the tables of the 26 states sharing a middle and slow
+            rotor position (block = middle + 26 * slow)"""
+            m, n, i = mid_fwd[block % 26], mid_inv[block % 26], \
+                inner[block // 26]
+            core = bytes([n[i[m[x]]] for x in range(0, 26)]) + pad
+            return b"".join([fast_in[p0].translate(core).translate(
+                fast_out[p0]) for p0 in range(0, 26)])
+
+        if lazy:
+            table = [None] * (_STATES // 26)
+        else:
+            table = b"".join([build(block) for block in range(0, _STATES // 26)])
+
+        self.__compiled = (static, (successor, table, build))
+        self.__compiledBlocks = collections.deque()
+        return self.__compiled[1]
+
+    def __encrypt_compiled(self, codes, compiled):
+        """encrypt_codes() using the tables built by compile()"""
+        successor, table, build = compiled
+        fast, middle, slow = self.__rotors[0:3]
+        state = ((fast.position - 1) + 26 * (middle.position - 1) +
+                 676 * (slow.position - 1))
+
+        result = bytearray(len(codes))
+        i = 0
+        if isinstance(table, list):
+            built = self.__compiledBlocks
+            max_blocks = max(1, self.__compileOptions[1] // 26)
+            for c in codes:
+                state = successor[state]
+                block = table[state // 26]
+                if block is None:
+                    # evict the oldest blocks when full
+                    while len(built) >= max_blocks:
+                        table[built.popleft()] = None
+                    block = table[state // 26] = build(state // 26)
+                    built.append(state // 26)
+                result[i] = block[state % 26 * 26 + c]
+                i += 1
+        else:
+            for c in codes:
+                state = successor[state]
+                result[i] = table[state * 26 + c]
+                i += 1
+
+        self._set_positions((state % 26, state // 26 % 26, state // 676))
+        return bytes(result)
+
+    def _set_positions(self, positions):
+        """move the fast, middle and slow rotors to positions (0-25)"""
+        for r in range(0, 3):
+            self.__rotors[r].position = positions[r] + 1
+
+    def _tables(self):
+        """return integer lookup tables for the current machine key
+
+        Tables are indexed by rotor position (0-25) and then by letter.
+        The plugboard is folded into the fast rotor tables, and the slow
+        rotor, static rotor (M4) and reflector are folded into the inner
+        table.
+
+        Returns a tuple of:
+
+        - positions: tuple of the current fast, middle and slow positions
+
+        - fast_in, fast_out: plugboard and fast rotor, forwards/backwards
+
+        - mid_fwd, mid_inv: middle rotor, forwards/backwards
+
+        - inner: slow rotor, reflector and back through the slow rotor
+
+        - notch0, notch1: turnover flags of the fast and middle rotors
+        """
+
+        fast, middle, slow = self.__rotors[0:3]
+        plug = self.__plugboard.mapping
+        reflector = [ord(c) - 65 for c in self.__reflect.wiring]
+
+        # M4 static rotor never moves, so it joins the reflector
+        if self.__model == 'M4':
+            static_fwd = self.__rotors[3].forward_table
+            static_inv = self.__rotors[3].inverse_table
+            reflector = [static_inv[reflector[static_fwd[x]]]
+                         for x in range(0, 26)]
+
+        fast_fwd, fast_inv = self.__position_tables(fast)
+        mid_fwd, mid_inv = self.__position_tables(middle)
+        slow_fwd, slow_inv = self.__position_tables(slow)
+
+        fast_in = [[t[plug[x]] for x in range(0, 26)] for t in fast_fwd]
+        fast_out = [[plug[t[x]] for x in range(0, 26)] for t in fast_inv]
+        inner = [[slow_inv[p][reflector[slow_fwd[p][x]]]
+                  for x in range(0, 26)] for p in range(0, 26)]
+
+        notch0, notch1 = self._notches()
+
+        positions = (fast.position - 1, middle.position - 1,
+                     slow.position - 1)
+
+        return (positions, fast_in, fast_out, mid_fwd, mid_inv, inner,
+                notch0, notch1)
+
+    def _notches(self):
+        """return turnover flags (by position) of the fast and middle rotors"""
+        return ([p in self.__rotors[0].turnover_positions for p in range(0, 26)],
+                [p in self.__rotors[1].turnover_positions for p in range(0, 26)])
+
+    def _turnovers(self):
+        """return the turnover positions (sets of 0-25) of the fast and
+        middle rotors"""
+        return (self.__rotors[0].turnover_positions,
+                self.__rotors[1].turnover_positions)
+
+    @staticmethod
+    def __position_tables(rotor):
+        """re-index a rotor's offset tables by rotor position"""
+        ring = rotor.ringSetting - 1
+        forward = [rotor.forward_tables[(p - ring) % 26] for p in range(0, 26)]
+        inverse = [rotor.inverse_tables[(p - ring) % 26] for p in range(0, 26)]
+        return forward, inverse
+
     def rotor_pos(self, rotor):
         """returns the current position of indicated rotor"""
         if rotor == "r1":
@@ -172,3 +644,75 @@ class EnigmaMachine:
               not (reflect.upper() == "UKW-B" or reflect.upper() == "UKW-C")):
 
             raise enigma_exception.InvalidReflector(self.__model)
+
+
+def _plugs(mapping):
+    """return the plugs (2 character strings) wiring a plugboard mapping"""
+    return [chr(65 + a) + chr(65 + b) for a, b in enumerate(mapping) if a < b]
+
+
+def _key_from_bytes(data):
+    """return the MachineKey encoded by EnigmaMachine.to_bytes()"""
+    data = bytes(data)
+    i = data[0] + 1
+    model = data[1:i].decode("ascii")
+    reflector = data[i + 1:i + 1 + data[i]].decode("ascii")
+    i += 1 + data[i]
+    count = data[i]
+    rotors = tuple([tuple(data[j:j + 3])
+                    for j in range(i + 1, i + 1 + 3 * count, 3)])
+    plugboard = tuple(data[i + 1 + 3 * count:])
+    if len(plugboard) != 26:
+        raise ValueError("invalid machine key bytes")
+
+    return MachineKey(model, rotors, reflector, plugboard)
+
+
+@functools.lru_cache(maxsize=64)
+def _successors(turnover0, turnover1):
+    """return the list giving the rotor state after a key press, with
+    states numbered fast + 26 * middle + 676 * slow, for the turnover
+    positions (frozensets of 0-25) of the fast and middle rotors
+
+    The list only depends on the rotors' notches, so it is shared by the
+    compiled tables of every machine with the same fast and middle rotors.
+    """
+
+    successor = []
+    for state in range(0, _STATES):
+        p0, p1, p2 = state % 26, state // 26 % 26, state // 676
+        if p1 in turnover1:
+            p1 = (p1 + 1) % 26
+            p2 = (p2 + 1) % 26
+        elif p0 in turnover0:
+            p1 = (p1 + 1) % 26
+        p0 = (p0 + 1) % 26
+        successor.append(p0 + 26 * p1 + 676 * p2)
+    return successor
+
+
+def _press(p0, p1, p2, notch0, notch1):
+    """return the fast, middle and slow positions after a key press"""
+    if notch1[p1]:
+        return (p0 + 1) % 26, (p1 + 1) % 26, (p2 + 1) % 26
+    elif notch0[p0]:
+        return (p0 + 1) % 26, (p1 + 1) % 26, p2
+    return (p0 + 1) % 26, p1, p2
+
+
+def _unpress(p0, p1, p2, notch0, notch1):
+    """return the fast, middle and slow positions before a key press
+
+    A middle rotor one past its notch may have been double stepped, or
+    may have been set there and not moved.  The double step is assumed
+    when the fast rotor carried the middle rotor onto its notch on the
+    key press before, as in normal operation.
+    """
+
+    p0 = (p0 - 1) % 26
+    if notch1[(p1 - 1) % 26] and (notch0[p0] or notch1[p1] or
+                                  notch0[(p0 - 1) % 26]):
+        return p0, (p1 - 1) % 26, (p2 - 1) % 26
+    elif notch0[p0]:
+        return p0, (p1 - 1) % 26, p2
+    return p0, p1, p2
@@ -0,0 +1,227 @@
+"""Plugboard recovery by hill climbing
+
+Once the rotor settings of a message are known, the plugs are found by
+trying plug changes one at a time and keeping those that make the
+decryption score better.  The rotors and reflector do not depend on the
+plugboard, so their permutation at every message position is computed
+once; a trial plugboard is then scored by mapping each letter through the
+26-entry plugboard on either side of that permutation, without running
+the machine again.  A plug change only changes the letters at the
+positions whose ciphertext letter, or letter leaving the rotors, is
+plugged differently, so only these are decrypted again for each trial.
+"""
+
+import collections
+import random
+from enigma import enigma_machine
+from enigma import crack
+
+Plugs = collections.namedtuple("Plugs", ["plugs", "score"])
+Plugs.__doc__ = """recovered plugboard
+
+- plugs: list of plugs represented as 2 character strings
+- score: score of the decryption with these plugs
+"""
+
+
+def recover_plugs(machine, ciphertext, score=None, max_plugs=10,
+                  restarts=0, seed=None):
+    """find the plugs of a message whose rotor settings are known
+
+    Arguments:
+
+    - machine: EnigmaMachine set to the key of the message; its plugs are
+    the first guess and its rotors are not moved
+
+    - ciphertext: string of letters (A-Z, any case, others dropped)
+
+    - score: function scoring the decryption (bytes of integers 0-25),
+    higher is better; defaults to the index of coincidence.  Each climb
+    starts with the index of coincidence, which finds most plugs from few
+    of them, and then goes on with score (e.g. an ngram.NgramScorer), which
+    gets stuck when started far from the plugs
+
+    - max_plugs: most plugs used
+
+    - restarts: number of further climbs from random plugboards
+
+    - seed: seed of the random plugboards
+
+    Returns the Plugs of the best climb
+    """
+
+    if score is None:
+        score = crack.index_of_coincidence
+
+    codes = crack._codes(ciphertext)
+    perms = scramblers(machine, len(codes))
+    rng = random.Random(seed)
+
+    starts = [machine.snapshot(True).plugboard]
+    starts += [_random_mapping(rng, max_plugs) for x in range(0, restarts)]
+
+    best = None
+    for mapping in starts:
+        result = _climb(perms, codes, mapping, crack.index_of_coincidence,
+                        max_plugs)
+        if score is not crack.index_of_coincidence:
+            result = _climb(perms, codes, result[0], score, max_plugs)
+        if best is None or result[1] > best[1]:
+            best = result
+
+    mapping, value = best
+    return Plugs(enigma_machine._plugs(mapping), value)
+
+
+def scramblers(machine, count):
+    """return the permutation of the rotors and reflector (without the
+    plugboard) at each of the next count key presses
+
+    Arguments:
+
+    - machine: EnigmaMachine, its rotors are not moved
+
+    - count: number of key presses
+
+    Returns a list of tuples of 26 integers
+    """
+
+    key = machine.snapshot(True)
+    plain = enigma_machine.EnigmaMachine.from_bytes(machine.to_bytes())
+    plain.restore(key._replace(plugboard=tuple(range(0, 26))))
+
+    (p0, p1, p2), fast_in, fast_out, mid_fwd, mid_inv, inner, \
+        notch0, notch1 = plain._tables()
+
+    perms = []
+    for x in range(0, count):
+        p0, p1, p2 = enigma_machine._press(p0, p1, p2, notch0, notch1)
+        fi, fo, mf, mi, inn = fast_in[p0], fast_out[p0], mid_fwd[p1], \
+            mid_inv[p1], inner[p2]
+        perms.append(tuple([fo[mi[inn[mf[fi[c]]]]] for c in range(0, 26)]))
+    return perms
+
+
+def _decrypt(perms, codes, mapping):
+    """decrypt letters through the plugboard on either side of each
+    position's permutation"""
+    return bytes([mapping[p[mapping[c]]] for p, c in zip(perms, codes)])
+
+
+def _climb(perms, codes, mapping, score, max_plugs):
+    """keep the best plug change until none improves the score
+
+    Returns the final mapping and its score
+    """
+
+    text = _Decryption(perms, codes, mapping)
+    best = score(text.letters)
+    improved = True
+    while improved:
+        improved = False
+        for a in range(0, 26):
+            for b in range(a + 1, 26):
+                for trial in _rewire(mapping, a, b, max_plugs):
+                    value = score(text.trial(trial))
+                    if value > best:
+                        mapping, best, improved = trial, value, True
+                        text.plug(mapping)
+                        break
+
+    return mapping, best
+
+
+class _Decryption:
+    """decryption of a message through a plugboard, keeping the positions
+    of each letter on either side of the rotors"""
+
+    def __init__(self, perms, codes, mapping):
+        """
+        Arguments:
+
+        - perms: permutations of the rotors at each position, see
+        scramblers()
+
+        - codes: ciphertext letters (integers 0-25)
+
+        - mapping: plugboard, tuple of 26 integers
+        """
+
+        self.__inputs = [[] for c in range(0, 26)]
+        self.__perms = [[] for c in range(0, 26)]
+        for i, (p, c) in enumerate(zip(perms, codes)):
+            self.__inputs[c].append(i)
+            self.__perms[c].append(p)
+        self.__length = len(codes)
+        self.plug(mapping)
+
+    def plug(self, mapping):
+        """decrypt the whole message through mapping"""
+
+        letters = bytearray(self.__length)
+        outputs = [[] for c in range(0, 26)]
+        for c in range(0, 26):
+            m = mapping[c]
+            for i, p in zip(self.__inputs[c], self.__perms[c]):
+                letters[i] = mapping[p[m]]
+                outputs[p[m]].append(i)
+
+        self.__mapping = mapping
+        self.__outputs = outputs
+        self.letters = bytes(letters)
+
+    def trial(self, mapping):
+        """return the decryption through another mapping (bytes), only
+        decrypting again the positions it plugs differently"""
+
+        current = self.__mapping
+        plugged = [c for c in range(0, 26) if mapping[c] != current[c]]
+        letters = bytearray(self.letters)
+
+        # letters leaving the rotors plugged differently, then ciphertext
+        # letters plugged differently, which go through the rotors again
+        for c in plugged:
+            m = mapping[c]
+            for i in self.__outputs[c]:
+                letters[i] = m
+        for c in plugged:
+            m = mapping[c]
+            for i, p in zip(self.__inputs[c], self.__perms[c]):
+                letters[i] = mapping[p[m]]
+        return bytes(letters)
+
+
+def _rewire(mapping, a, b, max_plugs):
+    """return the mappings trying a and b plugged together (or unplugged if
+    they already are), without more than max_plugs plugs"""
+
+    if mapping[a] == b:
+        trial = list(mapping)
+        trial[a], trial[b] = a, b
+        return [tuple(trial)]
+
+    # connect a and b, leaving their former partners unplugged or
+    # plugging them together
+    x, y = mapping[a], mapping[b]
+    trial = list(mapping)
+    trial[x], trial[y] = x, y
+    trial[a], trial[b] = b, a
+    trials = [trial]
+    if x != a and y != b:
+        swapped = list(trial)
+        swapped[x], swapped[y] = y, x
+        trials.append(swapped)
+
+    return [tuple(t) for t in trials
+            if sum(1 for c in range(0, 26) if t[c] > c) <= max_plugs]
+
+
+def _random_mapping(rng, max_plugs):
+    """return a mapping of up to max_plugs random plugs"""
+    letters = list(range(0, 26))
+    rng.shuffle(letters)
+    mapping = list(range(0, 26))
+    for x in range(0, rng.randint(0, max_plugs)):
+        a, b = letters[2 * x], letters[2 * x + 1]
+        mapping[a], mapping[b] = b, a
+    return tuple(mapping)
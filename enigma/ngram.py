@@ -0,0 +1,355 @@
+"""N-gram language scores
+
+A text is scored by the sum of the log probabilities of its n-grams
+(e.g. trigrams), taken from n-gram counts of the language.  The closer a
+trial decryption is to real language, the higher its score.
+
+Counts are taken from a text corpus piece by piece, so a corpus of any
+size is counted in constant memory.  The log probabilities are saved in a
+small binary file: an 8 byte header (b"NGRM", format version, n and two
+reserved bytes) followed by one little-endian 32-bit float per n-gram,
+indexed with letters as digits of a base 26 number (26^4 entries, 1.8 MB,
+for quadgrams).  Loaded files are memory-mapped rather than read, so
+loading is instant and every process scoring with the same file shares
+its pages through the page cache; a scorer pickled to a worker process
+only carries the file path.  NumPy is optional; with it a whole text (or
+a 2D array of texts) is scored in a few array operations.
+"""
+
+import array
+import math
+import mmap
+import struct
+import sys
+from enigma import enigma_machine
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# bytes of a corpus read per piece
+CHUNK_SIZE = 1 << 20
+
+_MAGIC = b"NGRM"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBB2x")
+
+
+class NgramScorer:
+    """log probability score of letters from n-gram counts"""
+
+    __slots__ = ("__n", "__table", "__path", "__map")
+
+    def __init__(self, counts, floor=0.01):
+        """scorer set up
+
+        Arguments:
+
+        - counts: dict of n-gram (string of n letters A-Z) to count, all
+        n-grams of the same length
+
+        - floor: count given to n-grams missing from counts
+        """
+
+        lengths = {len(ngram) for ngram in counts}
+        if len(lengths) != 1:
+            raise ValueError("n-grams must all have the same length")
+
+        n = lengths.pop()
+        table = [0] * (26 ** n)
+        for ngram, count in counts.items():
+            table[_index(ngram.upper())] = count
+        self.__setup(n, _log_table(table, floor))
+
+    def __setup(self, n, table, path=None, map=None):
+        self.__n = n
+        self.__table = table
+        self.__path = path
+        self.__map = map
+
+    def __getstate__(self):
+        """pickle the path of a loaded table rather than the table"""
+        if self.__path is not None:
+            return (self.__n, None, self.__path)
+        return (self.__n, list(self.__table), None)
+
+    def __setstate__(self, state):
+        n, table, path = state
+        if path is not None:
+            self.__setup(*_map_table(path))
+        else:
+            self.__setup(n, _log_table(table))
+
+    @classmethod
+    def from_file(cls, path, floor=0.01):
+        """load n-gram counts from a text file of "NGRAM COUNT" lines"""
+        counts = {}
+        with open(path) as file:
+            for line in file:
+                fields = line.split()
+                if fields:
+                    counts[fields[0]] = int(fields[1])
+        return cls(counts, floor)
+
+    @classmethod
+    def from_text(cls, text, n=3, floor=0.01):
+        """count the n-grams of a sample text (letters A-Z, any case)"""
+        counter = NgramCounter(n)
+        counter.update(text.encode("ascii", "ignore"))
+        return counter.scorer(floor)
+
+    @classmethod
+    def from_corpus(cls, paths, n=4, floor=0.01):
+        """count the n-grams of text files (letters A-Z, any case), see
+        NgramCounter"""
+        counter = NgramCounter(n)
+        for path in paths:
+            counter.update_file(path)
+        return counter.scorer(floor)
+
+    @classmethod
+    def load(cls, path):
+        """memory-map a table saved by save()"""
+        return cls._from_table(*_map_table(path))
+
+    @classmethod
+    def _from_table(cls, n, table, path=None, map=None):
+        """return a scorer of a table of log probabilities"""
+        scorer = cls.__new__(cls)
+        scorer.__setup(n, table, path, map)
+        return scorer
+
+    def save(self, path):
+        """save the table in the binary format loaded by load()"""
+        with open(path, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, _VERSION, self.__n))
+            if numpy is not None:
+                file.write(numpy.asarray(self.__table, dtype="<f4").tobytes())
+            else:
+                values = array.array("f", self.__table)
+                if sys.byteorder != "little":
+                    values.byteswap()
+                file.write(values.tobytes())
+
+    def close(self):
+        """unmap a loaded table, the scorer can no longer be used"""
+        if self.__map is not None:
+            self.__table = None
+            self.__map.close()
+            self.__map = None
+
+    @property
+    def n(self):
+        """return the n-gram length"""
+        return self.__n
+
+    @property
+    def path(self):
+        """return the file of a loaded table (None if built in memory)"""
+        return self.__path
+
+    @property
+    def table(self):
+        """return the log probabilities indexed by n-gram, with letters as
+        digits of a base 26 number"""
+        return self.__table
+
+    def __call__(self, codes):
+        """return the score of letters (integers 0-25)
+
+        Arguments:
+
+        - codes: bytes, list or NumPy array of letters; a 2D array scores
+        each row, returning a NumPy array of scores
+        """
+
+        n = self.__n
+        if numpy is not None:
+            return self.__score_array(codes)
+        if len(codes) < n:
+            return 0.0
+
+        table = self.__table
+        size = 26 ** (n - 1)
+        index = 0
+        for c in codes[0:n - 1]:
+            index = index * 26 + c
+
+        score = 0.0
+        for c in codes[n - 1:]:
+            index = index % size * 26 + c
+            score += table[index]
+        return score
+
+    def __score_array(self, codes):
+        """score letters with NumPy"""
+        if isinstance(codes, (bytes, bytearray, memoryview)):
+            codes = numpy.frombuffer(codes, dtype=numpy.uint8)
+        else:
+            codes = numpy.asarray(codes)
+
+        n = self.__n
+        count = codes.shape[-1] - n + 1
+        if count < 1:
+            scores = numpy.zeros(codes.shape[:-1])
+        else:
+            index = codes[..., 0:count].astype(numpy.intp)
+            for k in range(1, n):
+                index *= 26
+                index += codes[..., k:k + count]
+            scores = self.__table[index].sum(axis=-1, dtype=numpy.float64)
+
+        if codes.ndim == 1:
+            return float(scores)
+        return scores
+
+
+class NgramCounter:
+    """Counts the n-grams of a text read piece by piece
+
+    Letters are upper cased and other characters dropped, so n-grams span
+    words and lines; the last n - 1 letters of a piece carry over to the
+    next one.
+    """
+
+    __slots__ = ("__n", "__counts", "__tail")
+
+    def __init__(self, n=4):
+        """
+        Arguments:
+
+        - n: n-gram length (1-5)
+        """
+
+        if not 1 <= n <= 5:
+            raise ValueError("n-grams must have 1 to 5 letters")
+        self.__n = n
+        self.__tail = b""
+        if numpy is not None:
+            self.__counts = numpy.zeros(26 ** n, dtype=numpy.int64)
+        else:
+            self.__counts = [0] * (26 ** n)
+
+    @property
+    def n(self):
+        """return the n-gram length"""
+        return self.__n
+
+    @property
+    def counts(self):
+        """return the counts indexed by n-gram, with letters as digits of a
+        base 26 number"""
+        return self.__counts
+
+    @property
+    def total(self):
+        """return the number of n-grams counted"""
+        if numpy is not None:
+            return int(self.__counts.sum())
+        return sum(self.__counts)
+
+    def update(self, data):
+        """count the n-grams of a piece of text (bytes, ASCII)"""
+        codes = self.__tail + _letters(data)
+        n = self.__n
+        self.__tail = codes[max(0, len(codes) - n + 1):]
+        count = len(codes) - n + 1
+        if count < 1:
+            return
+
+        if numpy is not None:
+            codes = numpy.frombuffer(codes, dtype=numpy.uint8)
+            index = codes[0:count].astype(numpy.intp)
+            for k in range(1, n):
+                index *= 26
+                index += codes[k:k + count]
+            self.__counts += numpy.bincount(index, minlength=len(self.__counts))
+            return
+
+        counts = self.__counts
+        size = 26 ** (n - 1)
+        index = 0
+        for c in codes[0:n - 1]:
+            index = index * 26 + c
+        for c in codes[n - 1:]:
+            index = index % size * 26 + c
+            counts[index] += 1
+
+    def update_file(self, path, size=CHUNK_SIZE):
+        """count the n-grams of a text file, reading size bytes at a time"""
+        with open(path, "rb") as file:
+            for data in iter(lambda: file.read(size), b""):
+                self.update(data)
+
+    def scorer(self, floor=0.01):
+        """return an NgramScorer of the counts"""
+        return NgramScorer._from_table(self.__n,
+                                       _log_table(self.__counts, floor))
+
+
+def _letters(data):
+    """return the letters of ASCII bytes (others dropped) as integers"""
+    return data.upper().translate(enigma_machine._TO_CODES, _NOT_LETTERS)
+
+
+_NOT_LETTERS = bytes(b for b in range(0, 256) if not 65 <= b <= 90)
+
+
+def _log_table(counts, floor=None):
+    """return log10 probabilities of counts (or floats already logs if
+    floor is None) as a float32 array (or a list without NumPy)"""
+
+    if floor is None:
+        if numpy is not None:
+            return numpy.asarray(counts, dtype=numpy.float32)
+        return list(counts)
+
+    total = int(numpy.sum(counts)) if numpy is not None else sum(counts)
+    if total == 0:
+        raise ValueError("no n-grams counted")
+    missing = math.log10(floor / total)
+    if numpy is not None:
+        counts = numpy.asarray(counts, dtype=numpy.float64)
+        with numpy.errstate(divide="ignore"):
+            table = numpy.log10(counts / float(total))
+        table[counts == 0] = missing
+        return table.astype(numpy.float32)
+    return [math.log10(c / total) if c else missing for c in counts]
+
+
+def _map_table(path):
+    """memory-map a saved table, return the __setup() arguments"""
+    with open(path, "rb") as file:
+        map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        if len(map) < _HEADER.size:
+            raise ValueError(path + " is not an n-gram table")
+        magic, version, n = _HEADER.unpack_from(map)
+        if magic != _MAGIC or version != _VERSION or not 1 <= n <= 5:
+            raise ValueError(path + " is not an n-gram table")
+        if len(map) != _HEADER.size + 4 * 26 ** n:
+            raise ValueError(path + " is truncated")
+    except ValueError:
+        map.close()
+        raise
+
+    if numpy is not None:
+        table = numpy.frombuffer(map, dtype="<f4", offset=_HEADER.size)
+    elif sys.byteorder == "little":
+        table = memoryview(map)[_HEADER.size:].cast("f")
+    else:
+        table = array.array("f", map[_HEADER.size:])
+        table.byteswap()
+    return n, table, path, map
+
+
+def _index(ngram):
+    """return the table index of an n-gram"""
+    index = 0
+    for c in ngram:
+        if not "A" <= c <= "Z":
+            raise ValueError(repr(ngram) + " is not an n-gram of letters")
+        index = index * 26 + ord(c) - 65
+    return index
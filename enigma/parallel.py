@@ -0,0 +1,147 @@
+"""Multi-core encryption of large inputs
+
+The letter stream is split into chunks.  The starting rotor positions of
+each chunk follow from its letter offset (see EnigmaMachine.advance), so
+the chunks are encrypted independently in a process pool and joined in
+order.  A ParallelEncryptor keeps its pool for the pieces of a stream.
+"""
+
+import multiprocessing
+import os
+from enigma import enigma_exception
+from enigma import enigma_machine
+from enigma import vectorized
+
+# inputs shorter than this are not worth shipping to other processes
+MIN_CHUNK = 1 << 16
+
+# machine shared by the chunks of a worker process, see _init_worker()
+_machine = None
+
+
+def encrypt_text(machine, text, jobs=None):
+    """pass a whole string of letters through the machine on many cores
+
+    Arguments:
+
+    - machine: EnigmaMachine, left in the same state as after encrypting
+    each letter with encrypt()
+
+    - text: string of letters (A-Z, any case)
+
+    - jobs: number of worker processes (defaults to the number of CPUs)
+
+    Returns the encrypted string in upper case
+    """
+
+    text = text.upper()
+    invalid = enigma_machine._INVALID.search(text)
+    if invalid is not None:
+        raise enigma_exception.InvalidCharacter(invalid.group())
+
+    codes = text.encode("ascii").translate(enigma_machine._TO_CODES)
+    result = encrypt_codes(machine, codes, jobs)
+    return result.translate(enigma_machine._TO_LETTERS).decode("ascii")
+
+
+def encrypt_codes(machine, codes, jobs=None):
+    """pass a sequence of letters (as integers 0-25) through the machine
+    on many cores
+
+    Arguments:
+
+    - machine: EnigmaMachine, left in the same state as after encrypting
+    each letter with encrypt()
+
+    - codes: bytes-like object of integers (0-25)
+
+    - jobs: number of worker processes (defaults to the number of CPUs)
+
+    Returns the encrypted letters as a bytes object of integers (0-25)
+    """
+
+    with ParallelEncryptor(jobs) as encryptor:
+        return encryptor.encrypt_codes(machine, codes)
+
+
+class ParallelEncryptor:
+    """Encrypts large inputs on a process pool kept from one input to the
+    next
+
+    The pool is started by the first input worth splitting, and each chunk
+    carries the machine key it starts from, so the workers follow the
+    machine between inputs without being started again.  Use it as a
+    context manager, or call close(), to stop the pool.
+    """
+
+    def __init__(self, jobs=None):
+        """
+        Arguments:
+
+        - jobs: number of worker processes (defaults to the number of CPUs)
+        """
+
+        self.__jobs = jobs or os.cpu_count() or 1
+        self.__pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """stop the worker processes"""
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool.join()
+            self.__pool = None
+
+    def encrypt_codes(self, machine, codes):
+        """pass a sequence of letters (as integers 0-25) through the
+        machine, an engine as accepted by stream.StreamEncryptor
+
+        Arguments:
+
+        - machine: EnigmaMachine (of the same model for every call), left
+        in the same state as after encrypting each letter with encrypt()
+
+        - codes: bytes-like object of integers (0-25)
+
+        Returns the encrypted letters as a bytes object of integers (0-25)
+        """
+
+        if machine.stats is not None:
+            return machine.stats.measure(machine, self.encrypt_codes, codes)
+
+        jobs = self.__jobs
+        if jobs < 2 or len(codes) < 2 * MIN_CHUNK:
+            return vectorized.encrypt_codes(machine, codes)
+
+        if self.__pool is None:
+            self.__pool = multiprocessing.Pool(jobs, _init_worker, (machine,))
+
+        # several chunks per worker keep the pool busy until the end
+        key = machine.snapshot(True)
+        size = max(MIN_CHUNK, -(-len(codes) // (jobs * 4)))
+        chunks = [(key, offset, bytes(codes[offset:offset + size]))
+                  for offset in range(0, len(codes), size)]
+        result = b"".join(self.__pool.imap(_encrypt_chunk, chunks))
+
+        machine.advance(len(codes))
+        return result
+
+
+def _init_worker(machine):
+    """keep a copy of the machine in the worker"""
+    global _machine
+    _machine = machine
+
+
+def _encrypt_chunk(chunk):
+    """encrypt the letters of a chunk starting at its letter offset from
+    a machine key"""
+    key, offset, codes = chunk
+    _machine.restore(key)
+    _machine.advance(offset)
+    return vectorized.encrypt_codes(_machine, codes)
@@ -4,14 +4,36 @@ from enigma import enigma_exception
 class Plugboard:
     """This is a the plugboard component of an Enigma Machine"""
 
+    __slots__ = ("__maxPlugs", "__plugs", "__mapping", "__used")
+
     def __init__(self, max_plugs):
         self.__maxPlugs = max_plugs
-        self.__plugs = []
+
+        # letters (ASCII) at either end of each plug, in order added
+        self.__plugs = bytearray()
+
+        # letter each socket is wired to, and bitmask of sockets in use
+        self.__mapping = bytearray(range(0, 26))
+        self.__used = 0
+
+    def __getstate__(self):
+        return self.__maxPlugs, bytes(self.__plugs)
+
+    def __setstate__(self, state):
+        self.__init__(state[0])
+        for x in range(0, len(state[1]), 2):
+            self.add_plug(state[1][x:x + 2].decode("ascii"))
 
     @property
     def plugs(self):
         """Returns list of currently used plugs"""
-        return self.__plugs
+        plugs = self.__plugs.decode("ascii")
+        return [[plugs[x], plugs[x + 1]] for x in range(0, len(plugs), 2)]
+
+    @property
+    def mapping(self):
+        """Returns the letter (0-25) each socket is wired to."""
+        return tuple(self.__mapping)
 
     @property
     def max_plugs(self):
@@ -21,7 +43,7 @@ class Plugboard:
     @property
     def available_plugs(self):
         """Returns the number of plugs left available to use."""
-        return self.__maxPlugs - len(self.__plugs)
+        return self.__maxPlugs - len(self.__plugs) // 2
 
     def add_plug(self, plug):
         """Add the a specified plug, if not already present."""
@@ -30,60 +52,93 @@ class Plugboard:
         self.__plugs_available_check(1)
 
         # check for duplicate
-        self.__plug_check(plug)
+        sockets = self.__plug_check(plug, self.__used)
 
-        # add plug to list
-        self.__plugs.append(list(plug))
+        # add plug to list, and wire its sockets
+        self.__connect(plug, sockets)
 
     def add_all(self, plugs):
         """Add many specified plugs, if not already present."""
         # check if enough plugs are available
         self.__plugs_available_check(len(plugs))
 
-        # check for duplicates
+        # check for duplicates, including within the new plugs
+        used = self.__used
         for p in plugs:
-            self.__plug_check(p)
+            used |= self.__plug_check(p, used)
 
         # add plugs to plugboard
         for p in plugs:
-            self.add_plug(p)
+            self.__connect(p, self.__sockets(p))
 
     def remove_plug(self, plug):
         """Remove specified plug, if present"""
-        if list(plug) in self.__plugs:
-            del self.__plugs[self.__plugs.index(list(plug))]
+        index = self.__index(plug)
+        if index is not None:
+            del self.__plugs[index:index + 2]
+            a, b = self.__letters(plug)
+            self.__mapping[a] = a
+            self.__mapping[b] = b
+            self.__used &= ~self.__sockets(plug)
         else:
             raise enigma_exception.NoSuchPlug(plug)
 
     def clear(self):
         """Remove all plugs."""
         del self.__plugs[:]
+        self.__mapping[:] = range(0, 26)
+        self.__used = 0
 
     def encrypt(self, start):
         """Pass a chr (represented as an integer through the plugboard."""
-        # If the plug exists, swap the letters
-        for plug in self.__plugs:
-            if ord(plug[0]) - 65 == start:
-                return ord(plug[1]) - 65
-            elif ord(plug[1]) - 65 == start:
-                return ord(plug[0]) - 65
-
-        # Otherwise, return the passed value unchanged
-        return start
-
-    def __plug_check(self, plug):
-        """Check for duplicate plugs"""
-        for_plug = list(plug)
-        rev_plug = [for_plug[1], for_plug[0]]
-
-        # check if plug plugs into self
-        if for_plug[0] == for_plug[1]:
+        return self.__mapping[start]
+
+    def __connect(self, plug, sockets):
+        """Record plug and wire its two letters to each other"""
+        a, b = self.__letters(plug)
+        self.__plugs += bytes([a + 65, b + 65])
+        self.__mapping[a] = b
+        self.__mapping[b] = a
+        self.__used |= sockets
+
+    def __index(self, plug):
+        """Index of a plug (letters in the same order) in the plug list"""
+        if len(plug) != 2:
+            return None
+
+        pair = "".join(plug).encode("ascii", "replace")
+        for x in range(0, len(self.__plugs), 2):
+            if self.__plugs[x:x + 2] == pair:
+                return x
+        return None
+
+    def __plug_check(self, plug, used):
+        """Check for duplicate plugs, returns bitmask of the plug's sockets"""
+        sockets = self.__sockets(plug)
+
+        # check if plug plugs into self, or a socket is already used
+        if bin(sockets).count("1") != 2 or sockets & used:
             raise enigma_exception.DuplicatePlug(plug)
 
-        # check for duplicate sockets are used
-        for pair in self.__plugs:
-            if for_plug[0] in list(pair) or for_plug[1] in list(pair):
-                raise enigma_exception.DuplicatePlug(plug)
+        return sockets
+
+    @classmethod
+    def __sockets(cls, plug):
+        """Bitmask of the sockets used by a plug"""
+        a, b = cls.__letters(plug)
+        return (1 << a) | (1 << b)
+
+    @staticmethod
+    def __letters(plug):
+        """Letters (0-25) at either end of a plug"""
+        if len(plug) != 2:
+            raise enigma_exception.InvalidCharacter(plug)
+
+        a, b = plug
+        for letter in (a, b):
+            if not "A" <= letter <= "Z":
+                raise enigma_exception.InvalidCharacter(letter)
+        return ord(a) - 65, ord(b) - 65
 
     def __plugs_available_check(self, plugCount):
         """Check for plug availability"""
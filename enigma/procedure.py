@@ -0,0 +1,251 @@
+"""Message key procedures
+
+Operators did not encrypt messages at the rotor positions of the daily
+key.  Each message had a key of its own, the rotor positions (one letter
+per rotor, left to right) the body was encrypted at, sent encrypted as
+the indicator of the message:
+
+- until 1940, the message key was typed twice at the daily ground setting
+(Grundstellung) and the six letters typed sent as the indicator;
+
+- from 1940, the operator chose a start position, sent it in the clear,
+and typed the message key once at it.
+
+A KeyProcedure repositions a single machine set to the daily key (rotor
+order, ring settings, reflector and plugs) for every indicator and
+message, rather than assembling a machine per message.  The machine is
+compiled once, so a day's traffic costs a few table lookups per letter,
+and the indicators of the doubled procedure, all encrypted at the same
+ground setting, are looked up in tables built once.
+"""
+
+import collections
+from enigma import enigma_exception
+from enigma import enigma_machine
+from enigma import stream
+
+Message = collections.namedtuple("Message", ["start", "indicator", "text"])
+Message.__doc__ = """encrypted message
+
+- start: start position sent in the clear (None for the doubled
+  indicator procedure)
+- indicator: message key as encrypted by the procedure
+- text: ciphertext of the body
+"""
+
+Decrypted = collections.namedtuple("Decrypted", ["key", "text"])
+Decrypted.__doc__ = """decrypted message
+
+- key: message key
+- text: plaintext of the body
+"""
+
+
+class KeyProcedure:
+    """Encrypts and decrypts messages with message keys and indicators"""
+
+    def __init__(self, machine, ground=None, compile=True, **options):
+        """
+        Arguments:
+
+        - machine: EnigmaMachine set to the daily key, its rotor positions
+        are changed for every message
+
+        - ground: ground setting (e.g. "ABL") for the doubled indicator
+        procedure, or None for start positions sent in the clear
+
+        - compile: compile the machine (worth it beyond a few dozen
+        messages)
+
+        - options: formatting options of the bodies, see StreamEncryptor
+        """
+
+        self.__machine = machine
+        self.__rotors = len(machine.snapshot())
+        self.__options = options
+        self.__ground = None
+        if ground is not None:
+            self.__ground = self.__positions(ground)
+        if compile:
+            machine.compile()
+        if ground is not None:
+            self.__groundTables = self.__ground_tables()
+
+    @property
+    def doubled(self):
+        """return True for the doubled indicator procedure"""
+        return self.__ground is not None
+
+    def encrypt(self, text, key, start=None):
+        """encrypt a message at its message key
+
+        Arguments:
+
+        - text: plaintext of the body
+
+        - key: message key, one letter per rotor from left to right (e.g.
+        "BLA", or "CBLA" with the M4 fourth rotor)
+
+        - start: start position at which the key is encrypted (only
+        without a ground setting)
+
+        Returns a Message
+        """
+
+        return self.encrypt_many([(text, key, start)])[0]
+
+    def decrypt(self, message):
+        """decrypt a Message (or start, indicator, ciphertext tuple)
+
+        Raises InvalidIndicator if a doubled indicator does not decrypt to
+        the same key twice
+
+        Returns a Decrypted message
+        """
+
+        return self.decrypt_many([message])[0]
+
+    def encrypt_many(self, messages):
+        """encrypt messages
+
+        Arguments:
+
+        - messages: iterable of (text, key) tuples, or (text, key, start)
+        tuples without a ground setting
+
+        Returns a list of Messages, in the same order
+        """
+
+        messages = [tuple(m) + (None,) * (3 - len(m)) for m in messages]
+        keys = [self.__positions(key) for text, key, start in messages]
+        indicators = self.__indicators(
+            keys, [start for text, key, start in messages])
+        texts = self.__bodies(keys, [text for text, key, start in messages])
+        return [Message(m[2], indicator, text)
+                for m, indicator, text in zip(messages, indicators, texts)]
+
+    def decrypt_many(self, messages):
+        """decrypt messages
+
+        Arguments:
+
+        - messages: iterable of Messages (or start, indicator, ciphertext
+        tuples)
+
+        Returns a list of Decrypted messages, in the same order
+        """
+
+        messages = [Message(*m) for m in messages]
+        codes = self.__indicators(
+            [self.__codes(m.indicator, self.__rotors * (1 + self.doubled))
+             for m in messages],
+            [m.start for m in messages], decode=True)
+
+        keys = []
+        for m, c in zip(messages, codes):
+            if self.doubled:
+                if c[:self.__rotors] != c[self.__rotors:]:
+                    raise enigma_exception.InvalidIndicator(m.indicator)
+                c = c[:self.__rotors]
+            keys.append(tuple([x + 1 for x in reversed(c)]))
+
+        texts = self.__bodies(keys, [m.text for m in messages])
+        return [Decrypted(_letters(key), text)
+                for key, text in zip(keys, texts)]
+
+    def __indicators(self, keys, starts, decode=False):
+        """encrypt (or decrypt) message keys into indicators
+
+        keys are rotor positions (1-26) when encoding, and the codes of the
+        indicators when decoding; returns indicators (strings) when
+        encoding, and the codes of the keys when decoding
+        """
+
+        if self.doubled:
+            tables = self.__groundTables
+            result = []
+            for key in keys:
+                if not decode:
+                    key = _key_codes(key) * 2
+                codes = bytes([tables[i][c] for i, c in enumerate(key)])
+                result.append(codes if decode else _text(codes))
+            return result
+
+        positions = []
+        for start in starts:
+            if start is None:
+                raise ValueError("a start position is needed without a "
+                                 "ground setting")
+            positions.append(self.__positions(start))
+
+        machine = self.__machine
+        result = [None] * len(keys)
+        for i in _in_order(positions):
+            machine.restore(positions[i])
+            key = keys[i] if decode else _key_codes(keys[i])
+            codes = machine.encrypt_codes(key)
+            result[i] = codes if decode else _text(codes)
+        return result
+
+    def __bodies(self, keys, texts):
+        """encrypt texts at the rotor positions of their keys"""
+
+        machine = self.__machine
+        result = [None] * len(texts)
+        for i in _in_order(keys):
+            machine.restore(keys[i])
+            encryptor = stream.message_encryptor(machine, len(texts[i]),
+                                                 **self.__options)
+            result[i] = encryptor.encrypt(texts[i])
+        return result
+
+    def __ground_tables(self):
+        """return the substitution of each letter of a doubled indicator
+        typed at the ground setting"""
+
+        machine = self.__machine
+        length = 2 * self.__rotors
+        tables = [bytearray(26) for x in range(0, length)]
+        for c in range(0, 26):
+            machine.restore(self.__ground)
+            for i, e in enumerate(machine.encrypt_codes(bytes([c]) * length)):
+                tables[i][c] = e
+        return [bytes(t) for t in tables]
+
+    def __positions(self, key):
+        """return the rotor positions (1-26, fast rotor first) of a key"""
+        return tuple([c + 1 for c in reversed(self.__codes(key,
+                                                           self.__rotors))])
+
+    @staticmethod
+    def __codes(letters, length):
+        """return the codes (0-25) of a key or indicator of length letters"""
+        if not isinstance(letters, str) or len(letters) != length or \
+                enigma_machine._INVALID.search(letters.upper()):
+            raise enigma_exception.InvalidMessageKey(letters, length)
+        return letters.upper().encode("ascii").translate(
+            enigma_machine._TO_CODES)
+
+
+def _key_codes(positions):
+    """return the codes (0-25) typed for a key, left rotor first"""
+    return bytes([p - 1 for p in reversed(positions)])
+
+
+def _letters(positions):
+    """return the letters of rotor positions (1-26, fast rotor first)"""
+    return _text(_key_codes(positions))
+
+
+def _text(codes):
+    """return the letters of codes (0-25)"""
+    return codes.translate(enigma_machine._TO_LETTERS).decode("ascii")
+
+
+def _in_order(positions):
+    """return the indices of rotor positions in the order they are best
+    used: the compiled tables of the M4 depend on the position of its
+    fourth rotor, so positions sharing it are used together"""
+    if positions and len(positions[0]) > 3:
+        return sorted(range(0, len(positions)), key=lambda i: positions[i][3])
+    return range(0, len(positions))
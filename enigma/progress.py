@@ -0,0 +1,148 @@
+"""Progress line of long encryptions
+
+Progress is reported once per piece of input encrypted (see
+stream.encrypt_stream() and stream.encrypt_file()) rather than per
+character, and the line is redrawn at most a few times per second, so
+reporting costs nothing measurable.  Jobs finishing before the first
+redraw show nothing.  The line is written to standard error, and only
+when standard output and standard error are terminals: progress would
+only clutter redirected output or logs.
+"""
+
+import sys
+import time
+
+# seconds between redraws of the progress line
+INTERVAL = 0.2
+
+
+def interactive(file=None):
+    """return True if standard output and file (standard error if None)
+    are terminals"""
+    for f in (sys.stdout, file or sys.stderr):
+        try:
+            if not f.isatty():
+                return False
+        except (AttributeError, ValueError):
+            return False
+    return True
+
+
+class Progress:
+    """Throttled progress line of bytes processed, letters per second and
+    time left"""
+
+    def __init__(self, total=0, label="Encrypting", file=None,
+                 interval=INTERVAL, enabled=True):
+        """
+        Arguments:
+
+        - total: size of the input in bytes (or characters), 0 if unknown
+
+        - label: text at the start of the line
+
+        - file: text file the line is written to (standard error if None)
+
+        - interval: seconds between redraws
+
+        - enabled: if False, progress is counted but never shown
+        """
+
+        self.__total = total
+        self.__label = label
+        self.__file = file or sys.stderr
+        self.__interval = interval
+        self.__enabled = enabled
+        self.__size = 0
+        self.__letters = 0
+        self.__drawn = False
+        self.__width = 0
+        self.__start = time.monotonic()
+        self.__next = self.__start + interval
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def size(self):
+        """return the bytes (or characters) processed"""
+        return self.__size
+
+    @property
+    def letters(self):
+        """return the letters encrypted"""
+        return self.__letters
+
+    def update(self, size, letters=0):
+        """count a piece of input processed
+
+        Arguments:
+
+        - size: bytes (or characters) of the piece
+
+        - letters: letters of the piece encrypted
+        """
+
+        self.__size += size
+        self.__letters += letters
+        if not self.__enabled:
+            return
+
+        now = time.monotonic()
+        if now >= self.__next:
+            self.__next = now + self.__interval
+            self.__draw(now)
+
+    def close(self):
+        """draw the final line, if the line was shown"""
+        if self.__drawn:
+            self.__draw(time.monotonic())
+            self.__file.write("\n")
+            self.__file.flush()
+            self.__drawn = False
+
+    def __draw(self, now):
+        """write the progress line over the last one"""
+
+        elapsed = max(now - self.__start, 1e-9)
+        parts = [self.__label]
+        if self.__total:
+            parts.append("%3d%%" % min(100, 100 * self.__size // self.__total))
+            parts.append("%s of %s" % (_size(self.__size),
+                                       _size(self.__total)))
+        else:
+            parts.append(_size(self.__size))
+        parts.append("%s letters/s" % _count(self.__letters / elapsed))
+
+        if self.__total and self.__size:
+            left = elapsed * (self.__total - self.__size) / self.__size
+            parts.append("ETA %d:%02d" % divmod(int(left + 0.5), 60))
+
+        line = "  ".join(parts)
+        self.__file.write("\r" + line.ljust(self.__width))
+        self.__width = len(line)
+        self.__file.flush()
+        self.__drawn = True
+
+
+def _size(size):
+    """return a size in bytes in a readable unit"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+        size /= 1024.0
+    if unit == "B":
+        return "%d B" % size
+    return "%.1f %s" % (size, unit)
+
+
+def _count(count):
+    """return a count in a readable unit"""
+    if count >= 1e6:
+        return "%.2fM" % (count / 1e6)
+    if count >= 1e3:
+        return "%.1fk" % (count / 1e3)
+    return "%d" % count
@@ -1,23 +1,23 @@
-import configparser
-import os
+from enigma import registry
 
 
 class Reflect:
     """This is the reflector component of an Enigma Machine"""
 
-    config = configparser.ConfigParser(interpolation=configparser.
-                                       ExtendedInterpolation())
+    __slots__ = ("__reflectId", "__wiring")
 
     def __init__(self, reflectId,):
 
-        # set relative path to config file
-        pwd = os.path.dirname(__file__)
-        model_config = os.path.join(pwd, 'model.ini')
+        self.__reflectId = reflectId
+        self.__wiring = registry.reflector(reflectId)
 
+    def __getstate__(self):
+        """pickle the reflector ID, wiring is taken from the registry"""
+        return self.__reflectId
 
-        self.__reflectId = reflectId
-        self.config.read(model_config)
-        self.__wiring = list(Reflect.config.get('Reflectors', reflectId))
+    def __setstate__(self, state):
+        self.__reflectId = state
+        self.__wiring = registry.reflector(state)
 
     @property
     def reflectId(self):
@@ -26,8 +26,8 @@ class Reflect:
     @reflectId.setter
     def reflectId(self, reflectId):
         try:
-            self.__wiring = list(Reflect.config.get('Reflectors', reflectId))
-        except configparser.NoOptionError:
+            self.__wiring = registry.reflector(reflectId)
+        except KeyError:
             print(reflectId + " is not a valid reflector ID.")
         self.__reflectId = reflectId
         return
@@ -35,8 +35,8 @@ class Reflect:
     @property
     def wiring(self):
         """Return the reflector wiring."""
-        return self.__wiring
+        return list(self.__wiring.wiring)
 
     def encrypt(self, letter):
         """Pass a chr (as an integer) through the reflector."""
-        return ord(self.__wiring[letter]) - 65
+        return self.__wiring.table[letter]
@@ -0,0 +1,218 @@
+import collections
+import marshal
+import os
+import sys
+import threading
+import zlib
+
+# wiring definitions shipped with the package
+MODEL_CONFIG = os.path.join(os.path.dirname(__file__), 'model.ini')
+
+# parsed wiring definitions are kept here between processes, like compiled
+# modules, and parsed again when model.ini changes: a per-user directory,
+# as the package directory is often read-only or shared ($ENIGMA_CACHE_DIR
+# overrides it)
+CACHE_DIR = os.environ.get("ENIGMA_CACHE_DIR") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or
+    os.path.join(os.path.expanduser("~"), ".cache"), "enigma")
+_CACHE_VERSION = 1
+
+RotorWiring = collections.namedtuple("RotorWiring", [
+    "wiring", "notch_count", "turnover", "turnover_positions",
+    "forward", "inverse"])
+RotorWiring.__doc__ = """wiring of one rotor, shared by every instance
+
+- wiring: string of 26 letters
+- notch_count: number of notches
+- turnover: string of turnover letters, None for static rotors
+- turnover_positions: frozenset of turnover positions (0-25)
+- forward, inverse: integer wire maps (tuples) for all 26 offsets
+"""
+
+ReflectorWiring = collections.namedtuple("ReflectorWiring",
+                                         ["wiring", "table"])
+ReflectorWiring.__doc__ = """wiring of one reflector
+
+- wiring: string of 26 letters
+- table: tuple of 26 integers
+"""
+
+Model = collections.namedtuple("Model", [
+    "name", "rotors", "static", "reflectors", "max_rotors", "max_plugs"])
+Model.__doc__ = """characteristics of a machine model
+
+- name: section name of the model in model.ini
+- rotors: tuple of the IDs of the moving rotors available
+- static: tuple of the IDs of the static rotors available (M4)
+- reflectors: tuple of reflector IDs (upper case)
+- max_rotors: number of rotors in the machine
+- max_plugs: number of plugs supplied
+"""
+
+# IDs of the static rotors named in model.ini
+_STATIC_ROTORS = {"BETA": 9, "GAMMA": 10}
+
+_lock = threading.Lock()
+_registry = None
+
+
+def rotor(rotor_id):
+    """return the RotorWiring of a rotor
+
+    Arguments:
+    -rotor_id: integer identifying the rotor (1-10)
+
+    Raises KeyError for an unknown rotor
+    """
+
+    return _load()[0][str(rotor_id)]
+
+
+def reflector(reflect_id):
+    """return the ReflectorWiring of a reflector
+
+    Arguments:
+    -reflect_id: string identifying the reflector (case-insensitive)
+
+    Raises KeyError for an unknown reflector
+    """
+
+    return _load()[1][reflect_id.lower()]
+
+
+def model(name):
+    """return the Model of a machine model
+
+    Arguments:
+    -name: string containing the Enigma Machine war model
+    (case-insensitive)
+
+    Raises KeyError for an unknown model
+    """
+
+    return _load()[2][name.upper()]
+
+
+def _load():
+    """parse model.ini on first use, shared by all threads"""
+
+    registry = _registry
+    if registry is None:
+        with _lock:
+            if _registry is None:
+                _set(_cached(MODEL_CONFIG))
+            registry = _registry
+
+    return registry
+
+
+def _set(registry):
+    """install the registries returned by _parse()"""
+    global _registry
+    _registry = registry
+
+
+def _cached(path):
+    """return the registries of a model config, from the cache file if it
+    was saved for the same modification time and size of the config"""
+
+    info = os.stat(path)
+    stamp = (_CACHE_VERSION, info.st_mtime_ns, info.st_size)
+
+    # the cache directory is shared by every installation of the user
+    cache = os.path.join(CACHE_DIR, "%s.%08x.%s.cache" % (
+        os.path.basename(path), zlib.crc32(os.fsencode(os.path.abspath(path))),
+        sys.implementation.cache_tag))
+
+    try:
+        with open(cache, "rb") as file:
+            saved, (rotors, reflectors, models) = marshal.load(file)
+        if saved == stamp:
+            return ({k: RotorWiring._make(v) for k, v in rotors.items()},
+                    {k: ReflectorWiring._make(v)
+                     for k, v in reflectors.items()},
+                    {k: Model._make(v) for k, v in models.items()})
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+
+    registry = _parse(path)
+
+    # marshal only takes plain tuples, a missing or read-only cache
+    # directory only costs parsing again next time
+    plain = tuple({k: tuple(v) for k, v in r.items()} for r in registry)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        temporary = "%s.%d" % (cache, os.getpid())
+        with open(temporary, "wb") as file:
+            marshal.dump((stamp, plain), file)
+        os.replace(temporary, cache)
+    except OSError:
+        pass
+
+    return registry
+
+
+def _parse(path):
+    """build the rotor and reflector registries from a model config"""
+
+    import configparser
+
+    config = configparser.ConfigParser(interpolation=configparser.
+                                       ExtendedInterpolation())
+    config.read(path)
+
+    rotors = {}
+    section = config['Rotors']
+    for key in section:
+        if not key.isdigit():
+            continue
+
+        turnover = None
+        positions = frozenset()
+        if key + 'to' in section:
+            turnover = section[key + 'to']
+            positions = frozenset(ord(c) - 65 for c in turnover)
+
+        wiring = section[key]
+        forward, inverse = _offset_tables(wiring)
+        rotors[key] = RotorWiring(wiring, section.getint(key + 'nn'),
+                                  turnover, positions, forward, inverse)
+
+    reflectors = {}
+    for key, value in config['Reflectors'].items():
+        reflectors[key] = ReflectorWiring(value,
+                                          tuple(ord(c) - 65 for c in value))
+
+    models = {}
+    for name in config.sections():
+        if name in ('Rotors', 'Reflectors'):
+            continue
+
+        section = config[name]
+        ids = [x.strip() for x in section['rotors'].split(",")]
+        models[name.upper()] = Model(
+            name,
+            tuple(int(x) for x in ids if x.isdigit()),
+            tuple(_STATIC_ROTORS[x.upper()] for x in ids if not x.isdigit()),
+            tuple(x.strip().upper() for x in section['reflectors'].split(",")),
+            section.getint('max_rotors'),
+            section.getint('max_plugs'))
+
+    return rotors, reflectors, models
+
+
+def _offset_tables(wiring):
+    """integer wire maps, and their inverses, for all 26 rotor offsets"""
+
+    base = [ord(c) - 65 for c in wiring]
+    forward = []
+    inverse = []
+    for offset in range(0, 26):
+        table = [(base[(x + offset) % 26] - offset) % 26 for x in range(0, 26)]
+        reverse = [0] * 26
+        for x in range(0, 26):
+            reverse[table[x]] = x
+        forward.append(tuple(table))
+        inverse.append(tuple(reverse))
+
+    return tuple(forward), tuple(inverse)
@@ -1,12 +1,12 @@
-import configparser
-import os
+from enigma import registry
 
 
 class Rotor:
     """A single enigma rotor object"""
 
-    config = configparser.ConfigParser(interpolation=configparser.
-                                       ExtendedInterpolation())
+    # wiring and lookup tables are shared with the registry
+    __slots__ = ("__rotorId", "__position", "__ringSetting", "__offset",
+                 "__window", "__wiring")
 
     def __init__(self, rotorId, position, ringSetting):
         """rotor initialization
@@ -25,29 +25,25 @@ class Rotor:
 
         """
 
-        # set relative path to config file
-        pwd = os.path.dirname(__file__)
-        model_config = os.path.join(pwd, 'model.ini')
-
-        # get rotor configuration
-        self.config.read(model_config)
-
         self.__rotorId = rotorId
         self.__position = position - 1
         self.__ringSetting = ringSetting - 1
         self.__offset = None
-        self.__notchCount = Rotor.config.getint('Rotors', str(rotorId) + "nn")
         self.__window = None
 
-        self.__baseWiring = list(Rotor.config.get('Rotors', str(rotorId)))
-        self.__wiring = self.__baseWiring
-        if not (self.__rotorId == 9 or self.__rotorId == 10):
-            self.__turnover = list(Rotor.config.get('Rotors',
-                                                    str(rotorId) + 'to'))
-        else:
-            self.__turnover = None
+        # get rotor configuration
+        self.compile()
+        self.configure()
+
+    def __getstate__(self):
+        """pickle the rotor settings, tables are taken from the registry"""
+        return (self.__rotorId, self.__position, self.__ringSetting)
+
+    def __setstate__(self, state):
+        self.__rotorId, self.__position, self.__ringSetting = state
+        self.__window = None
+        self.compile()
         self.configure()
-        self.count = 0
 
     @property
     def rotorId(self):
@@ -64,16 +60,11 @@ class Rotor:
         Side effects:
         -rotorID changed
         -base wiring of rotor set to newly assigned rotor ID
+        -lookup tables set by call to compile() function
         -rotor offset and wring reconfigured by call to configure() function
         """
         self.__rotorId = rotorId
-        self.__baseWiring = list(Rotor.config.get('Rotors', str(rotorId)))
-        self.__notchCount = Rotor.config.getint('Rotors', str(rotorId) + "nn")
-        if not (self.__rotorId == 9 or self.__rotorId == 10):
-            self.__turnover = list(Rotor.config.get('Rotors',
-                                                    str(rotorId) + 'to'))
-        else:
-            self.__turnover = None
+        self.compile()
         self.configure()
 
     @property
@@ -119,11 +110,18 @@ class Rotor:
     @property
     def turnover(self):
         """return the rotor turnover location(s)"""
-        return self.__turnover
+        if self.__wiring.turnover is None:
+            return None
+        return list(self.__wiring.turnover)
+
+    @property
+    def turnover_positions(self):
+        """return the rotor turnover location(s) as integers (0-25)"""
+        return self.__wiring.turnover_positions
 
     def is_turnover(self):
-        turnover = chr(self.__position + 65)
-        return turnover in self.__turnover
+        """return True if the rotor rests on a turnover position"""
+        return self.__position in self.__wiring.turnover_positions
 
     @property
     def window(self):
@@ -148,12 +146,11 @@ class Rotor:
 
         Side effects:
         -rotor position increased by one
-        -rotor offset and wiring reconfigured by call to configure() function
+        -rotor offset increased by one
         """
 
-        self.__position += 1
-        self.__position %= 26
-        self.configure()
+        self.__position = (self.__position + 1) % 26
+        self.__offset = (self.__offset + 1) % 26
 
     def rev_step(self):
         """decrement the rotor one position
@@ -162,13 +159,12 @@ class Rotor:
         -None
 
         Side effects:
-        -rotor position increased by one
-        -rotor offset and wiring reconfigured by call to configure() function
+        -rotor position decreased by one
+        -rotor offset decreased by one
         """
 
-        self.__position -= 1
-        self.__position %= 26
-        self.configure()
+        self.__position = (self.__position - 1) % 26
+        self.__offset = (self.__offset - 1) % 26
 
     def encrypt(self, letter, traverse):
         """pass a single character through the rotor]
@@ -185,12 +181,25 @@ class Rotor:
         """
 
         if traverse == 1:
-            if self.__rotorId == 1:
-                self.count =+ 1
-            return (ord(self.__wiring[letter]) - 65) - self.__offset % 26
+            return self.__wiring.forward[self.__offset][letter]
         else:
-            return self.__wiring.index(chr(((letter +
-                                       self.__offset) % 26) + 65))
+            return self.__wiring.inverse[self.__offset][letter]
+
+    def compile(self):
+        """bind the integer lookup tables of the rotor ID
+
+        Tables are built once per rotor ID by the registry and shared by
+        every rotor with that ID.
+
+        Arguments:
+        -None
+
+        Side effects:
+        -wiring, notch count, turnover and lookup tables for all 26 offsets
+        set from the registry
+        """
+
+        self.__wiring = registry.rotor(self.__rotorId)
 
     def configure(self):
         """establish effective wiring by computing rotor offset
@@ -199,14 +208,9 @@ class Rotor:
 
         Side effects:
         -offset computed
-        -window computed by calling set_window()
-        -wiring reconfigured based on offset
         """
 
         self.__offset = ((26 - self.__ringSetting + self.__position) % 26)
-        self.__wiring = list(self.__baseWiring)
-        self.__wiring.extend(self.__wiring[0: self.__offset])
-        del self.__wiring[0: self.__offset]
 
     @property
     def offset(self):
@@ -216,13 +220,34 @@ class Rotor:
     @property
     def notch_count(self):
         """return the number of notches in rotor"""
-        return self.__notchCount
+        return self.__wiring.notch_count
+
+    @property
+    def forward_tables(self):
+        """return the integer wire maps for all 26 offsets"""
+        return self.__wiring.forward
+
+    @property
+    def inverse_tables(self):
+        """return the inverse integer wire maps for all 26 offsets"""
+        return self.__wiring.inverse
+
+    @property
+    def forward_table(self):
+        """return the integer wire map for the current offset"""
+        return self.__wiring.forward[self.__offset]
+
+    @property
+    def inverse_table(self):
+        """return the inverse integer wire map for the current offset"""
+        return self.__wiring.inverse[self.__offset]
 
     @property
     def wiring(self):
         """return the wire map of the rotor"""
-        return self.__wiring
+        return list(self.__wiring.wiring[self.__offset:] +
+                    self.__wiring.wiring[0: self.__offset])
 
     def peek(self):
         """return next encrypted character"""
-        return self.__wiring[0]
+        return self.__wiring.wiring[self.__offset]
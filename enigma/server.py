@@ -0,0 +1,490 @@
+"""Encryption daemon and its client
+
+A long-running server keeps one assembled machine per configuration and
+answers encryption requests over a local socket, so short messages do not
+pay for interpreter startup, config parsing and machine assembly each
+time.  Requests and responses are JSON objects, one per line:
+
+- {"message": "...", "config": "User", "options": {...},
+  "preferences": {...}} encrypts a message.  config names a configuration
+  (the selected one if omitted), options override its machine settings
+  (as accepted by enigma_driver.update_config) and preferences override
+  the formatting and remember preferences.  The response is
+  {"ciphertext": "..."} or {"error": "..."}.
+
+- {"op": "metrics"} returns request, letter and latency counters.
+
+- {"op": "flush"} saves the remembered rotor positions now, and
+  {"op": "reload"} also discards the assembled machines, so that the
+  next requests see changes made to the configurations.
+
+Only the machines used last are kept (MAX_MACHINES by default), and they
+are compiled once they have encrypted a few messages.
+
+Requests are queued and encrypted by a single thread, which takes every
+request waiting (up to a batch size) at once, so that a burst of requests
+from many connections is served in one pass.  Machines return to their
+configured positions before each message, unless the remember preference
+is set: then the positions carry over from message to message in memory
+and are handed to a persist function every few seconds (and at shutdown)
+rather than after each message.
+
+How machines are assembled and positions saved is up to the caller (see
+the serve command of the driver); this module only imports the machine
+modules when a request needs them.
+"""
+
+import collections
+import errno
+import json
+import os
+import queue
+import socket
+import socketserver
+import stat
+import tempfile
+import threading
+import time
+
+# latencies kept for the percentiles of the metrics
+LATENCY_WINDOW = 4096
+
+# messages encrypted by a machine before it is compiled (compiling costs
+# a few milliseconds, saved after about as many short messages)
+COMPILE_AFTER = 8
+
+# machines kept by a server, the least recently used are discarded
+MAX_MACHINES = 256
+
+_Entry = collections.namedtuple("_Entry", ["machine", "preferences",
+                                           "name", "state"])
+
+
+class Metrics:
+    """Thread-safe request counters and latencies"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__started = time.time()
+        self.__requests = 0
+        self.__errors = 0
+        self.__letters = 0
+        self.__batches = 0
+        self.__latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def batch(self):
+        """count a batch of requests"""
+        with self.__lock:
+            self.__batches += 1
+
+    def request(self, letters, seconds, error=False):
+        """count a request answered, its letters and its latency"""
+        with self.__lock:
+            self.__requests += 1
+            self.__letters += letters
+            self.__errors += bool(error)
+            self.__latencies.append(seconds)
+
+    def snapshot(self):
+        """return the metrics as a dict"""
+        with self.__lock:
+            uptime = time.time() - self.__started
+            latencies = sorted(self.__latencies)
+            metrics = {
+                "uptime": uptime,
+                "requests": self.__requests,
+                "errors": self.__errors,
+                "letters": self.__letters,
+                "batches": self.__batches,
+                "requests_per_second": self.__requests / uptime,
+                "letters_per_second": self.__letters / uptime,
+                "mean_batch": self.__requests / max(1, self.__batches),
+            }
+
+        for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+            value = None
+            if latencies:
+                value = latencies[min(len(latencies) - 1,
+                                      int(fraction * len(latencies)))]
+            metrics["latency_" + name] = value
+        return metrics
+
+
+class EncryptionServer:
+    """Serves encryption requests with preassembled machines"""
+
+    def __init__(self, factory, persist=None, persist_interval=5.0,
+                 max_batch=64, max_machines=MAX_MACHINES):
+        """
+        Arguments:
+
+        - factory: function(config, options) assembling a machine, where
+        config is a configuration name (None for the selected one) and
+        options a dict of machine settings; returns the EnigmaMachine, a
+        dict of preferences and the name of the configuration
+
+        - persist: function called with a dict of configuration name to
+        remembered rotor positions (1-26) to save them
+
+        - persist_interval: seconds between calls of persist
+
+        - max_batch: most requests encrypted in one pass
+
+        - max_machines: number of machines kept, the least recently used
+        are discarded (and assembled again if needed)
+        """
+
+        self.__factory = factory
+        self.__persist = persist
+        self.__persistInterval = persist_interval
+        self.__maxBatch = max_batch
+        self.__maxMachines = max(1, max_machines)
+        self.__machines = collections.OrderedDict()
+        self.__keys = collections.OrderedDict()
+        self.__uses = collections.Counter()
+        self.__dirty = set()
+        self.__queue = queue.Queue()
+        self.__worker = None
+        self.__server = None
+        self.metrics = Metrics()
+
+    def handle(self, request):
+        """answer a request (a dict) in the calling thread
+
+        Requests are normally queued by the socket server, this is the
+        same processing for use in-process.
+        """
+        return self.__handle(request, time.perf_counter())
+
+    def __handle(self, request, started):
+        """answer a request, received at perf_counter() time started"""
+
+        letters = 0
+        try:
+            op = request.get("op", "encrypt")
+            if op == "encrypt":
+                response, letters = self.__encrypt(request)
+            elif op == "metrics":
+                response = {"metrics": self.metrics.snapshot()}
+            elif op == "flush":
+                self.flush()
+                response = {"ok": True}
+            elif op == "reload":
+                self.flush()
+                self.__machines.clear()
+                self.__keys.clear()
+                self.__uses.clear()
+                response = {"ok": True}
+            else:
+                response = {"error": "unknown op %r" % op}
+        except Exception as error:
+            response = {"error": str(error) or type(error).__name__}
+
+        self.metrics.request(letters, time.perf_counter() - started,
+                             "error" in response)
+        return response
+
+    def flush(self):
+        """pass the remembered positions changed since the last flush to
+        the persist function"""
+
+        if self.__persist is None or not self.__dirty:
+            return
+        positions = {}
+        for key in self.__dirty:
+            entry = self.__machines.get(key)
+            if entry is not None:
+                positions[entry.name] = tuple(entry.state)[0:3]
+        self.__dirty.clear()
+        if positions:
+            self.__persist(positions)
+
+    def __encrypt(self, request):
+        """encrypt the message of a request, return the response and the
+        number of letters encrypted"""
+
+        from enigma import stream
+
+        message = request.get("message")
+        if not isinstance(message, str):
+            return {"error": "No message given"}, 0
+
+        # machines are kept by configuration name, so requests naming the
+        # selected configuration and those leaving it out share a machine
+        config = request.get("config")
+        options = request.get("options") or {}
+        settings = json.dumps(options, sort_keys=True)
+        key = self.__keys.get((config, settings))
+        entry = self.__machines.get(key)
+        if entry is None:
+            machine, preferences, name = self.__factory(config, dict(options))
+            key = (name, settings)
+            entry = self.__machines.get(key)
+            if entry is None:
+                entry = self.__machines[key] = _Entry(
+                    machine, preferences, name, machine.snapshot())
+        self.__keys[(config, settings)] = key
+        self.__keys.move_to_end((config, settings))
+        self.__machines.move_to_end(key)
+        self.__discard()
+
+        preferences = dict(entry.preferences)
+        preferences.update(request.get("preferences") or {})
+
+        machine = entry.machine
+        machine.restore(entry.state)
+        self.__uses[key] += 1
+        if self.__uses[key] == COMPILE_AFTER:
+            machine.compile(lazy=True)
+
+        encryptor = stream.message_encryptor(
+            machine, len(message), **stream.preference_options(preferences))
+        ciphertext = encryptor.encrypt(message)
+
+        # positions are only remembered for configurations used as saved
+        if stream.preference_flag(preferences["remember"]) and not options:
+            self.__machines[key] = entry._replace(state=machine.snapshot())
+            self.__dirty.add(key)
+
+        return {"ciphertext": ciphertext}, encryptor.letters
+
+    def __discard(self):
+        """discard the machines used least recently beyond the most kept,
+        saving their remembered positions first"""
+
+        while len(self.__machines) > self.__maxMachines:
+            key = next(iter(self.__machines))
+            if key in self.__dirty:
+                self.flush()
+            del self.__machines[key]
+            del self.__uses[key]
+
+        # names of configurations and settings of the machines discarded
+        while len(self.__keys) > self.__maxMachines:
+            self.__keys.popitem(last=False)
+
+    def serve(self, address):
+        """serve requests until shutdown() is called
+
+        Arguments:
+
+        - address: path of a Unix socket, or (host, port) tuple
+
+        The socket of a server no longer running is replaced.  Raises
+        FileExistsError if the path is another kind of file, and OSError
+        if a server is running at the address.
+        """
+
+        handler = _handler(self.__queue)
+        bound = None
+        if isinstance(address, str):
+            _remove_stale(address)
+
+            # the socket is created private, rather than made private
+            # once others may have connected
+            umask = os.umask(0o177)
+            try:
+                self.__server = _UnixServer(address, handler)
+            finally:
+                os.umask(umask)
+            bound = _identity(address)
+        else:
+            self.__server = _TCPServer(address, handler)
+
+        self.__worker = threading.Thread(target=self.__work, daemon=True)
+        self.__worker.start()
+        try:
+            self.__server.serve_forever()
+        finally:
+            self.__server.server_close()
+
+            # the socket may have been taken over since
+            if bound is not None and _identity(address) == bound:
+                os.unlink(address)
+            self.__queue.put(None)
+            self.__worker.join()
+
+    def shutdown(self):
+        """stop serving, from another thread, and save remembered
+        positions"""
+        if self.__server is not None:
+            self.__server.shutdown()
+
+    @property
+    def address(self):
+        """return the address served (the port chosen for port 0)"""
+        return self.__server.server_address
+
+    def __work(self):
+        """answer queued requests in batches, flushing periodically"""
+
+        flushed = time.monotonic()
+        while True:
+            timeout = max(0.0, flushed + self.__persistInterval -
+                          time.monotonic())
+            try:
+                item = self.__queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ()
+
+            batch = []
+            while item:
+                batch.append(item)
+                if len(batch) >= self.__maxBatch:
+                    break
+                try:
+                    item = self.__queue.get_nowait()
+                except queue.Empty:
+                    item = ()
+
+            if batch:
+                self.metrics.batch()
+            for request, reply, queued in batch:
+                reply(self.__handle(request, queued))
+
+            if item is None or time.monotonic() >= \
+                    flushed + self.__persistInterval:
+                self.flush()
+                flushed = time.monotonic()
+            if item is None:
+                return
+
+
+def _handler(requests):
+    """return a request handler class queueing the lines of a connection"""
+
+    class Handler(socketserver.StreamRequestHandler):
+
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as error:
+                    response = {"error": "Invalid request: %s" % error}
+                else:
+                    done = threading.Event()
+                    answer = []
+                    # latency includes the wait in the queue
+                    requests.put((request, lambda r: (answer.append(r),
+                                                      done.set()),
+                                  time.perf_counter()))
+                    done.wait()
+                    response = answer[0]
+                self.wfile.write(json.dumps(response).encode("utf-8") +
+                                 b"\n")
+
+    return Handler
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+
+def default_socket():
+    """return the path of the per-user socket used when none is given
+
+    The socket is in $XDG_RUNTIME_DIR if set, else in a directory of the
+    temporary directory only the user may enter, created if needed.
+
+    Raises PermissionError if that directory belongs to another user or
+    may be entered by others
+    """
+
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return os.path.join(runtime, "enigma.sock")
+
+    if not hasattr(os, "getuid"):
+        user = os.environ.get("USERNAME", "user")
+        return os.path.join(tempfile.gettempdir(), "enigma-%s.sock" % user)
+
+    directory = os.path.join(tempfile.gettempdir(), "enigma-%d" % os.getuid())
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+
+    status = os.lstat(directory)
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid() or \
+            status.st_mode & 0o077:
+        raise PermissionError(errno.EACCES, "Not a private directory",
+                              directory)
+    return os.path.join(directory, "enigma.sock")
+
+
+def request(address, payload, timeout=30.0):
+    """send a request to a server and return its response
+
+    Arguments:
+
+    - address: path of a Unix socket, or (host, port) tuple
+
+    - payload: request dict
+
+    - timeout: seconds to wait for the connection and the response
+
+    Raises OSError if the server cannot be reached, and PermissionError if
+    the Unix socket belongs to another user (who would see the messages)
+    """
+
+    if isinstance(address, str):
+        if hasattr(os, "getuid") and os.stat(address).st_uid != os.getuid():
+            raise PermissionError(errno.EPERM, "Socket owned by another user",
+                                  address)
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+    with connection:
+        connection.settimeout(timeout)
+        connection.connect(address)
+        connection.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as replies:
+            line = replies.readline()
+    if not line:
+        raise ConnectionError("server closed the connection")
+    return json.loads(line)
+
+
+def _remove_stale(path):
+    """remove the socket of a server no longer running at path
+
+    Raises FileExistsError if path is not a socket, and OSError (address
+    in use) if a server answers at it
+    """
+
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, "Not a socket", path)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(errno.EADDRINUSE, "A server is already running", path)
+
+
+def _identity(path):
+    """return the device and inode of a file (None if it does not exist)"""
+    try:
+        status = os.lstat(path)
+    except FileNotFoundError:
+        return None
+    return status.st_dev, status.st_ino
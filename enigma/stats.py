@@ -0,0 +1,175 @@
+"""Optional counters and timings of a machine
+
+A Stats object attached to an EnigmaMachine (see EnigmaMachine.stats)
+counts the letters it encrypts and the rotor movements this takes, and
+times the encryption.  Nothing is counted inside the encryption loops:
+each call to encrypt(), encrypt_codes() or the vectorized and parallel
+engines is measured as a whole, and its rotor movements are worked out
+from the start positions and the number of key presses, jumping from one
+turnover to the next.  A machine without Stats (the default) pays a
+single attribute test per call.
+
+Other stages of a program (e.g. reading input or filtering characters)
+are timed with timer().  Timings may be sampled, measuring one call of a
+stage in every sample calls and scaling up the time measured.
+"""
+
+import collections
+import contextlib
+import time
+
+
+class Stats:
+    """Counters and stage timings of encryption"""
+
+    __slots__ = ("letters", "steps", "turnovers", "double_steps",
+                 "__sample", "__calls", "__timed", "__seconds")
+
+    def __init__(self, sample=1):
+        """
+        Arguments:
+
+        - sample: time one call of each stage in every sample calls
+        """
+
+        if sample < 1:
+            raise ValueError("sample must be at least 1")
+        self.__sample = sample
+        self.reset()
+
+    def reset(self):
+        """set every counter and timing to zero
+
+        Counters:
+
+        - letters: letters encrypted
+
+        - steps: rotor movements (the fast rotor on every key press, and
+        the middle and slow rotors when they turn)
+
+        - turnovers: times a rotor moved the next one (fast to middle, or
+        middle to slow)
+
+        - double_steps: times the middle rotor stepped itself along with
+        the slow rotor
+        """
+
+        self.letters = 0
+        self.steps = 0
+        self.turnovers = 0
+        self.double_steps = 0
+        self.__calls = collections.Counter()
+        self.__timed = collections.Counter()
+        self.__seconds = collections.Counter()
+
+    @property
+    def stages(self):
+        """return the names of the stages timed, in order of first use"""
+        return list(self.__calls)
+
+    def calls(self, stage):
+        """return the number of calls of a stage"""
+        return self.__calls[stage]
+
+    def seconds(self, stage):
+        """return the time spent in a stage (estimated when sampled)"""
+        if not self.__timed[stage]:
+            return 0.0
+        return self.__seconds[stage] * self.__calls[stage] / \
+            self.__timed[stage]
+
+    @property
+    def rate(self):
+        """return the letters encrypted per second of the encrypt stage"""
+        seconds = self.seconds("encrypt")
+        return self.letters / seconds if seconds else 0.0
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        """time the body of a with statement as a stage"""
+        self.__calls[stage] += 1
+        if self.__calls[stage] % self.__sample:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__seconds[stage] += time.perf_counter() - start
+            self.__timed[stage] += 1
+
+    def measure(self, machine, function, codes):
+        """encrypt letters with a function, counting and timing it
+
+        The machine's stats are detached during the call, so engines
+        calling one another are only counted once.
+
+        Arguments:
+
+        - machine: EnigmaMachine encrypting the letters
+
+        - function: function(machine, codes) encrypting the letters
+
+        - codes: letters encrypted, one key press each
+
+        Returns the result of function
+        """
+
+        turnovers = machine._turnovers()
+        start = tuple([machine.rotor_pos(r) - 1 for r in ("r1", "r2")])
+        machine.stats = None
+        try:
+            with self.timer("encrypt"):
+                result = function(machine, codes)
+        finally:
+            machine.stats = self
+
+        self.record(start, len(codes), *turnovers)
+        return result
+
+    def record(self, positions, count, turnover0, turnover1):
+        """count the rotor movements of key presses
+
+        Arguments:
+
+        - positions: fast and middle rotor positions (0-25) before the
+        first key press
+
+        - count: number of key presses
+
+        - turnover0, turnover1: turnover positions (sets of 0-25) of the
+        fast and middle rotors
+        """
+
+        p0, p1 = positions[0:2]
+        notches = sorted(turnover0)
+        middle = slow = turnovers = double = 0
+
+        # press is the number of key presses made, the fast rotor is at
+        # (p0 + press) % 26 before the next one
+        press = 0
+        while press < count:
+            if p1 in turnover1:
+                middle += 1
+                slow += 1
+                turnovers += 1
+                double += 1
+                p1 = (p1 + 1) % 26
+                press += 1
+                continue
+
+            if not notches:
+                break
+            press += min([(n - p0 - press) % 26 for n in notches])
+            if press >= count:
+                break
+            middle += 1
+            turnovers += 1
+            p1 = (p1 + 1) % 26
+            press += 1
+
+        self.letters += count
+        self.steps += count + middle + slow
+        self.turnovers += turnovers
+        self.double_steps += double
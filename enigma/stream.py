@@ -0,0 +1,440 @@
+"""Streaming encryption of text with constant memory
+
+Text is encrypted piece by piece in the output format of the command-line
+tool: input is converted to upper case, characters other than letters,
+spaces and newlines are removed, spaces are kept, removed or replaced
+with 'X', and letters are grouped.  The machine state and the position
+within the current letter group carry over from one piece to the next, so
+the pieces of a stream may be split anywhere.
+"""
+
+import functools
+import mmap
+import os
+import re
+from enigma import enigma_machine
+
+# characters read from a file per piece
+CHUNK_SIZE = 1 << 16
+
+# pieces at least this long are formatted with NumPy
+NUMPY_FORMAT = 512
+
+# messages longer than this are encrypted by the vectorized engine, shorter
+# ones by the machine's own loop (faster than the vectorized engine's set
+# up), see message_encryptor()
+LONG_MESSAGE = 1024
+
+_LETTERS = bytes(range(65, 91))
+_LAYOUT = re.compile(b"([ \n]+)")
+_SPACE_DETECT = bytes.maketrans(b"X", b" ")
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """return NumPy, imported on first use (None if it is not installed),
+    so that short messages are encrypted without loading it"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@functools.lru_cache(maxsize=None)
+def _normalize_table(spaces):
+    """return translate() arguments keeping letters, newlines and spaces
+    (according to the space handling preference)"""
+    keep = _LETTERS + b"\n"
+    table = bytearray(range(0, 256))
+    if spaces == "x":
+        table[32] = 88
+        keep += b" "
+    elif spaces != "remove":
+        keep += b" "
+    delete = bytes(b for b in range(0, 256) if b not in keep)
+    return bytes(table), delete
+
+
+class StreamEncryptor:
+    """Encrypts text piece by piece, carrying state between pieces"""
+
+    def __init__(self, machine, spaces="keep", space_detect=False, group=5,
+                 newlines=True, engine=None):
+        """
+        Arguments:
+
+        -machine: EnigmaMachine used to encrypt the letters
+
+        -spaces: space handling ('remove', 'X' or 'keep')
+
+        -space_detect: convert encrypted Xs to spaces (removes spaces and
+        grouping)
+
+        -group: number of letters per output group, only applied when
+        spaces are removed (0 for no grouping)
+
+        -newlines: if False, newlines are treated as spaces
+
+        -engine: function encrypting letter codes (0-25) with the machine,
+        defaults to vectorized.encrypt_codes
+        """
+
+        if space_detect:
+            spaces = "remove"
+            group = 0
+
+        self.__machine = machine
+        self.__spaceDetect = space_detect
+        self.__group = int(group) if spaces.lower() == "remove" else 0
+        self.__newlines = newlines
+        if engine is None:
+            from enigma import vectorized
+            engine = vectorized.encrypt_codes
+        self.__engine = engine
+        self.__table, self.__delete = _normalize_table(spaces.lower())
+        self.__count = 0
+        self.__letters = 0
+
+    @property
+    def letters(self):
+        """return the number of letters encrypted"""
+        return self.__letters
+
+    def encrypt(self, text):
+        """encrypt the next piece of text and return it formatted"""
+
+        if not self.__newlines:
+            text = text.replace("\n", " ")
+
+        plaintext = text.upper().encode("ascii", "ignore")
+        return self.__encrypt(plaintext).decode("ascii")
+
+    def encrypt_bytes(self, data):
+        """encrypt the next piece of UTF-8 encoded text and return it
+        formatted (as ASCII bytes)
+
+        Pieces must not split multi-byte characters.
+        """
+
+        if not self.__newlines:
+            data = data.replace(b"\n", b" ")
+
+        # only non-ASCII text needs decoding to be converted to upper case
+        if data.isascii():
+            plaintext = data.upper()
+        else:
+            plaintext = data.decode("utf-8").upper().encode("ascii", "ignore")
+        return self.__encrypt(plaintext)
+
+    def __encrypt(self, plaintext):
+        """encrypt and format upper case ASCII text"""
+
+        # filtering and formatting is timed as a stage of the machine's
+        # stats, the letters are timed again by the engine
+        stats = self.__machine.stats
+        if stats is not None:
+            with stats.timer("filter"):
+                return self.__convert(plaintext)
+        return self.__convert(plaintext)
+
+    def __convert(self, plaintext):
+        """filter, encrypt and format upper case ASCII text"""
+
+        plaintext = plaintext.translate(self.__table, self.__delete)
+
+        letters = plaintext.translate(None, b" \n")
+        self.__letters += len(letters)
+        codes = letters.translate(enigma_machine._TO_CODES)
+        ciphertext = self.__engine(self.__machine, codes)
+        ciphertext = ciphertext.translate(enigma_machine._TO_LETTERS)
+        if self.__spaceDetect:
+            ciphertext = ciphertext.translate(_SPACE_DETECT)
+
+        # re-insert spaces and newlines between the encrypted letters
+        if len(plaintext) >= NUMPY_FORMAT and _numpy() is not None:
+            output = self.__layout(plaintext, ciphertext)
+        elif len(letters) == len(plaintext):
+            output = self.__format(ciphertext)
+        else:
+            output = []
+            start = 0
+            for i, part in enumerate(_LAYOUT.split(plaintext)):
+                if i % 2:
+                    output.append(part)
+                elif part:
+                    end = start + len(part)
+                    output.append(self.__format(ciphertext[start:end]))
+                    start = end
+            output = b"".join(output)
+
+        return output
+
+    def __layout(self, plaintext, ciphertext):
+        """place the encrypted letters at the positions of the letters of
+        the plaintext, with a space after each letter group (NumPy)"""
+
+        group = self.__group
+        if group == 0 and len(ciphertext) == len(plaintext):
+            return ciphertext
+
+        numpy = _numpy()
+        text = numpy.frombuffer(plaintext, dtype=numpy.uint8)
+        letters = text >= 65
+        if group == 0:
+            output = text.copy()
+            output[letters] = numpy.frombuffer(ciphertext, dtype=numpy.uint8)
+            return output.tobytes()
+
+        # every character moves right by the group spaces before it, that
+        # is one per group completed by the letters before it
+        count = self.__count
+        output = numpy.full(len(text) + (count + len(ciphertext)) // group, 32,
+                            dtype=numpy.uint8)
+        index = numpy.arange(len(text))
+        if len(ciphertext) == len(plaintext):
+            index += (index + count) // group
+            output[index] = numpy.frombuffer(ciphertext, dtype=numpy.uint8)
+        else:
+            index += (numpy.cumsum(letters) - letters + count) // group
+            output[index[letters]] = numpy.frombuffer(ciphertext,
+                                                      dtype=numpy.uint8)
+            layout = ~letters
+            output[index[layout]] = text[layout]
+        self.__count = (count + len(ciphertext)) % group
+        return output.tobytes()
+
+    def __format(self, letters):
+        """group letters, continuing the group left open by the last call"""
+        group = self.__group
+        if group == 0 or not letters:
+            return letters
+
+        head = group - self.__count
+        if len(letters) < head:
+            self.__count += len(letters)
+            return letters
+
+        pieces = [letters[:head]]
+        pieces.extend(letters[i:i + group]
+                      for i in range(head, len(letters), group))
+        self.__count = (self.__count + len(letters)) % group
+        if self.__count == 0:
+            pieces.append(b"")
+        return b" ".join(pieces)
+
+
+def message_encryptor(machine, length, **options):
+    """return a StreamEncryptor with the engine fastest for a message
+
+    Arguments:
+
+    -machine: EnigmaMachine used to encrypt the letters
+
+    -length: length of the message
+
+    -options: formatting options, see StreamEncryptor
+    """
+
+    engine = type(machine).encrypt_codes
+    if length > LONG_MESSAGE:
+        from enigma import vectorized
+        engine = vectorized.encrypt_codes
+    return StreamEncryptor(machine, engine=engine, **options)
+
+
+def preference_options(preferences):
+    """return the StreamEncryptor options of formatting preferences (a dict
+    of strings as in config.ini, or of values)"""
+    return {"spaces": preferences["spaces"],
+            "space_detect": preference_flag(preferences["space_detect"]),
+            "group": int(preferences["group"]),
+            "newlines": preference_flag(preferences["newlines"])}
+
+
+def preference_flag(value):
+    """return a preference as a bool ("True"/"False" strings or bool)"""
+    if isinstance(value, str):
+        return value.strip().lower() == "true"
+    return bool(value)
+
+
+def encrypt_stream(machine, chunks, progress=None, **options):
+    """encrypt an iterable of text pieces, yielding formatted output pieces
+
+    Arguments:
+
+    -machine: EnigmaMachine used to encrypt the letters
+
+    -chunks: iterable of strings (e.g. from read_chunks()), or of UTF-8
+    bytes not splitting characters (e.g. from read_utf8_chunks())
+
+    -progress: progress.Progress updated with the length of each piece
+    (in characters or bytes) after it is encrypted
+
+    -options: formatting options, see StreamEncryptor
+
+    Yields strings
+    """
+
+    encryptor = StreamEncryptor(machine, **options)
+    letters = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            output = encryptor.encrypt(chunk)
+        else:
+            output = encryptor.encrypt_bytes(chunk).decode("ascii")
+        if progress is not None:
+            progress.update(len(chunk), encryptor.letters - letters)
+            letters = encryptor.letters
+        if output:
+            yield output
+
+
+def read_chunks(file, size=CHUNK_SIZE):
+    """yield the contents of an open text file in pieces of size characters"""
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_utf8_chunks(file, size=CHUNK_SIZE):
+    """yield the contents of an open binary file of UTF-8 text in pieces of
+    about size bytes, not splitting characters"""
+    tail = b""
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            if tail:
+                raise UnicodeDecodeError("utf-8", tail, 0, len(tail),
+                                         "unexpected end of data")
+            return
+
+        chunk, tail = split_utf8(tail + chunk)
+        if chunk:
+            yield chunk
+
+
+def utf8_pieces(data, size):
+    """yield pieces of size bytes of UTF-8 text, not splitting characters"""
+    start = 0
+    length = len(data)
+    while start < length:
+        end = min(start + size, length)
+        while end < length and end > start + 1 and data[end] & 0xC0 == 0x80:
+            end -= 1
+        yield data[start:end]
+        start = end
+
+
+def split_utf8(data):
+    """split UTF-8 bytes into complete characters and an incomplete last
+    character (b"" if there is none)"""
+
+    # continuation bytes at the end, after the lead byte of the character
+    end = len(data)
+    start = end
+    while start > max(0, end - 3) and data[start - 1] & 0xC0 == 0x80:
+        start -= 1
+    if start == 0:
+        return data, b""
+
+    lead = data[start - 1]
+    if lead >= 0xF0:
+        needed = 4
+    elif lead >= 0xE0:
+        needed = 3
+    elif lead >= 0xC0:
+        needed = 2
+    else:
+        return data, b""
+    if end - start + 1 < needed:
+        return data[:start - 1], data[start - 1:]
+    return data, b""
+
+
+def encrypt_file(machine, source, destination, size=CHUNK_SIZE,
+                 callback=None, progress=None, **options):
+    """encrypt a UTF-8 text file into another through memory maps
+
+    Pieces of the memory-mapped source are encrypted and copied into the
+    memory-mapped destination, so neither file is held in memory.
+
+    Arguments:
+
+    -machine: EnigmaMachine used to encrypt the letters
+
+    -source, destination: file paths
+
+    -size: number of bytes encrypted per piece
+
+    -callback: function called with the number of source bytes after
+    each piece is encrypted
+
+    -progress: progress.Progress updated after each piece is encrypted
+
+    -options: formatting options, see StreamEncryptor
+
+    Returns the number of bytes written
+    """
+
+    encryptor = StreamEncryptor(machine, **options)
+    with open(source, "rb") as src, open(destination, "w+b") as dst:
+        length = os.fstat(src.fileno()).st_size
+        if length == 0:
+            return 0
+
+        # grouping adds at most one space per letter group
+        group = max(1, int(options.get("group", 5)) or length)
+        output = _MappedOutput(dst, length + length // group + 1)
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            while start < length:
+                end = min(start + size, length)
+
+                # do not split a multi-byte character
+                while end < length and end > start + 1 and \
+                        data[end] & 0xC0 == 0x80:
+                    end -= 1
+
+                letters = encryptor.letters
+                output.write(encryptor.encrypt_bytes(data[start:end]))
+                if callback is not None:
+                    callback(end - start)
+                if progress is not None:
+                    progress.update(end - start, encryptor.letters - letters)
+                start = end
+
+        return output.close()
+
+
+class _MappedOutput:
+    """Writes to a memory-mapped file, growing it when full"""
+
+    def __init__(self, file, size):
+        self.__file = file
+        self.__position = 0
+        self.__map = None
+        self.__resize(max(1, size))
+
+    def __resize(self, size):
+        if self.__map is not None:
+            self.__map.close()
+        self.__file.truncate(size)
+        self.__map = mmap.mmap(self.__file.fileno(), size)
+
+    def write(self, data):
+        end = self.__position + len(data)
+        if end > len(self.__map):
+            self.__resize(max(end, 2 * len(self.__map)))
+        self.__map[self.__position:end] = data
+        self.__position = end
+
+    def close(self):
+        """unmap the file and cut it to the bytes written"""
+        self.__map.flush()
+        self.__map.close()
+        self.__file.truncate(self.__position)
+        return self.__position
@@ -0,0 +1,34 @@
+"""Machine factory shared by the tests of the server and batch encryption"""
+
+from enigma import enigma_machine
+from enigma import stream
+
+
+PREFERENCES = {"spaces": "remove", "space_detect": "False", "group": "5",
+               "newlines": "False", "remember": "False"}
+
+ROTORS = [[1, 1, 1], [2, 1, 1], [3, 1, 1]]
+
+
+def factory(config, options):
+    """assemble Enigma I machines of the "User" configuration, "fast"
+    giving the fast rotor position and "plugs" the plugs"""
+    if config not in (None, "User"):
+        raise ValueError("Configuration %s could not be found" % config)
+    rot = [list(r) for r in ROTORS]
+    rot[0][1] = int(options.get("fast", "1"))
+    plugs = options.get("plugs", "AB").split(",")
+    machine = enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", plugs)
+    return machine, dict(PREFERENCES), "User"
+
+
+def expected(message, plugs=("AB",), positions=None, group=5):
+    """return a message encrypted by a machine of the factory"""
+    rot = [list(r) for r in ROTORS]
+    if positions is not None:
+        for r, p in zip(rot, positions):
+            r[1] = p
+    machine = enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B",
+                                           list(plugs))
+    return stream.StreamEncryptor(machine, spaces="remove", group=group,
+                                  newlines=False).encrypt(message)
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import unittest
+from enigma import aio
+from enigma import enigma_machine
+from enigma import stream
+from enigma import vectorized
+
+
+class TestAioMethods(unittest.IsolatedAsyncioTestCase):
+
+    # test case 1 of the Enigma I tests
+    plaintext = ("LOREMIPSUMDOLORSITAMETCONSECTETURADIPISCINGELITSEDD"
+                 "OEIUSMODTEMPORINCIDIDUNTUTLABOREETDOLOREMAGNAALIQUAUTE")
+    crossRef = ("ILFDFARUBDONVISRUKOZQMNDIYCOUHRLAWBRMPYLAZNYNGRMRMV"
+                "AAJLNSZFHSYBBKFODPCHQPHSWOQZCJFKXNBAZJNPZHZBGOMNXOPPXX")
+
+    def machine(self):
+        rot = [[1, 1, 1], [2, 1, 1], [3, 1, 1]]
+        return enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", [])
+
+    def grouped(self, letters):
+        return "".join(letters[i:i + 5] + " " for i in range(0, len(letters), 5))
+
+    async def test_encrypt(self):
+
+        # pieces encrypted inline and in the executor continue each other
+        for inline in (0, 8, 1000):
+            encryptor = aio.AsyncEncryptor(self.machine(), chunk_size=7,
+                                           inline_size=inline, spaces="remove")
+            output = await encryptor.encrypt(self.plaintext[:30].lower())
+            output += await encryptor.encrypt(self.plaintext[30:])
+            self.assertEqual(self.grouped(self.crossRef), output)
+
+        output = await aio.encrypt(self.machine(), self.plaintext,
+                                   spaces="remove", group=0)
+        self.assertEqual(self.crossRef, output)
+
+        encryptor = aio.AsyncEncryptor(self.machine(), chunk_size=4,
+                                       spaces="keep")
+        text = "\u00e9 ".join(self.plaintext[i:i + 3]
+                            for i in range(0, len(self.plaintext), 3))
+        expected = stream.StreamEncryptor(self.machine(), spaces="keep")
+        self.assertEqual(expected.encrypt(text).encode(),
+                         await encryptor.encrypt_bytes(text.encode()))
+
+    def test_loop(self):
+
+        # an encryptor created before the loop may be used in it
+        encryptor = aio.AsyncEncryptor(self.machine(), chunk_size=10,
+                                       inline_size=0, spaces="remove",
+                                       group=0)
+
+        async def encrypt():
+            return await asyncio.gather(
+                encryptor.encrypt(self.plaintext[:50]),
+                encryptor.encrypt(self.plaintext[50:]))
+
+        self.assertEqual(self.crossRef, "".join(asyncio.run(encrypt())))
+
+    async def test_reader(self):
+
+        text = "\u00e9 ".join(self.plaintext[i:i + 3]
+                            for i in range(0, len(self.plaintext), 3))
+        reader = asyncio.StreamReader()
+        reader.feed_data(text.encode())
+        reader.feed_eof()
+
+        # reads of 4 bytes split the multi-byte characters
+        pieces = [p async for p in aio.encrypt_reader(self.machine(), reader,
+                                                      chunk_size=4,
+                                                      spaces="keep")]
+        self.assertGreater(len(pieces), 1)
+        expected = stream.StreamEncryptor(self.machine(), spaces="keep")
+        self.assertEqual(expected.encrypt(text).encode(), b"".join(pieces))
+
+        # an incomplete character at the end of the stream
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"AB\xc3")
+        reader.feed_eof()
+        with self.assertRaises(UnicodeDecodeError):
+            [p async for p in aio.encrypt_reader(self.machine(), reader)]
+
+    async def test_pipe(self):
+
+        received = []
+
+        class Writer:
+            def write(self, data):
+                received.append(data)
+
+            async def drain(self):
+                await asyncio.sleep(0)
+
+        reader = asyncio.StreamReader()
+        reader.feed_data(self.plaintext.encode())
+        reader.feed_eof()
+        encryptor = aio.AsyncEncryptor(self.machine(), chunk_size=10,
+                                       spaces="remove", group=0)
+        written = await encryptor.pipe(reader, Writer())
+        self.assertEqual(self.crossRef.encode(), b"".join(received))
+        self.assertEqual(len(self.crossRef), written)
+
+    async def test_cancel(self):
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def engine(machine, codes):
+            started.set()
+            release.wait(5)
+            return vectorized.encrypt_codes(machine, codes)
+
+        # the piece running in the executor is finished before the
+        # cancellation is raised
+        machine = self.machine()
+        encryptor = aio.AsyncEncryptor(machine, chunk_size=10, inline_size=0,
+                                       engine=engine)
+        task = asyncio.ensure_future(encryptor.encrypt(self.plaintext))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        self.assertFalse(task.done())
+
+        release.set()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(11, machine.rotor_pos("r1"))
+
+    async def test_timeout(self):
+
+        def engine(machine, codes):
+            threading.Event().wait(0.02)
+            return vectorized.encrypt_codes(machine, codes)
+
+        machine = self.machine()
+        encryptor = aio.AsyncEncryptor(machine, chunk_size=10, inline_size=0,
+                                       engine=engine)
+        with self.assertRaises(asyncio.TimeoutError):
+            await encryptor.encrypt(self.plaintext, timeout=0.03)
+
+        # only whole pieces were encrypted
+        self.assertEqual(0, (machine.rotor_pos("r1") - 1) % 10)
+
+        # the loop runs while a piece is encrypted in the executor
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0.001)
+
+        ticker = asyncio.ensure_future(tick())
+        await encryptor.encrypt(self.plaintext[:20])
+        ticker.cancel()
+        self.assertGreater(len(ticks), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import os
+import shutil
+import tempfile
 import unittest
 from enigma import plugboard
 from enigma import reflect
+from enigma import registry
 from enigma import rotor
 from enigma import enigma_exception
 
@@ -107,6 +111,31 @@ class TestPlugboardMethods(unittest.TestCase):
         self.assertEqual(self.p.encrypt(24), 25)
         self.assertEqual(self.p.encrypt(25), 24)
 
+    def test_mapping(self):
+
+        self.p.add_all(["AB", "YZ"])
+        self.p.remove_plug("AB")
+        expected = list(range(0, 26))
+        expected[24], expected[25] = 25, 24
+        self.assertEqual(self.p.mapping, tuple(expected))
+        self.assertEqual(self.p.plugs, [["Y", "Z"]])
+
+        # sockets are freed when a plug is removed
+        self.p.add_plug("BA")
+        self.assertEqual(self.p.encrypt(0), 1)
+
+        # duplicate sockets within the new plugs add nothing
+        with self.assertRaises(enigma_exception.DuplicatePlug):
+            self.p.add_all(["CD", "DE"])
+        self.assertEqual(self.p.available_plugs, 8)
+
+        # plugs must connect two letters
+        with self.assertRaises(enigma_exception.InvalidCharacter):
+            self.p.add_plug("c1")
+
+        self.p.clear()
+        self.assertEqual(self.p.mapping, tuple(range(0, 26)))
+
 
 class TestReflectorMethods(unittest.TestCase):
 
@@ -322,5 +351,70 @@ class TestRotorMethods(unittest.TestCase):
         expected = list("MFLGDQVZNTOWYHXUSPAIBRCJEK")
         self.assertEqual(self.r.wiring, expected)
 
+    def test_tables(self):
+
+        # lookup tables must agree with the rotated wiring at every offset
+        for x in range(1, 11):
+            self.r.rotorId = x
+            for y in range(1, 27):
+                self.r.position = y
+                wiring = self.r.wiring
+                forward = self.r.forward_table
+                inverse = self.r.inverse_table
+                for z in range(0, 26):
+                    expected = (ord(wiring[z]) - 65 - self.r.offset) % 26
+                    self.assertEqual(forward[z], expected)
+                    self.assertEqual(inverse[forward[z]], z)
+
+        # turnover positions mirror the turnover letters
+        self.r.rotorId = 6
+        self.assertEqual(self.r.turnover_positions, frozenset([12, 25]))
+        self.r.rotorId = 9
+        self.assertEqual(self.r.turnover_positions, frozenset())
+
+    def test_registry(self):
+
+        # rotors and reflectors share the tables parsed from model.ini
+        other = rotor.Rotor(1, 5, 9)
+        self.assertIs(other.forward_tables, self.r.forward_tables)
+        self.assertIs(other.forward_tables, registry.rotor(1).forward)
+        self.assertEqual(registry.rotor(9).turnover, None)
+        self.assertEqual(registry.rotor(6).notch_count, 2)
+        self.assertEqual(registry.reflector("UKW-B_THIN"),
+                         registry.reflector("ukw-b_thin"))
+        with self.assertRaises(KeyError):
+            registry.rotor(11)
+
+        # models list their rotors, static rotors and reflectors
+        m4 = registry.model("m4")
+        self.assertEqual(m4.static, (9, 10))
+        self.assertEqual(m4.reflectors, ("UKW-B_THIN", "UKW-C_THIN"))
+        self.assertEqual(registry.model("ENIGMAI").rotors, (1, 2, 3, 4, 5))
+
+    def test_registry_cache(self):
+
+        # the parsed form is saved, reused, and replaced when model.ini
+        # changes
+        directory = tempfile.mkdtemp()
+        cache_dir = registry.CACHE_DIR
+        registry.CACHE_DIR = os.path.join(directory, "cache")
+        try:
+            path = os.path.join(directory, "model.ini")
+            shutil.copy(registry.MODEL_CONFIG, path)
+            parsed = registry._cached(path)
+            self.assertEqual(len(os.listdir(registry.CACHE_DIR)), 1)
+            self.assertEqual(registry._cached(path), parsed)
+            self.assertIsInstance(registry._cached(path)[0]["1"],
+                                  registry.RotorWiring)
+
+            with open(path, "a") as file:
+                file.write("\n[Test]\nrotors = 1, 2, 3\nreflectors = UKW-B\n"
+                           "max_rotors = 3\nmax_plugs = 10\n")
+            self.assertIn("TEST", registry._cached(path)[2])
+            self.assertIn("TEST", registry._cached(path)[2])
+        finally:
+            registry.CACHE_DIR = cache_dir
+            shutil.rmtree(directory)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,102 @@
+import json
+import unittest
+from enigma import batch
+from enigma.tests import fixtures
+
+
+def expected(message, fast="1", plugs="AB", group=5):
+    return fixtures.expected(message, [plugs], [int(fast), 1, 1], group)
+
+
+class TestBatchMethods(unittest.TestCase):
+
+    def test_encrypt(self):
+
+        encryptor = batch.BatchEncryptor(fixtures.factory)
+        self.assertEqual(encryptor.encrypt({"id": 1, "message": "HELLO"}),
+                         {"id": 1, "ciphertext": expected("HELLO")})
+
+        # every message starts from the configured positions
+        self.assertEqual(encryptor.encrypt({"message": "HELLO"}),
+                         {"ciphertext": expected("HELLO")})
+
+        record = {"message": "HELLO", "config": "User", "fast": "5",
+                  "plugs": "CD", "preferences": {"group": "0"}}
+        self.assertEqual(encryptor.encrypt(record),
+                         {"ciphertext": expected("HELLO", "5", "CD", 0)})
+
+        # long messages are encrypted by the vectorized engine
+        message = "LOREMIPSUM" * 200
+        self.assertEqual(encryptor.encrypt({"message": message}),
+                         {"ciphertext": expected(message)})
+
+        self.assertEqual(encryptor.encrypt({"id": "x", "message": "A",
+                                            "config": "Other"}),
+                         {"id": "x",
+                          "error": "Configuration Other could not be found"})
+        self.assertEqual(encryptor.encrypt({"id": 2}),
+                         {"id": 2, "error": "No message given"})
+        self.assertIn("error", json.loads(encryptor.encrypt_line("[1]")))
+        self.assertIn("error", json.loads(encryptor.encrypt_line("{")))
+
+    def test_compile(self):
+
+        machines = []
+
+        def counting(config, options):
+            result = fixtures.factory(config, options)
+            machines.append(result[0])
+            return result
+
+        # machines are assembled once and compiled once they are reused
+        encryptor = batch.BatchEncryptor(counting)
+        for x in range(0, batch.COMPILE_AFTER + 1):
+            result = encryptor.encrypt({"message": "HELLO WORLD"})
+            self.assertEqual({"ciphertext": expected("HELLO WORLD")}, result)
+        self.assertEqual(1, len(machines))
+        self.assertTrue(machines[0].compiled)
+
+    def test_max_machines(self):
+
+        machines = []
+
+        def counting(config, options):
+            result = fixtures.factory(config, options)
+            machines.append(options.get("fast"))
+            return result
+
+        # only the machines used last are kept
+        encryptor = batch.BatchEncryptor(counting, max_machines=2)
+        for fast in ("1", "2", "1", "3", "1", "2"):
+            self.assertEqual(encryptor.encrypt({"message": "HELLO",
+                                                "fast": fast}),
+                             {"ciphertext": expected("HELLO", fast)})
+        self.assertEqual(machines, ["1", "2", "3", "2"])
+
+    def test_encrypt_lines(self):
+
+        records = []
+        for i in range(0, 50):
+            record = {"id": i, "message": "MESSAGE %d" % i}
+            if i % 2:
+                record["fast"] = str(i % 26 + 1)
+            records.append(json.dumps(record))
+        records.insert(10, "")
+        records.append("not json")
+
+        results = []
+        for i in range(0, 50):
+            fast = str(i % 26 + 1) if i % 2 else "1"
+            results.append({"id": i,
+                            "ciphertext": expected("MESSAGE %d" % i, fast)})
+
+        for jobs in (1, 2):
+            output = [json.loads(line) for line in
+                      batch.encrypt_lines(iter(records), fixtures.factory, jobs,
+                                          chunk_size=3)]
+            self.assertEqual(results, output[:-1])
+            self.assertIn("error", output[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from enigma import bench
+
+
+class TestBenchMethods(unittest.TestCase):
+
+    def test_run(self):
+
+        calls = []
+
+        def setup():
+            return lambda: calls.append(1), 10
+
+        cases = [bench.Case("a/one", "items", setup),
+                 bench.Case("b/two", "items", setup)]
+        reported = []
+        results = bench.run(cases, "a/*", repeat=2, min_time=0.001,
+                            callback=reported.append)
+        self.assertEqual(reported, results)
+        self.assertEqual([r.name for r in results], ["a/one"])
+        self.assertGreater(len(calls), 1)
+        self.assertAlmostEqual(results[0].rate * results[0].seconds, 10)
+
+    def test_history(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            # the directory of the history is created with it
+            path = os.path.join(directory, "enigma", "history.json")
+            self.assertEqual(bench.read_history(path), [])
+            self.assertIsNone(bench.baseline([]))
+
+            first = [bench.Result("a", "items", 1.0, 100.0),
+                     bench.Result("b", "items", 1.0, 100.0)]
+            bench.save_run(path, first, "base")
+            bench.save_run(path, [bench.Result("a", "items", 1.0, 50.0)])
+            history = bench.read_history(path)
+            self.assertEqual(len(history), 2)
+            self.assertIsNone(bench.baseline(history)["label"])
+            base = bench.baseline(history, "base")
+            self.assertEqual(base["results"]["b"]["rate"], 100.0)
+            self.assertIsNone(bench.baseline(history, "other"))
+
+        # only the cases of both runs are compared
+        results = [bench.Result("a", "items", 1.0, 95.0),
+                   bench.Result("b", "items", 1.0, 80.0),
+                   bench.Result("c", "items", 1.0, 10.0)]
+        changes = bench.compare(results, base, threshold=0.1)
+        self.assertEqual([c.name for c in changes], ["a", "b"])
+        self.assertEqual([c.regression for c in changes], [False, True])
+        self.assertAlmostEqual(changes[1].ratio, 0.8)
+
+    def test_suite(self):
+
+        # the suite is shipped in the package
+        modules = os.listdir(bench.SUITE)
+        self.assertIn("bench_machine.py", modules)
+        self.assertIn("bench_cli.py", modules)
+
+if __name__ == '__main__':
+    unittest.main()
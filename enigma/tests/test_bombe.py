@@ -0,0 +1,73 @@
+import unittest
+from enigma import bombe
+from enigma import enigma_machine
+
+
+class TestBombeMethods(unittest.TestCase):
+
+    plaintext = ("WETTERVORHERSAGEBISKAYAXXNORDWESTWINDSTAERKEFUENFXX"
+                 "REGENMITSICHTWEITEUNTERZWEISEEMEILEN")
+    plugs = ["AK", "BC", "UD", "PI", "QX", "EZ", "FM", "GN", "HT", "JR"]
+
+    def ciphertext(self, rot):
+        e = enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", self.plugs)
+        return e.encrypt_text(self.plaintext)
+
+    def test_menu(self):
+
+        ciphertext = self.ciphertext([[2, 7, 1], [5, 20, 1], [3, 11, 1]])
+        m = bombe.menu(ciphertext, "WETTERVORHERSAGEBISKAYA")
+        self.assertEqual(m.loops, 1)
+        self.assertIn(m.test, m.letters)
+        for a, b, i in m.edges:
+            self.assertEqual(chr(65 + a), self.plaintext[i])
+            self.assertEqual(chr(65 + b), ciphertext[i])
+
+        # the crib must not encrypt a letter to itself
+        with self.assertRaises(ValueError):
+            bombe.menu(ciphertext, ciphertext[3:8], offset=3)
+        with self.assertRaises(ValueError):
+            bombe.menu(ciphertext, "WETTER", offset=len(ciphertext) - 3)
+
+    def test_stop(self):
+
+        # the true key is the only stop for its rotor order
+        ciphertext = self.ciphertext([[2, 7, 1], [5, 20, 1], [3, 11, 1]])
+        b = bombe.Bombe(ciphertext, "WETTERVORHERSAGEBISKAYA")
+        stops = b.test((2, 5, 3))
+        self.assertEqual(len(stops), 1)
+        stop = stops[0]
+        self.assertEqual(stop.positions, (7, 20, 11))
+        self.assertEqual(stop.score, 23)
+        for plug in stop.steckers:
+            if plug[0] != plug[1]:
+                self.assertTrue(plug in self.plugs or plug[::-1] in self.plugs)
+
+    def test_run(self):
+
+        # crib in the middle of the message, several rotor orders in a pool
+        ciphertext = self.ciphertext([[1, 25, 1], [3, 5, 1], [2, 2, 1]])
+        crib = "NORDWESTWINDSTAERKEFUENF"
+        b = bombe.Bombe(ciphertext, crib, offset=25, rotors=(1, 2, 3))
+        stops = b.run(jobs=2)
+        self.assertEqual(stops[0].rotors, (1, 3, 2))
+        self.assertEqual(stops[0].positions, (25, 5, 2))
+        self.assertEqual(stops[0].score, len(crib))
+
+    def test_pure_python(self):
+
+        # search without NumPy agrees on a few positions around the key
+        ciphertext = self.ciphertext([[2, 7, 1], [5, 20, 1], [3, 11, 1]])
+        b = bombe.Bombe(ciphertext, "WETTERVORHERSAGEBISKAYA")
+        positions = [(p, 20, 11) for p in range(1, 27)]
+        numpy = bombe.numpy
+        bombe.numpy = None
+        try:
+            stops = b.test((2, 5, 3), positions)
+        finally:
+            bombe.numpy = numpy
+        self.assertEqual(stops, b.test((2, 5, 3), positions))
+        self.assertEqual([s.positions for s in stops], [(7, 20, 11)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from enigma import crack
+from enigma import enigma_machine
+
+
+class TestCrackMethods(unittest.TestCase):
+
+    plaintext = ("THEQUICKBROWNFOXJUMPSOVERTHELAZYDOGANDTHENRUNSAWAYINTOTHEFOR"
+                 "ESTWHEREITMEETSANOTHERFOXWHOISVERYFRIENDLYANDTHEYBECOMEFRIEN"
+                 "DSFORLIFETHEENDOFTHISSTORYISHAPPYBUTTHEREAREMANYOTHERSTORIES"
+                 "TOTELLABOUTTHEFORESTANDITSANIMALSSUCHASTHEBEARTHEDEERANDTHEO"
+                 "WLWHICHLIVEDINTHEOLDOAKTREENEARTHERIVERBANKFORMANYYEARS")
+
+    def test_index_of_coincidence(self):
+
+        self.assertEqual(crack.index_of_coincidence(b"\x00\x00"), 1.0)
+        self.assertEqual(crack.index_of_coincidence(bytes(range(0, 26))), 0.0)
+        self.assertEqual(crack.index_of_coincidence(b""), 0.0)
+
+    def test_search(self):
+
+        # middle rotor and slow rotor turn over within the message
+        rot = [[2, 7, 5], [3, 20, 17], [1, 11, 9]]
+        e = enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", [])
+        ciphertext = e.encrypt_text(self.plaintext)
+
+        reported = []
+        for candidates in crack.search_iter(ciphertext, "EnigmaI", rotors=(1, 2, 3),
+                                            reflectors=["UKW-B"], top=3, jobs=2):
+            self.assertEqual(candidates, sorted(candidates, key=lambda c: -c.ioc))
+            reported.append(candidates[0].ioc)
+        self.assertEqual(reported, sorted(reported))
+
+        best = candidates[0]
+        self.assertEqual(best.rotors, (2, 3, 1))
+        self.assertEqual(best.rings[1], 17)
+        plaintext = crack.decrypt(ciphertext, best, "EnigmaI")
+        matches = sum(1 for a, b in zip(plaintext, self.plaintext) if a == b)
+        self.assertGreater(matches, 0.9 * len(self.plaintext))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -373,5 +373,41 @@ class TestEnigmaMethods(unittest.TestCase):
         self.assertEqual("G", e.encrypt('A'))
         self.assertEqual("Y", e.encrypt('B'))
 
+    def test_advance(self):
+
+        ref = "UKW-B"
+        plugs = []
+        for ids in [[1, 2, 3], [8, 7, 6], [6, 1, 7], [3, 8, 2]]:
+            for p in [1, 4, 5, 12, 13, 17, 25, 26]:
+                rot = [[ids[0], p, 1], [ids[1], p, 1], [ids[2], p, 1]]
+                for n in [1, 25, 26, 27, 53, 703, 1379]:
+                    e = enigma_machine.EnigmaMachine("M3", rot, ref, plugs)
+                    a = enigma_machine.EnigmaMachine("M3", rot, ref, plugs)
+                    for x in range(0, n):
+                        e.step()
+                    a.advance(n)
+                    positions = [e.rotor_pos(r) for r in ["r1", "r2", "r3"]]
+                    self.assertEqual(positions,
+                                     [a.rotor_pos(r) for r in ["r1", "r2", "r3"]])
+
+                    # hand set positions may have been double stepped or
+                    # not, rewind only to positions reached by key presses
+                    if n < 26:
+                        continue
+
+                    # rewind to the positions before the key presses
+                    a.advance(500)
+                    a.advance(-500)
+                    self.assertEqual(positions,
+                                     [a.rotor_pos(r) for r in ["r1", "r2", "r3"]])
+
+        # encryption resumes mid-stream
+        rot = [[8, 26, 1], [7, 25, 1], [6, 24, 1]]
+        e = enigma_machine.EnigmaMachine("M3", rot, ref, plugs)
+        ciphertext = e.encrypt_text(self.plaintext)
+        a = enigma_machine.EnigmaMachine("M3", rot, ref, plugs)
+        a.advance(300)
+        self.assertEqual(ciphertext[300:], a.encrypt_text(self.plaintext[300:]))
+
 if __name__ == '__main__':
     unittest.main()
@@ -466,6 +466,44 @@ class TestEnigmaMethods(unittest.TestCase):
         self.assertEqual("G", e.encrypt('A'))
         self.assertEqual("Y", e.encrypt('B'))
 
+    def test_encrypt_text(self):
+
+        # bulk encryption must match test case 7 (UKW-C_THIN Reflector)
+        crossRef = ("GJBINQJOVXXSVANOFORGCHMBPHVLBOWCZXWAEJVRCYKSSGBQFBA"
+                    "SNXQYSGTQSFHWFNYXSCJMSDKSLNOZRSQWKICWEHPOYYRLDPPNFYDMR"
+                    "LVENKHJBMVRFQBXSTXNBQNWYNGRBJSYDYCORTJZOHZMHJQHOKWKWEH"
+                    "HZKAISKZXFBOFTFFKWHIATMSBOQCSQYENGDIXHKFOCGSZWUZYMWBIY"
+                    "AQZSQVOMQBDTDIKGLESYVJZQRANDGXWRRVMRKZXTHEVAONDFXLFMVN"
+                    "FORCKRHOYKRSNZDRZTNMFPPJUNRNEKAFFLCMFFZGWBROBUNXSWFMRY"
+                    "URMWEHZIUWEEBQQDLHGCIYJZTRIFNCSRBGKEFHAZKEUUKKCJ")
+
+        fast = [5, 4, 21]
+        middle = [2, 19, 8]
+        slow = [4, 13, 2]
+        static = [9, 17, 3]
+        rot = [fast, middle, slow, static]
+        ref = "UKW-C_THIN"
+        plugs = ["AK", "BC", "UD", "PI", "QX"]
+        e = enigma_machine.EnigmaMachine("M4", rot, ref, plugs)
+
+        # check for proper encryption
+        self.assertEqual(crossRef, e.encrypt_text(self.plaintext))
+
+        # check for proper decryption
+        e = enigma_machine.EnigmaMachine("M4", rot, ref, plugs)
+        self.assertEqual(self.plaintext, e.encrypt_text(crossRef))
+
+        # compiled tables follow the static rotor
+        e = enigma_machine.EnigmaMachine("M4", rot, ref, plugs)
+        c = enigma_machine.EnigmaMachine("M4", rot, ref, plugs)
+        e.compile()
+        self.assertEqual(crossRef, e.encrypt_text(self.plaintext))
+        c.encrypt_text(self.plaintext)
+        e.step_single(3)
+        c.step_single(3)
+        self.assertEqual(c.encrypt_text(self.plaintext),
+                         e.encrypt_text(self.plaintext))
+
 
 if __name__ == '__main__':
     unittest.main()
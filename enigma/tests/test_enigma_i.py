@@ -1,3 +1,4 @@
+import pickle
 import unittest
 from enigma import enigma_machine
 from enigma import enigma_exception
@@ -347,5 +348,136 @@ class TestEnigmaMethods(unittest.TestCase):
         self.assertEqual("Z", e.encrypt('A'))
         self.assertEqual("U", e.encrypt('B'))
 
+    def test_encrypt_text(self):
+
+        # bulk encryption must match test case 4 (ring settings)
+        crossRef = ("HQDOTZQRZZELCKEPOVXJFJYAHECMJRZTUVAUFGEOKUFIBEHQMUQ"
+                    "LSXOIYEEWABZXGDCEALKIZQNVZWXDCQWVVSSNLBSITAXCXHJYVIMHK"
+                    "ZGOJMDYXPOHMZBOPJXFWBCHCHDYQLMMICPYAGSFZJBNFNXTETJGGKO"
+                    "HMRXMBOJIMKUTWJNTFHYTKGZKYYPYKZCIOBNKLMMGXLPJGECGTSSVK"
+                    "TOQRUFSVGWZNCLZMLHLYIGLNBBHOCGIVJPKVRYWSXSCPJIDWUCYQQW"
+                    "CIALKYIONOAMDMJROWBQNSMHRRERFXAJHBNVUNEMJXAHQHUJTIBQHX"
+                    "RKLLOSZVTBRINGSWXLWPQBFHDFURKSAXJDVWJLHZMFMOCDPP")
+
+        fast = [1, 4, 21]
+        middle = [2, 19, 8]
+        slow = [3, 13, 2]
+        rot = [fast, middle, slow]
+        ref = "UKW-B"
+        plugs = ["AK", "BC", "UD", "PI", "QX"]
+        e = enigma_machine.EnigmaMachine("ENIGMAI", rot, ref, plugs)
+        ciphertext = e.encrypt_text(self.plaintext[:100].lower())
+        ciphertext += e.encrypt_text(self.plaintext[100:])
+
+        # check for proper encryption
+        self.assertEqual(crossRef, ciphertext)
+
+        # final rotor positions match character-by-character encryption
+        c = enigma_machine.EnigmaMachine("ENIGMAI", rot, ref, plugs)
+        for x in self.plaintext:
+            c.encrypt(x)
+        for r in ["r1", "r2", "r3"]:
+            self.assertEqual(c.rotor_pos(r), e.rotor_pos(r))
+
+        # integer codes give the same result
+        e = enigma_machine.EnigmaMachine("ENIGMAI", rot, ref, plugs)
+        codes = [ord(x) - 65 for x in crossRef]
+        original = e.encrypt_codes(codes)
+        self.assertEqual(self.plaintext, "".join(chr(x + 65) for x in original))
+
+        # non-alphabetic characters are rejected
+        with self.assertRaises(enigma_exception.InvalidCharacter):
+            e.encrypt_text("HELLO WORLD")
+
+    def test_compile(self):
+
+        # compiled tables must match test case 5 (use spare rotors)
+        fast = [5, 4, 21]
+        middle = [2, 19, 8]
+        slow = [4, 13, 2]
+        rot = [fast, middle, slow]
+        ref = "UKW-B"
+        plugs = ["AK", "BC", "UD", "PI", "QX"]
+        c = enigma_machine.EnigmaMachine("ENIGMAI", rot, ref, plugs)
+        crossRef = "".join(c.encrypt(x) for x in self.plaintext)
+
+        for lazy in [False, True]:
+            e = enigma_machine.EnigmaMachine("ENIGMAI", rot, ref, plugs)
+            e.compile(lazy=lazy, max_states=52)
+            self.assertTrue(e.compiled)
+            self.assertEqual(crossRef, e.encrypt_text(self.plaintext))
+            for r in ["r1", "r2", "r3"]:
+                self.assertEqual(c.rotor_pos(r), e.rotor_pos(r))
+
+            # tables follow changes to the plugboard
+            e = enigma_machine.EnigmaMachine("ENIGMAI", rot, ref, plugs)
+            u = enigma_machine.EnigmaMachine("ENIGMAI", rot, ref, plugs)
+            e.compile(lazy=lazy)
+            e.remove_plug("AK")
+            u.remove_plug("AK")
+            self.assertEqual(u.encrypt_text(self.plaintext),
+                             e.encrypt_text(self.plaintext))
+
+            e.decompile()
+            self.assertFalse(e.compiled)
+
+    def test_snapshot(self):
+
+        fast = [5, 4, 21]
+        middle = [2, 19, 8]
+        slow = [4, 13, 2]
+        rot = [fast, middle, slow]
+        ref = "UKW-B"
+        plugs = ["AK", "BC", "UD", "PI", "QX"]
+        e = enigma_machine.EnigmaMachine("ENIGMAI", rot, ref, plugs)
+        e.compile()
+
+        # rewind to a snapshot of the rotor positions
+        state = e.snapshot()
+        self.assertEqual(state, (4, 19, 13))
+        cipher = e.encrypt_text(self.plaintext)
+        e.restore(state)
+        self.assertEqual(cipher, e.encrypt_text(self.plaintext))
+
+        # full keys are hashable, and restore another key in place
+        key = e.snapshot(True)
+        u = enigma_machine.EnigmaMachine("ENIGMAI", [[1, 1, 1], [2, 1, 1], [3, 1, 1]],
+                                         "UKW-C", ["ZY", "XW"])
+        self.assertEqual(len({key, e.snapshot(True), u.snapshot(True)}), 2)
+        u.restore(key)
+        self.assertEqual(key, u.snapshot(True))
+        self.assertEqual(e.encrypt_text(self.plaintext), u.encrypt_text(self.plaintext))
+
+        # compiled tables follow the restored key
+        e.restore(u.snapshot(True))
+        u.restore(key)
+        e.restore(key)
+        self.assertEqual(e.encrypt_text(self.plaintext), u.encrypt_text(self.plaintext))
+
+        # keys round trip through bytes, including a single plug
+        e.remove_plug("AK")
+        e.remove_plug("BC")
+        e.remove_plug("UD")
+        e.remove_plug("PI")
+        data = e.to_bytes()
+        self.assertEqual(len(data), 50)
+        u = enigma_machine.EnigmaMachine.from_bytes(data)
+        self.assertEqual(e.snapshot(True), u.snapshot(True))
+
+        with self.assertRaises(ValueError):
+            e.restore(enigma_machine.MachineKey("M3", key.rotors, ref, key.plugboard))
+
+    def test_pickle(self):
+
+        # slotted machines pickle their key, compiled tables are rebuilt
+        rot = [[5, 4, 21], [2, 19, 8], [4, 13, 2]]
+        e = enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", ["AK", "BC"])
+        e.compile()
+        self.assertFalse(hasattr(e, "__dict__"))
+        u = pickle.loads(pickle.dumps(e))
+        self.assertTrue(u.compiled)
+        self.assertEqual(e.snapshot(True), u.snapshot(True))
+        self.assertEqual(e.encrypt_text(self.plaintext), u.encrypt_text(self.plaintext))
+
 if __name__ == '__main__':
     unittest.main()
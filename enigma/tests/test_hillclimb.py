@@ -0,0 +1,70 @@
+import unittest
+from enigma import crack
+from enigma import enigma_machine
+from enigma import hillclimb
+from enigma import ngram
+
+
+class TestHillclimbMethods(unittest.TestCase):
+
+    plaintext = ("THEQUICKBROWNFOXJUMPSOVERTHELAZYDOGANDTHENRUNSAWAYINTOTHEFOR"
+                 "ESTWHEREITMEETSANOTHERFOXWHOISVERYFRIENDLYANDTHEYBECOMEFRIEN"
+                 "DSFORLIFETHEENDOFTHISSTORYISHAPPYBUTTHEREAREMANYOTHERSTORIES"
+                 "TOTELLABOUTTHEFORESTANDITSANIMALSSUCHASTHEBEARTHEDEERANDTHEO"
+                 "WLWHICHLIVEDINTHEOLDOAKTREENEARTHERIVERBANKFORMANYYEARS")
+    rot = [[2, 7, 5], [3, 20, 17], [1, 11, 9]]
+    plugs = ["AK", "BC", "DU", "EZ", "FM", "GN", "HT", "IP", "JR", "QX"]
+
+    def test_scramblers(self):
+
+        # the plugboard on either side of each permutation is the machine
+        e = enigma_machine.EnigmaMachine("ENIGMAI", self.rot, "UKW-B",
+                                         self.plugs)
+        codes = crack._codes(self.plaintext)
+        perms = hillclimb.scramblers(e, len(codes))
+        self.assertEqual(e.snapshot(), (7, 20, 11))
+        mapping = e.snapshot(True).plugboard
+        self.assertEqual(hillclimb._decrypt(perms, codes, mapping),
+                         e.encrypt_codes(codes))
+        for p in perms:
+            self.assertEqual([p[p[c]] for c in range(0, 26)], list(range(0, 26)))
+
+    def test_trial(self):
+
+        # trial plugboards decrypt like the whole message remapped
+        e = enigma_machine.EnigmaMachine("ENIGMAI", self.rot, "UKW-B", [])
+        codes = crack._codes(self.plaintext)
+        perms = hillclimb.scramblers(e, len(codes))
+        mapping = tuple(range(0, 26))
+        text = hillclimb._Decryption(perms, codes, mapping)
+        for a, b in ((0, 10), (1, 2), (0, 1), (0, 10), (3, 20)):
+            for trial in hillclimb._rewire(mapping, a, b, 10):
+                self.assertEqual(text.trial(trial),
+                                 hillclimb._decrypt(perms, codes, trial))
+            mapping = trial
+            text.plug(mapping)
+            self.assertEqual(text.letters,
+                             hillclimb._decrypt(perms, codes, mapping))
+
+    def test_recover_plugs(self):
+
+        e = enigma_machine.EnigmaMachine("ENIGMAI", self.rot, "UKW-B",
+                                         self.plugs)
+        ciphertext = e.encrypt_text(self.plaintext)
+        e = enigma_machine.EnigmaMachine("ENIGMAI", self.rot, "UKW-B", [])
+
+        found = hillclimb.recover_plugs(e, ciphertext)
+        self.assertEqual(sorted(found.plugs), self.plugs)
+
+        trigrams = ngram.NgramScorer.from_text(self.plaintext, 3)
+        found = hillclimb.recover_plugs(e, ciphertext, score=trigrams,
+                                        restarts=2, seed=1)
+        self.assertEqual(sorted(found.plugs), self.plugs)
+        self.assertEqual(found.score,
+                         trigrams(crack._codes(self.plaintext)))
+
+        found = hillclimb.recover_plugs(e, ciphertext, max_plugs=4)
+        self.assertLessEqual(len(found.plugs), 4)
+
+if __name__ == '__main__':
+    unittest.main()
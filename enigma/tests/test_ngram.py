@@ -0,0 +1,103 @@
+import math
+import os
+import pickle
+import tempfile
+import unittest
+from enigma import ngram
+
+
+class TestNgramMethods(unittest.TestCase):
+
+    text = ("THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG, and then runs away into "
+            "the forest where it meets another fox.\n")
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_scorer(self):
+
+        scorer = ngram.NgramScorer({"AB": 3, "BA": 1}, floor=1)
+        self.assertEqual(scorer.n, 2)
+        self.assertEqual(len(scorer.table), 676)
+        self.assertAlmostEqual(scorer(b"\x00\x01\x00"), math.log10(3 / 16), 5)
+        self.assertAlmostEqual(scorer(b"\x02\x02"), math.log10(1 / 4), 5)
+        self.assertEqual(scorer(b"\x00"), 0.0)
+        with self.assertRaises(ValueError):
+            ngram.NgramScorer({"AB": 1, "ABC": 1})
+        with self.assertRaises(ValueError):
+            ngram.NgramScorer({"A1": 1})
+
+    def test_counter(self):
+
+        # n-grams span the pieces of a text
+        whole = ngram.NgramCounter(3)
+        whole.update(self.text.encode("ascii"))
+        pieces = ngram.NgramCounter(3)
+        for x in range(0, len(self.text), 4):
+            pieces.update(self.text[x:x + 4].encode("ascii"))
+        self.assertEqual(list(pieces.counts), list(whole.counts))
+        letters = sum(1 for c in self.text if c.isalpha())
+        self.assertEqual(whole.total, letters - 2)
+        self.assertEqual(whole.counts[ngram._index("THE")], 5)
+
+        with open(self.path("corpus.txt"), "w") as file:
+            file.write(self.text)
+        counter = ngram.NgramCounter(3)
+        counter.update_file(self.path("corpus.txt"), size=7)
+        self.assertEqual(list(counter.counts), list(whole.counts))
+
+        with self.assertRaises(ValueError):
+            ngram.NgramCounter(6)
+
+    def test_save_load(self):
+
+        built = ngram.NgramScorer.from_text(self.text, 4)
+        built.save(self.path("quadgrams.bin"))
+        self.assertEqual(os.path.getsize(self.path("quadgrams.bin")),
+                         8 + 4 * 26 ** 4)
+
+        loaded = ngram.NgramScorer.load(self.path("quadgrams.bin"))
+        self.assertEqual(loaded.n, 4)
+        self.assertEqual(loaded.path, self.path("quadgrams.bin"))
+        codes = bytes(ord(c) - 65 for c in "THEQUICKFOXZZZQ")
+        self.assertEqual(loaded(codes), built(codes))
+
+        # worker processes map the file again rather than copy the table
+        data = pickle.dumps(loaded)
+        self.assertLess(len(data), 200)
+        copy = pickle.loads(data)
+        self.assertEqual(copy(codes), built(codes))
+        copy.close()
+        loaded.close()
+
+        with open(self.path("bad.bin"), "wb") as file:
+            file.write(b"NGRM\x01\x04\x00\x00" + bytes(16))
+        with self.assertRaises(ValueError):
+            ngram.NgramScorer.load(self.path("bad.bin"))
+
+    def test_vectorized(self):
+
+        # rows of a 2D array are scored at once, and agree with pure Python
+        if ngram.numpy is None:
+            self.skipTest("NumPy not installed")
+        scorer = ngram.NgramScorer.from_text(self.text, 3)
+        rows = [bytes((x * 7 + y) % 26 for y in range(0, 40))
+                for x in range(0, 5)]
+        scores = scorer(ngram.numpy.array([list(r) for r in rows]))
+        numpy = ngram.numpy
+        ngram.numpy = None
+        try:
+            expected = [scorer(r) for r in rows]
+        finally:
+            ngram.numpy = numpy
+        for a, b in zip(scores, expected):
+            self.assertAlmostEqual(a, b, 3)
+
+if __name__ == '__main__':
+    unittest.main()
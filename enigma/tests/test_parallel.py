@@ -0,0 +1,58 @@
+import random
+import unittest
+from enigma import enigma_machine
+from enigma import parallel
+
+
+class TestParallelMethods(unittest.TestCase):
+
+    def test_encrypt_text(self):
+
+        # chunks small enough that turnovers fall on chunk boundaries
+        min_chunk = parallel.MIN_CHUNK
+        parallel.MIN_CHUNK = 101
+        try:
+            rng = random.Random(7)
+            message = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+                              for x in range(5000))
+            rot = [[8, 26, 1], [7, 25, 3], [6, 24, 1]]
+            plugs = ["AK", "BC", "UD", "PI", "QX"]
+            a = enigma_machine.EnigmaMachine("M3", rot, "UKW-B", plugs)
+            b = enigma_machine.EnigmaMachine("M3", rot, "UKW-B", plugs)
+            b.compile()
+            self.assertEqual(a.encrypt_text(message),
+                             parallel.encrypt_text(b, message, jobs=3))
+            for r in ["r1", "r2", "r3"]:
+                self.assertEqual(a.rotor_pos(r), b.rotor_pos(r))
+        finally:
+            parallel.MIN_CHUNK = min_chunk
+
+    def test_encryptor(self):
+
+        # one pool follows the machine through the pieces of a stream
+        min_chunk = parallel.MIN_CHUNK
+        parallel.MIN_CHUNK = 101
+        try:
+            rng = random.Random(8)
+            pieces = [bytes(rng.randrange(26) for x in range(n))
+                      for n in (3000, 150, 2500)]
+            rot = [[1, 3, 2], [4, 17, 1], [5, 5, 9]]
+            a = enigma_machine.EnigmaMachine("M3", rot, "UKW-C", ["QW"])
+            b = enigma_machine.EnigmaMachine("M3", rot, "UKW-C", ["QW"])
+            with parallel.ParallelEncryptor(jobs=2) as encryptor:
+                for codes in pieces:
+                    self.assertEqual(a.encrypt_codes(codes),
+                                     encryptor.encrypt_codes(b, codes))
+
+                # workers follow changes of the key between pieces
+                a.add_many_plugs(["ER"])
+                b.add_many_plugs(["ER"])
+                self.assertEqual(a.encrypt_codes(pieces[0]),
+                                 encryptor.encrypt_codes(b, pieces[0]))
+            self.assertEqual(a.snapshot(), b.snapshot())
+        finally:
+            parallel.MIN_CHUNK = min_chunk
+
+
+if __name__ == '__main__':
+    unittest.main()
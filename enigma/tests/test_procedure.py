@@ -0,0 +1,90 @@
+import unittest
+from enigma import enigma_exception
+from enigma import enigma_machine
+from enigma import procedure
+
+
+class TestProcedureMethods(unittest.TestCase):
+
+    # Operation Barbarossa, 7 July 1941: rotors II IV V, rings 2 21 12,
+    # reflector B, start WXC and message key BLA (indicator KCH)
+    plugs = ["AV", "BS", "CG", "DL", "FU", "HZ", "IN", "KM", "OW", "RX"]
+    ciphertext = "EDPUDNRGYSZRCXNUYTPOMRMBOFKTBZREZKMLXLVEFGUEYSIOZV"
+    plaintext = "AUFKLXABTEILUNGXVONXKURTINOWAXKURTINOWAXNORDWESTLX"
+
+    def machine(self):
+        rot = [[5, 1, 12], [4, 1, 21], [2, 1, 2]]
+        return enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B",
+                                            self.plugs)
+
+    def at(self, key):
+        """machine of the daily key at a message key"""
+        machine = self.machine()
+        machine.restore(tuple([ord(c) - 64 for c in reversed(key)]))
+        return machine
+
+    def test_start(self):
+
+        keys = procedure.KeyProcedure(self.machine(), spaces="remove",
+                                      group=0)
+        self.assertFalse(keys.doubled)
+        self.assertEqual(keys.decrypt(("WXC", "KCH", self.ciphertext)),
+                         ("BLA", self.plaintext))
+        self.assertEqual(keys.encrypt(self.plaintext, "BLA", "WXC"),
+                         ("WXC", "KCH", self.ciphertext))
+
+        with self.assertRaises(ValueError):
+            keys.encrypt(self.plaintext, "BLA")
+        with self.assertRaises(enigma_exception.InvalidMessageKey):
+            keys.encrypt(self.plaintext, "BL", "WXC")
+
+    def test_doubled(self):
+
+        keys = procedure.KeyProcedure(self.machine(), ground="ABL",
+                                      spaces="remove", group=0)
+        self.assertTrue(keys.doubled)
+        message = keys.encrypt(self.plaintext, "BLA")
+
+        # the key is typed twice at the ground setting
+        self.assertEqual(message.indicator, self.at("ABL").encrypt_text("BLABLA"))
+        self.assertEqual(message.text, self.at("BLA").encrypt_text(self.plaintext))
+        self.assertEqual(keys.decrypt(message), ("BLA", self.plaintext))
+
+        with self.assertRaises(enigma_exception.InvalidIndicator):
+            keys.decrypt((None, message.indicator[:5] + "A", message.text))
+
+    def test_many(self):
+
+        messages = [("MESSAGE NUMBER %d" % i * (i % 7 + 1),
+                     chr(65 + i % 26) + chr(65 + i * 7 % 26) + "Q")
+                    for i in range(0, 60)]
+        for ground in ("ABL", None):
+            keys = procedure.KeyProcedure(self.machine(), ground=ground,
+                                          compile=ground is None)
+            if ground is None:
+                messages = [m + ("WXC",) for m in messages]
+            encrypted = keys.encrypt_many(messages)
+            for (text, key, *start), m in zip(messages, encrypted):
+                self.assertEqual(m, keys.encrypt(text, key, *start))
+            decrypted = keys.decrypt_many(encrypted)
+            self.assertEqual([m[1] for m in messages],
+                             [m.key for m in decrypted])
+
+        # messages of the M4 are grouped by fourth rotor position
+        rot = [[1, 1, 1], [2, 1, 1], [3, 1, 1], [9, 1, 1]]
+        machine = enigma_machine.EnigmaMachine("M4", rot, "UKW-B_THIN", [])
+        keys = procedure.KeyProcedure(machine, ground="AAAA", group=0,
+                                      spaces="remove")
+        messages = [(self.plaintext, c + "BLA") for c in "ZAQA"]
+        encrypted = keys.encrypt_many(messages)
+        for (text, key), m in zip(messages, encrypted):
+            machine = enigma_machine.EnigmaMachine(
+                "M4", [[1, 1, 1], [2, 12, 1], [3, 2, 1],
+                       [9, ord(key[0]) - 64, 1]], "UKW-B_THIN", [])
+            self.assertEqual(m.text, machine.encrypt_text(text))
+        self.assertEqual([m[1] for m in messages],
+                         [m.key for m in keys.decrypt_many(encrypted)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import io
+import unittest
+from enigma import enigma_machine
+from enigma import progress
+from enigma import stream
+
+
+class TestProgressMethods(unittest.TestCase):
+
+    def test_draw(self):
+
+        out = io.StringIO()
+        with progress.Progress(4096, file=out, interval=0) as bar:
+            bar.update(1024, 1000)
+            self.assertIn(" 25%", out.getvalue())
+            bar.update(3072, 3000)
+            self.assertEqual((4096, 4000), (bar.size, bar.letters))
+
+        line = out.getvalue().split("\r")[-1]
+        self.assertTrue(line.startswith("Encrypting  100%  4.0 KB of 4.0 KB"))
+        self.assertIn("letters/s", line)
+        self.assertIn("ETA 0:00", line)
+        self.assertTrue(line.endswith("\n"))
+
+        # without a total, only the size processed is shown
+        out = io.StringIO()
+        with progress.Progress(file=out, interval=0) as bar:
+            bar.update(10)
+        self.assertNotIn("%", out.getvalue())
+        self.assertIn("10 B", out.getvalue())
+
+    def test_quiet(self):
+
+        # hidden or quick jobs draw nothing
+        out = io.StringIO()
+        with progress.Progress(100, file=out, enabled=False) as bar:
+            bar.update(100, 100)
+        with progress.Progress(100, file=out, interval=60) as bar:
+            bar.update(100, 100)
+        self.assertEqual("", out.getvalue())
+        self.assertEqual(100, bar.letters)
+
+        self.assertFalse(progress.interactive(io.StringIO()))
+
+    def test_stream(self):
+
+        rot = [[1, 1, 1], [2, 1, 1], [3, 1, 1]]
+        machine = enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", ["AB"])
+        chunks = ["HELLO WORLD 12", "3 ", "GOODBYE"]
+        bar = progress.Progress(enabled=False)
+        result = "".join(stream.encrypt_stream(machine, chunks, bar,
+                                               spaces="remove"))
+        self.assertEqual(len("".join(chunks)), bar.size)
+        self.assertEqual(17, bar.letters)
+        self.assertEqual(17, len(result.replace(" ", "").replace("\n", "")))
+
+        # UTF-8 pieces count bytes, like the size of the file read
+        data = "\u00c4HNLICH \u00dcBER".encode()
+        bar = progress.Progress(len(data), enabled=False)
+        list(stream.encrypt_stream(machine, stream.utf8_pieces(data, 3), bar))
+        self.assertEqual(len(data), bar.size)
+        self.assertEqual(9, bar.letters)
+
+
+if __name__ == '__main__':
+    unittest.main()
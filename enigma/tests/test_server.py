@@ -0,0 +1,241 @@
+import errno
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from enigma import server
+from enigma import stream
+from enigma.tests import fixtures
+
+
+class TestServerMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.assembled = []
+        self.persisted = []
+
+    def factory(self, config, options):
+        self.assembled.append((config, options))
+        return fixtures.factory(config, options)
+
+    def test_handle(self):
+
+        daemon = server.EncryptionServer(self.factory)
+        message = "HELLO WORLD"
+        self.assertEqual(daemon.handle({"message": message}),
+                         {"ciphertext": fixtures.expected(message)})
+
+        # positions are not remembered, the same message encrypts the same
+        self.assertEqual(daemon.handle({"message": message, "config": "User"}),
+                         {"ciphertext": fixtures.expected(message)})
+
+        # the selected configuration and its name share one machine
+        self.assertEqual(len(self.assembled), 2)
+        self.assertEqual(daemon.handle({"message": "A"}),
+                         {"ciphertext": fixtures.expected("A")})
+        self.assertEqual(len(self.assembled), 2)
+
+        response = daemon.handle({"message": message,
+                                  "options": {"plugs": "CD"},
+                                  "preferences": {"group": "0"}})
+        self.assertEqual(response["ciphertext"],
+                         fixtures.expected(message, ["CD"], group=0))
+
+    def test_remember(self):
+
+        daemon = server.EncryptionServer(self.factory, self.persisted.append)
+        remember = {"remember": "True"}
+        first = daemon.handle({"message": "ABCDE", "preferences": remember})
+        second = daemon.handle({"message": "ABCDE", "preferences": remember})
+        self.assertEqual(first["ciphertext"], fixtures.expected("ABCDE"))
+        self.assertEqual(second["ciphertext"],
+                         fixtures.expected("ABCDE", positions=[6, 1, 1]))
+
+        # positions are saved when flushed, once
+        self.assertEqual(self.persisted, [])
+        self.assertEqual(daemon.handle({"op": "flush"}), {"ok": True})
+        self.assertEqual(self.persisted, [{"User": (11, 1, 1)}])
+        daemon.flush()
+        self.assertEqual(len(self.persisted), 1)
+
+        # requests overriding settings neither use nor change the positions
+        daemon.handle({"message": "ABCDE", "options": {"plugs": "AB"},
+                       "preferences": remember})
+        daemon.flush()
+        self.assertEqual(len(self.persisted), 1)
+
+        # reloading assembles the machines again
+        daemon.handle({"op": "reload"})
+        daemon.handle({"message": "ABCDE"})
+        self.assertEqual(len(self.assembled), 3)
+
+    def test_max_machines(self):
+
+        # only the machines used last are kept
+        daemon = server.EncryptionServer(self.factory, max_machines=2)
+        for fast in ("1", "2", "1", "3", "1", "2"):
+            response = daemon.handle({"message": "HELLO",
+                                      "options": {"fast": fast}})
+            self.assertEqual(response["ciphertext"], fixtures.expected(
+                "HELLO", positions=[int(fast), 1, 1]))
+        self.assertEqual([options["fast"] for x, options in self.assembled],
+                         ["1", "2", "3", "2"])
+
+    def test_compile(self):
+
+        machines = []
+
+        def counting(config, options):
+            result = fixtures.factory(config, options)
+            machines.append(result[0])
+            return result
+
+        # machines are assembled once and compiled once they are reused
+        daemon = server.EncryptionServer(counting)
+        for x in range(0, server.COMPILE_AFTER + 1):
+            self.assertEqual(daemon.handle({"message": "HELLO, WORLD"}),
+                             {"ciphertext": fixtures.expected("HELLO WORLD")})
+        self.assertEqual(1, len(machines))
+        self.assertTrue(machines[0].compiled)
+
+        # only the letters encrypted are counted
+        metrics = daemon.handle({"op": "metrics"})["metrics"]
+        self.assertEqual(metrics["letters"], 10 * (server.COMPILE_AFTER + 1))
+
+    def test_errors(self):
+
+        daemon = server.EncryptionServer(self.factory)
+        self.assertEqual(daemon.handle({"message": "A", "config": "Other"}),
+                         {"error": "Configuration Other could not be found"})
+        self.assertIn("error", daemon.handle({}))
+        self.assertIn("error", daemon.handle({"op": "unknown"}))
+
+        metrics = daemon.handle({"op": "metrics"})["metrics"]
+        self.assertEqual(metrics["requests"], 3)
+        self.assertEqual(metrics["errors"], 3)
+        self.assertIsNotNone(metrics["latency_p50"])
+
+    @unittest.skipIf(server._UnixServer is None, "no Unix sockets")
+    def test_serve(self):
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        address = os.path.join(directory, "enigma.sock")
+
+        daemon = server.EncryptionServer(self.factory, self.persisted.append,
+                                         persist_interval=60.0)
+        ready = threading.Thread(target=daemon.serve, args=(address,))
+        ready.start()
+        try:
+            for x in range(0, 100):
+                if os.path.exists(address):
+                    break
+                threading.Event().wait(0.01)
+            self.assertEqual(os.stat(address).st_mode & 0o777, 0o600)
+
+            results = {}
+
+            def send(n):
+                results[n] = server.request(address, {
+                    "message": "HELLO", "preferences": {"remember": "True"}})
+
+            threads = [threading.Thread(target=send, args=(n,))
+                       for n in range(0, 8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            # each message continues from the positions of the one before
+            machine, preferences, name = self.factory(None, {})
+            encryptor = stream.StreamEncryptor(machine, spaces="remove",
+                                               newlines=False)
+            expected = {encryptor.encrypt("HELLO") for n in range(0, 8)}
+            self.assertEqual({r["ciphertext"] for r in results.values()},
+                             expected)
+
+            metrics = server.request(address, {"op": "metrics"})["metrics"]
+            self.assertEqual(metrics["requests"], 8)
+        finally:
+            daemon.shutdown()
+            ready.join()
+
+        # positions are saved at shutdown
+        self.assertEqual(self.persisted, [{"User": (15, 2, 1)}])
+        self.assertFalse(os.path.exists(address))
+
+    @unittest.skipIf(server._UnixServer is None, "no Unix sockets")
+    def test_socket_path(self):
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        address = os.path.join(directory, "enigma.sock")
+
+        # other files are never removed
+        with open(address, "w") as file:
+            file.write("notes")
+        daemon = server.EncryptionServer(self.factory, self.persisted.append)
+        with self.assertRaises(FileExistsError):
+            daemon.serve(address)
+        with open(address) as file:
+            self.assertEqual(file.read(), "notes")
+        os.unlink(address)
+
+        # the socket of a stopped server is replaced, a live one is not
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(address)
+        stale.close()
+        running = threading.Thread(target=daemon.serve, args=(address,))
+        running.start()
+        try:
+            for x in range(0, 100):
+                try:
+                    server.request(address, {"op": "metrics"})
+                    break
+                except OSError:
+                    threading.Event().wait(0.01)
+
+            other = server.EncryptionServer(self.factory, self.persisted.append)
+            with self.assertRaises(OSError) as raised:
+                other.serve(address)
+            self.assertEqual(raised.exception.errno, errno.EADDRINUSE)
+        finally:
+            daemon.shutdown()
+            running.join()
+        self.assertFalse(os.path.exists(address))
+
+    @unittest.skipIf(not hasattr(os, "getuid"), "no user ids")
+    def test_default_socket(self):
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        with mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": directory}):
+            self.assertEqual(server.default_socket(),
+                             os.path.join(directory, "enigma.sock"))
+
+        # otherwise in a directory only the user may enter
+        with mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": ""}), \
+                mock.patch.object(tempfile, "tempdir", directory):
+            address = server.default_socket()
+            private = os.path.dirname(address)
+            self.assertEqual(os.stat(private).st_mode & 0o777, 0o700)
+            self.assertEqual(address, server.default_socket())
+
+            os.chmod(private, 0o755)
+            with self.assertRaises(PermissionError):
+                server.default_socket()
+
+        # sockets of other users are not connected to
+        with open(address, "w"):
+            pass
+        with mock.patch.object(os, "getuid", return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                server.request(address, {"op": "metrics"})
+
+
+if __name__ == '__main__':
+    unittest.main()
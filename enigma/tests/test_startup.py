@@ -0,0 +1,121 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import enigma_driver
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+def run(code, *options):
+    """run Python code in a fresh process from the repository root"""
+    return subprocess.run([sys.executable] + list(options) + ["-c", code],
+                          cwd=ROOT, capture_output=True, text=True,
+                          check=True)
+
+
+class TestStartupMethods(unittest.TestCase):
+
+    def test_lazy_imports(self):
+
+        # machine modules and NumPy wait for the commands using them
+        loaded = run("import sys, enigma_driver; print(' '.join(sys.modules))")
+        modules = loaded.stdout.split()
+        for name in ("numpy", "enigma.enigma_machine", "enigma.crack",
+                     "enigma.stream", "enigma.parallel", "enigma.bench"):
+            self.assertNotIn(name, modules)
+
+    def test_import_budget(self):
+
+        # time spent importing the driver itself (without click and
+        # configparser), in microseconds
+        timings = {}
+        result = run("import enigma_driver", "-X", "importtime")
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                timings[fields[2].strip()] = int(fields[1])
+        own = (timings["enigma_driver"] - timings["click"] -
+               timings.get("configparser", 0))
+        self.assertLess(own, 100000)
+
+    def test_encrypt_imports(self):
+
+        # a short message is encrypted by the machine itself, without
+        # NumPy or a process pool (with a copy of the configurations, in
+        # case positions are remembered)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        configs = os.path.join(directory, "config.ini")
+        shutil.copy(enigma_driver.user_configs, configs)
+        code = ("import sys, enigma_driver\n"
+                "enigma_driver.user_configs = %r\n"
+                "try:\n"
+                "    enigma_driver.cli(['encrypt', 'HELLO WORLD'])\n"
+                "except SystemExit:\n"
+                "    pass\n"
+                "print(' '.join(sys.modules), file=sys.stderr)" % configs)
+        result = run(code, "-X", "importtime")
+        self.assertTrue(result.stdout.strip())
+        modules = result.stderr.splitlines()[-1].split()
+        self.assertIn("enigma.enigma_machine", modules)
+        for name in ("numpy", "multiprocessing", "enigma.vectorized",
+                     "enigma.parallel"):
+            self.assertNotIn(name, modules)
+
+        # time spent importing the modules of the package, in microseconds
+        own = 0
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit() and \
+                    fields[2].strip().startswith("enigma"):
+                own += int(fields[0].split(":")[1])
+        self.assertLess(own, 100000)
+
+        # a single job needs no process pool, whatever the message
+        result = run("import sys, enigma_driver\n"
+                     "with enigma_driver._engine(1):\n"
+                     "    pass\n"
+                     "print('enigma.parallel' in sys.modules)")
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_config_read_once(self):
+
+        # config.ini is parsed again only when it changes on disk
+        with mock.patch.object(enigma_driver, "_config_stamp", None), \
+                mock.patch.object(enigma_driver.config, "read",
+                                  wraps=enigma_driver.config.read) as read:
+            self.assertTrue(enigma_driver.read_config())
+            enigma_driver.load_config("Default")
+            enigma_driver.load_config("User")
+            self.assertTrue(enigma_driver.read_config())
+            self.assertEqual(read.call_count, 1)
+
+        with mock.patch.object(enigma_driver, "user_configs",
+                               os.path.join(ROOT, "missing.ini")):
+            self.assertFalse(enigma_driver.read_config())
+
+    def test_cache_dir(self):
+
+        # parsed wiring is cached per user, or where the environment says
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        code = ("from enigma import registry; registry.model('M3'); "
+                "print(registry.CACHE_DIR)")
+        environ = dict(os.environ, XDG_CACHE_HOME=directory)
+        environ.pop("ENIGMA_CACHE_DIR", None)
+        for cache in (os.path.join(directory, "enigma"),
+                      os.path.join(directory, "own")):
+            result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                                    env=environ, capture_output=True,
+                                    text=True, check=True)
+            self.assertEqual(result.stdout.strip(), cache)
+            self.assertEqual(len(os.listdir(cache)), 1)
+            environ["ENIGMA_CACHE_DIR"] = os.path.join(directory, "own")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import pickle
+import unittest
+from enigma import enigma_machine
+from enigma import parallel
+from enigma import stats
+from enigma import vectorized
+
+
+class TestStatsMethods(unittest.TestCase):
+
+    def machine(self, rot=None):
+        if rot is None:
+            rot = [[2, 7, 5], [3, 4, 17], [1, 11, 9]]
+        return enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B",
+                                            ["AB", "CD"])
+
+    def replay(self, machine, count):
+        """count rotor movements by pressing keys one at a time"""
+        notch0, notch1 = machine._notches()
+        p0, p1, p2 = (machine.rotor_pos(r) - 1 for r in ("r1", "r2", "r3"))
+        steps = turnovers = double = 0
+        for x in range(0, count):
+            if notch1[p1]:
+                double += 1
+                turnovers += 1
+                steps += 2
+            elif notch0[p0]:
+                turnovers += 1
+                steps += 1
+            p0, p1, p2 = enigma_machine._press(p0, p1, p2, notch0, notch1)
+            steps += 1
+        return count, steps, turnovers, double
+
+    def counters(self, s):
+        return s.letters, s.steps, s.turnovers, s.double_steps
+
+    def test_record(self):
+
+        # rotor VI has two notches, the middle rotor starts on its notch
+        for rot in ([[1, 1, 1], [2, 1, 1], [3, 1, 1]],
+                    [[6, 13, 1], [2, 5, 1], [3, 1, 1]],
+                    [[3, 22, 1], [1, 17, 1], [2, 1, 1]]):
+            e = enigma_machine.EnigmaMachine("M3", rot, "UKW-B", [])
+            for count in (0, 1, 25, 26, 700, 20000):
+                s = stats.Stats()
+                p = (e.rotor_pos("r1") - 1, e.rotor_pos("r2") - 1)
+                s.record(p, count, *e._turnovers())
+                self.assertEqual(self.counters(s), self.replay(e, count))
+
+    def test_machine(self):
+
+        # every engine counts the letters of one call once
+        text = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG" * 40
+        codes = text.encode("ascii").translate(enigma_machine._TO_CODES)
+        plain = self.machine()
+        self.assertIsNone(plain.stats)
+        expected = self.replay(plain, 3 * len(text) + 1)
+
+        e = self.machine()
+        e.stats = stats.Stats()
+        self.assertEqual(e.encrypt("Q"), plain.encrypt("Q"))
+        self.assertEqual(e.encrypt_text(text), plain.encrypt_text(text))
+        self.assertEqual(vectorized.encrypt_codes(e, codes),
+                         plain.encrypt_codes(codes))
+        self.assertEqual(parallel.encrypt_codes(e, codes, jobs=1),
+                         plain.encrypt_codes(codes))
+        self.assertEqual(self.counters(e.stats), expected)
+        self.assertEqual(e.stats.calls("encrypt"), 4)
+        self.assertGreater(e.stats.seconds("encrypt"), 0)
+        self.assertGreater(e.stats.rate, 0)
+
+        # worker copies do not collect stats
+        self.assertIsNone(pickle.loads(pickle.dumps(e)).stats)
+
+        e.stats.reset()
+        self.assertEqual(self.counters(e.stats), (0, 0, 0, 0))
+        e.stats = None
+        e.encrypt_text(text)
+
+    def test_timer(self):
+
+        s = stats.Stats(sample=3)
+        for x in range(0, 7):
+            with s.timer("read"):
+                pass
+        self.assertEqual(s.stages, ["read"])
+        self.assertEqual(s.calls("read"), 7)
+        self.assertEqual(s.seconds("write"), 0.0)
+        with self.assertRaises(ValueError):
+            stats.Stats(sample=0)
+
+if __name__ == '__main__':
+    unittest.main()
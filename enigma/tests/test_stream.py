@@ -0,0 +1,140 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+from enigma import enigma_machine
+from enigma import stream
+
+
+class TestStreamMethods(unittest.TestCase):
+
+    # test case 1 of the Enigma I tests
+    plaintext = ("LOREMIPSUMDOLORSITAMETCONSECTETURADIPISCINGELITSEDD"
+                 "OEIUSMODTEMPORINCIDIDUNTUTLABOREETDOLOREMAGNAALIQUAUTE")
+    crossRef = ("ILFDFARUBDONVISRUKOZQMNDIYCOUHRLAWBRMPYLAZNYNGRMRMV"
+                "AAJLNSZFHSYBBKFODPCHQPHSWOQZCJFKXNBAZJNPZHZBGOMNXOPPXX")
+
+    def machine(self):
+        rot = [[1, 1, 1], [2, 1, 1], [3, 1, 1]]
+        return enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", [])
+
+    def test_group(self):
+
+        # pieces split mid-group continue the group
+        chunks = [self.plaintext[0:7], self.plaintext[7:8], self.plaintext[8:]]
+        output = "".join(stream.encrypt_stream(self.machine(), chunks,
+                                               spaces="remove", group=5))
+        expected = "".join(self.crossRef[i:i + 5] + " "
+                           for i in range(0, len(self.crossRef), 5))
+        self.assertEqual(expected, output)
+
+    def test_layout(self):
+
+        # spaces and newlines are kept, other characters removed
+        text = "lorem ip-sum\n\ndolor, 42 sit"
+        output = "".join(stream.encrypt_stream(self.machine(), [text[:9], text[9:]],
+                                               spaces="keep"))
+        self.assertEqual("ILFDF ARUBD\n\nONVIS  RUK", output)
+
+        # spaces entered as X, newlines as spaces
+        output = "".join(stream.encrypt_stream(self.machine(), [text],
+                                               spaces="X", newlines=False))
+        c = self.machine()
+        self.assertEqual(c.encrypt_text("LOREMXIPSUMXXDOLORXXSIT"), output)
+
+        # decrypted Xs become spaces
+        output = "".join(stream.encrypt_stream(self.machine(), [output],
+                                               space_detect=True))
+        self.assertEqual("LOREM IPSUM  DOLOR  SIT", output)
+
+    def test_large_pieces(self):
+
+        # large pieces are laid out with NumPy, small ones piece by piece
+        text = "".join(self.plaintext[i:i + 7] + " ,\n"[i % 3]
+                       for i in range(0, len(self.plaintext), 7)) * 20
+        chunks = [text[0:3], text[3:1500], text[1500:]]
+        for options in [{"spaces": "remove", "group": 5},
+                        {"spaces": "remove", "group": 4, "newlines": False},
+                        {"spaces": "keep"}, {"spaces": "X"},
+                        {"space_detect": True}]:
+            output = "".join(stream.encrypt_stream(self.machine(), chunks,
+                                                   **options))
+            with mock.patch.object(stream, "NUMPY_FORMAT", len(text) + 1):
+                expected = "".join(stream.encrypt_stream(self.machine(),
+                                                         chunks, **options))
+            self.assertEqual(expected, output)
+
+    def test_message_encryptor(self):
+
+        options = stream.preference_options(
+            {"spaces": "remove", "space_detect": "False", "group": "0",
+             "newlines": "False"})
+        self.assertEqual(options, {"spaces": "remove", "space_detect": False,
+                                   "group": 0, "newlines": False})
+
+        # short and long messages encrypt the same whatever the engine
+        for message in (self.plaintext, self.plaintext * 20):
+            encryptor = stream.message_encryptor(self.machine(), len(message),
+                                                 **options)
+            self.assertEqual(encryptor.encrypt(message),
+                             self.machine().encrypt_text(message))
+
+    def test_read_chunks(self):
+
+        chunks = list(stream.read_chunks(io.StringIO(self.plaintext), 10))
+        self.assertEqual(11, len(chunks))
+        self.assertEqual(self.plaintext, "".join(chunks))
+
+    def test_read_utf8_chunks(self):
+
+        # pieces never split a character, whatever the read size
+        text = "\u00e9\u20ac\U0001f600".join(self.plaintext)
+        data = text.encode()
+        for size in (1, 2, 3, 7):
+            chunks = list(stream.read_utf8_chunks(io.BytesIO(data), size))
+            self.assertEqual(text, "".join(c.decode() for c in chunks))
+            pieces = list(stream.utf8_pieces(data, size + 3))
+            self.assertEqual(text, "".join(p.decode() for p in pieces))
+
+        with self.assertRaises(UnicodeDecodeError):
+            list(stream.read_utf8_chunks(io.BytesIO(data + b"\xc3"), 4))
+
+        # byte pieces encrypt like the text
+        output = "".join(stream.encrypt_stream(
+            self.machine(), stream.read_utf8_chunks(io.BytesIO(data), 5),
+            spaces="remove", group=0))
+        self.assertEqual(self.crossRef, output)
+
+    def test_encrypt_bytes(self):
+
+        encryptor = stream.StreamEncryptor(self.machine(), spaces="remove", group=5)
+        output = encryptor.encrypt_bytes(self.plaintext[:7].lower().encode())
+        output += encryptor.encrypt_bytes("\u00e9".join(self.plaintext[7:]).encode())
+        expected = "".join(self.crossRef[i:i + 5] + " "
+                           for i in range(0, len(self.crossRef), 5))
+        self.assertEqual(expected.encode(), output)
+
+    def test_encrypt_file(self):
+
+        # small pieces split the multi-byte characters
+        text = "\u00e9 ".join(self.plaintext[i:i + 3]
+                               for i in range(0, len(self.plaintext), 3))
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "in.txt")
+            destination = os.path.join(directory, "out.txt")
+            with open(source, "w", encoding="utf-8") as file:
+                file.write(text)
+
+            written = stream.encrypt_file(self.machine(), source, destination,
+                                          size=4, spaces="keep")
+            with open(destination, "rb") as file:
+                output = file.read()
+
+        expected = "".join(stream.encrypt_stream(self.machine(), [text],
+                                                 spaces="keep"))
+        self.assertEqual(expected.encode(), output)
+        self.assertEqual(len(output), written)
+
+if __name__ == '__main__':
+    unittest.main()
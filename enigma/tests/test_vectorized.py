@@ -0,0 +1,93 @@
+import random
+import unittest
+from enigma import enigma_machine
+from enigma import enigma_exception
+from enigma import vectorized
+
+
+class TestVectorizedMethods(unittest.TestCase):
+
+    # used for all encryption tests
+    plaintext = ("LOREMIPSUMDOLORSITAMETCONSECTETURADIPISCINGELITSEDD"
+                 "OEIUSMODTEMPORINCIDIDUNTUTLABOREETDOLOREMAGNAALIQUAUTE"
+                 "NIMADMINIMVENIAMQUISNOSTRUDEXERCITATIONULLAMCOLABORISN"
+                 "ISIUTALIQUIPEXEACOMMODOCONSEQUATDUISAUTEIRUREDOLORINRE"
+                 "PREHENDERITINVOLUPTATEVELITESSECILLUMDOLOREEUFUGIATNUL"
+                 "LAPARIATUREXCEPTEURSINTOCCAECATCUPIDATATNONPROIDENTSUN"
+                 "TINCULPAQUIOFFICIADESERUNTMOLLITANIMIDESTLABORUM")
+
+    def test_encrypt_ring_settings(self):
+
+        # Enigma I test case 4 (pseudo random ring settings)
+        crossRef = ("HQDOTZQRZZELCKEPOVXJFJYAHECMJRZTUVAUFGEOKUFIBEHQMUQ"
+                    "LSXOIYEEWABZXGDCEALKIZQNVZWXDCQWVVSSNLBSITAXCXHJYVIMHK"
+                    "ZGOJMDYXPOHMZBOPJXFWBCHCHDYQLMMICPYAGSFZJBNFNXTETJGGKO"
+                    "HMRXMBOJIMKUTWJNTFHYTKGZKYYPYKZCIOBNKLMMGXLPJGECGTSSVK"
+                    "TOQRUFSVGWZNCLZMLHLYIGLNBBHOCGIVJPKVRYWSXSCPJIDWUCYQQW"
+                    "CIALKYIONOAMDMJROWBQNSMHRRERFXAJHBNVUNEMJXAHQHUJTIBQHX"
+                    "RKLLOSZVTBRINGSWXLWPQBFHDFURKSAXJDVWJLHZMFMOCDPP")
+
+        rot = [[1, 4, 21], [2, 19, 8], [3, 13, 2]]
+        plugs = ["AK", "BC", "UD", "PI", "QX"]
+        e = enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", plugs)
+        self.assertEqual(crossRef, vectorized.encrypt_text(e, self.plaintext))
+
+        e = enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", plugs)
+        self.assertEqual(self.plaintext, vectorized.encrypt_text(e, crossRef))
+
+        with self.assertRaises(enigma_exception.InvalidCharacter):
+            vectorized.encrypt_text(e, "HELLO WORLD")
+
+    def test_encrypt_reflect_c_thin(self):
+
+        # M4 test case 7 (UKW-C_THIN Reflector)
+        crossRef = ("GJBINQJOVXXSVANOFORGCHMBPHVLBOWCZXWAEJVRCYKSSGBQFBA"
+                    "SNXQYSGTQSFHWFNYXSCJMSDKSLNOZRSQWKICWEHPOYYRLDPPNFYDMR"
+                    "LVENKHJBMVRFQBXSTXNBQNWYNGRBJSYDYCORTJZOHZMHJQHOKWKWEH"
+                    "HZKAISKZXFBOFTFFKWHIATMSBOQCSQYENGDIXHKFOCGSZWUZYMWBIY"
+                    "AQZSQVOMQBDTDIKGLESYVJZQRANDGXWRRVMRKZXTHEVAONDFXLFMVN"
+                    "FORCKRHOYKRSNZDRZTNMFPPJUNRNEKAFFLCMFFZGWBROBUNXSWFMRY"
+                    "URMWEHZIUWEEBQQDLHGCIYJZTRIFNCSRBGKEFHAZKEUUKKCJ")
+
+        rot = [[5, 4, 21], [2, 19, 8], [4, 13, 2], [9, 17, 3]]
+        plugs = ["AK", "BC", "UD", "PI", "QX"]
+        e = enigma_machine.EnigmaMachine("M4", rot, "UKW-C_THIN", plugs)
+        self.assertEqual(crossRef, vectorized.encrypt_text(e, self.plaintext))
+
+    def test_double_step(self):
+
+        # compare against character-by-character encryption in blocks small
+        # enough that rotor turnovers cross block boundaries
+        block_size = vectorized.BLOCK_SIZE
+        vectorized.BLOCK_SIZE = 37
+        try:
+            rng = random.Random(3)
+            message = "".join(rng.choice(self.plaintext) for x in range(3000))
+            for ids in [[1, 2, 3], [8, 7, 6], [6, 2, 7], [2, 8, 5]]:
+                for p in [1, 4, 5, 12, 13, 16, 25, 26]:
+                    rot = [[ids[0], p, 1], [ids[1], p, 3], [ids[2], 1, 1]]
+                    a = enigma_machine.EnigmaMachine("M3", rot, "UKW-B", [])
+                    b = enigma_machine.EnigmaMachine("M3", rot, "UKW-B", [])
+                    expected = "".join(a.encrypt(c) for c in message)
+                    self.assertEqual(expected,
+                                     vectorized.encrypt_text(b, message))
+                    for r in ["r1", "r2", "r3"]:
+                        self.assertEqual(a.rotor_pos(r), b.rotor_pos(r))
+        finally:
+            vectorized.BLOCK_SIZE = block_size
+
+    def test_fallback(self):
+
+        # without NumPy the pure-Python bulk path is used
+        numpy = vectorized.numpy
+        vectorized.numpy = None
+        try:
+            self.assertFalse(vectorized.available())
+            rot = [[3, 1, 1], [2, 1, 1], [1, 1, 1]]
+            e = enigma_machine.EnigmaMachine("ENIGMAI", rot, "UKW-B", [])
+            self.assertEqual(vectorized.encrypt_text(e, "AAAAA"), "BDZGO")
+        finally:
+            vectorized.numpy = numpy
+
+if __name__ == '__main__':
+    unittest.main()
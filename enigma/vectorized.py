@@ -0,0 +1,237 @@
+"""Vectorized encryption engine for long messages
+
+The whole message is encrypted in a handful of array passes: the rotor
+positions for every key press are computed up front (including the double
+step of the middle rotor), after which each letter is gathered through the
+plugboard, rotors and reflector tables of the machine.  NumPy is optional;
+without it every function falls back to the pure-Python bulk path of
+EnigmaMachine.
+"""
+
+from enigma import enigma_exception
+from enigma import enigma_machine
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# number of letters pushed through the tables per pass (bounds memory use)
+BLOCK_SIZE = 1 << 20
+
+
+def available():
+    """return True if the NumPy engine is available"""
+    return numpy is not None
+
+
+def encrypt_text(machine, text):
+    """pass a whole string of letters through the machine
+
+    Arguments:
+
+    - machine: EnigmaMachine, left in the same state as after encrypting
+    each letter with encrypt()
+
+    - text: string of letters (A-Z, any case)
+
+    Returns the encrypted string in upper case
+    """
+
+    if numpy is None:
+        return machine.encrypt_text(text)
+
+    text = text.upper()
+    invalid = enigma_machine._INVALID.search(text)
+    if invalid is not None:
+        raise enigma_exception.InvalidCharacter(invalid.group())
+
+    codes = text.encode("ascii").translate(enigma_machine._TO_CODES)
+    result = encrypt_codes(machine, codes)
+    return result.translate(enigma_machine._TO_LETTERS).decode("ascii")
+
+
+def encrypt_codes(machine, codes):
+    """pass a sequence of letters (as integers 0-25) through the machine
+
+    Arguments:
+
+    - machine: EnigmaMachine, left in the same state as after encrypting
+    each letter with encrypt()
+
+    - codes: sequence of integers (0-25), e.g. a list, bytes object or
+    NumPy array
+
+    Returns the encrypted letters as a bytes object of integers (0-25)
+    """
+
+    if machine.stats is not None:
+        return machine.stats.measure(machine, encrypt_codes, codes)
+
+    if numpy is None:
+        return machine.encrypt_codes(codes)
+
+    if isinstance(codes, (bytes, bytearray, memoryview)):
+        codes = numpy.frombuffer(codes, dtype=numpy.uint8)
+    else:
+        codes = numpy.asarray(codes)
+    if codes.size and (codes.min() < 0 or codes.max() > 25):
+        raise ValueError("letter codes must be in the range 0-25")
+    codes = codes.astype(numpy.intp)
+
+    positions, fast_in, fast_out, mid_fwd, mid_inv, inner, \
+        notch0, notch1 = machine._tables()
+    tables = [numpy.array(t, dtype=numpy.uint8).ravel()
+              for t in (fast_in, mid_fwd, inner, mid_inv, fast_out)]
+    notch0 = numpy.array(notch0, dtype=bool)
+
+    # a machine compiled up front needs a single gather per letter
+    compiled = machine._compiled()
+    if compiled is not None and isinstance(compiled[1], bytes):
+        compiled = numpy.frombuffer(compiled[1], dtype=numpy.uint8)
+    else:
+        compiled = None
+
+    result = numpy.empty(len(codes), dtype=numpy.uint8)
+    for start in range(0, len(codes), BLOCK_SIZE):
+        block = codes[start:start + BLOCK_SIZE]
+        fast, middle, slow = _positions(positions, len(block),
+                                        notch0, notch1)
+        positions = (int(fast[-1]), int(middle[-1]), int(slow[-1]))
+
+        if compiled is not None:
+            state = (fast + 26 * middle + 676 * slow) * 26
+            result[start:start + len(block)] = compiled[state + block]
+            continue
+
+        # every stage is a gather from a flattened 26 x 26 table
+        fast *= 26
+        middle *= 26
+        slow *= 26
+        block = tables[0][fast + block]
+        block = tables[1][middle + block]
+        block = tables[2][slow + block]
+        block = tables[3][middle + block]
+        result[start:start + len(block)] = tables[4][fast + block]
+
+    machine._set_positions(positions)
+    return result.tobytes()
+
+
+def _positions(start, count, notch0, notch1):
+    """compute the rotor positions used for each of count key presses
+
+    Arguments:
+
+    - start: tuple of fast, middle and slow rotor positions (0-25)
+    before the first key press
+
+    - count: number of key presses
+
+    - notch0: NumPy boolean array of fast rotor turnover positions
+
+    - notch1: list of middle rotor turnover flags
+
+    Returns three integer arrays with the fast, middle and slow positions
+    after each key press
+    """
+
+    p0, p1, p2 = start
+    cycle = numpy.arange(p0, p0 + 26) % 26
+
+    # the middle rotor is carried whenever the fast rotor leaves a notch
+    carry = numpy.resize(notch0[cycle], count)
+    carries = numpy.flatnonzero(carry)
+    schedule = _fast_schedule(p1, notch1, carries, carry, count)
+    if schedule is None:
+        schedule = _schedule(p1, notch1, carries.tolist(), count)
+    middle_steps, slow_steps = schedule
+
+    fast = numpy.resize((cycle + 1) % 26, count)
+    middle = _repeat(p1, middle_steps, count)
+    slow = _repeat(p2, slow_steps, count)
+    return fast, middle, slow
+
+
+def _repeat(position, steps, count):
+    """expand the key presses stepping a rotor into its positions"""
+    steps = numpy.sort(numpy.asarray(steps, dtype=numpy.intp))
+    values = (position + numpy.arange(len(steps) + 1)) % 26
+    bounds = numpy.concatenate(([0], steps, [count]))
+    return numpy.repeat(values, numpy.diff(bounds))
+
+
+def _fast_schedule(p1, notch1, carries, carry, count):
+    """vectorized form of _schedule()
+
+    Valid only when a double step can never coincide with a carry or
+    land the middle rotor on another notch, which holds for every rotor
+    with non-adjacent notches.  Returns None when that is not the case.
+    """
+
+    middle = carries
+    slow = numpy.empty(0, dtype=numpy.intp)
+
+    # middle rotor resting on its notch double steps on the first press
+    if notch1[p1] and count:
+        p1 = (p1 + 1) % 26
+        if notch1[p1]:
+            return None
+        if len(carries) and carries[0] == 0:
+            carries = carries[1:]
+        slow = numpy.zeros(1, dtype=numpy.intp)
+        middle = numpy.concatenate((slow, carries))
+
+    # resting positions of the middle rotor between carries (notches are
+    # always left by a double step); a carry onto a notch double steps
+    rest = [m for m in range(p1, p1 + 26) if not notch1[m % 26]]
+    doubles = [notch1[(m + 1) % 26] for m in rest]
+    if any(notch1[(m + 2) % 26] for m, d in zip(rest, doubles) if d):
+        return None
+
+    doubles = numpy.array(doubles, dtype=bool)
+    index = numpy.arange(len(carries)) % len(rest)
+    double = carries[doubles[index]] + 1
+    double = double[double < count]
+    if carry[double].any():
+        return None
+
+    slow = numpy.concatenate((slow, double))
+    middle = numpy.concatenate((middle, double))
+    return middle, slow
+
+
+def _schedule(p1, notch1, carries, count):
+    """find the key presses that step the middle and slow rotors
+
+    The middle rotor steps when carried by the fast rotor, and again on
+    the following key press if it came to rest on its own notch (the
+    double step), which also steps the slow rotor.
+
+    Returns lists of key press indices for the middle and slow rotors
+    """
+
+    middle = []
+    slow = []
+
+    # a middle rotor resting on its notch double steps on the next press
+    pending = 0 if notch1[p1] else count
+    k = 0
+    while True:
+        carry = carries[k] if k < len(carries) else count
+        if pending <= carry:
+            if pending >= count:
+                break
+            press = pending
+            slow.append(press)
+            if carry == press:
+                k += 1
+        else:
+            press = carry
+            k += 1
+
+        middle.append(press)
+        p1 = (p1 + 1) % 26
+        pending = press + 1 if notch1[p1] else count
+
+    return middle, slow
@@ -3,11 +3,15 @@ __license__ = "MIT"
 __version__ = "1.0.0"
 __email__ = "cjengdahl@gmail.com"
 
-from enigma import enigma_machine
+# machine modules (and NumPy through them) are imported by the commands
+# using them, so that short commands start quickly
 from enigma import enigma_exception
 import configparser
 import click
+import contextlib
 import os
+import threading
+import time
 
 # instantiate config parser
 config = configparser.ConfigParser(interpolation=configparser.
@@ -16,6 +20,10 @@ config = configparser.ConfigParser(interpolation=configparser.
 pwd = os.path.dirname(__file__)
 user_configs = os.path.join(pwd, 'enigma/config.ini')
 
+# modification time and size of config.ini when last read or written, see
+# read_config()
+_config_stamp = None
+
 
 class DecryptAlias(click.Group):
 
@@ -50,7 +58,7 @@ def list(configuration):
     Lists the existing user configurations.
     """
 
-    if len(config.read(user_configs)) == 0:
+    if not read_config():
         click.echo("\nError: Config file, \"config.ini\", not found\n")
         return
 
@@ -100,7 +108,7 @@ def pref(spaces, group, remember, space_detect, select, newlines, progress):
     Manages the default preferences.  Invoked options updates preferences
     """
 
-    if len(config.read(user_configs)) == 0:
+    if not read_config():
         click.echo("\nConfig file, \"config.ini\", not found\n")
         return
 
@@ -178,6 +186,9 @@ def new(configuration, model, fast, middle, slow, static, reflect, plugs):
     except enigma_exception.MaxPlugsReached:
         click.echo("Error: More plugs than allowed have been specified")
         return
+    except enigma_exception.InvalidCharacter:
+        click.echo("Error: Plugs must connect two letters (A-Z)")
+        return
     except enigma_exception.DuplicateRotor:
         click.echo("Error: Duplicate rotors are not allowed")
         return
@@ -204,7 +215,7 @@ def clear():
     Clears all users configurations with the exception of 'Default' and 'User'.
     """
 
-    config.read(user_configs)
+    read_config()
 
     for x in config.sections():
         if x.upper() not in ['DEFAULT', 'USER', 'PREFERENCES']:
@@ -213,8 +224,175 @@ def clear():
     # set config preference to User
     config["Preferences"]["select"] = "User"
 
-    with open(user_configs, 'w') as configfile:
-            config.write(configfile)
+    save_config()
+
+
+@cli.command()
+@click.option('--model', '-m', type=click.Choice(['EnigmaI', 'M1', 'M2', 'M3', 'M4']), default='EnigmaI', help='Enigma machine model')
+@click.option('--static', '-r4', type=click.STRING, help='Static rotor config: (9 for beta, 10 for gamma), position (1-26), and ring setting (1-26)')
+@click.option('--reflect', '-r', type=click.Choice(['UKW-A', 'UKW-B', 'UKW-C', 'UKW-B_THIN', 'UKW-C_THIN']), help='Enigma reflector (all of the model if omitted)')
+@click.option('--top', '-t', type=click.IntRange(1), default=5, help="Number of candidate keys listed")
+@click.option('--rings/--no-rings', default=True, help="Refine ring settings of the best candidates")
+@click.option('--jobs', '-j', type=click.IntRange(1), help="Number of processes used to search (all CPUs if omitted)")
+@click.option('--input', '-f', type=click.File('r'), required=False, help="Path to input file")
+@click.argument('ciphertext', type=click.STRING, required=False)
+def crack(model, static, reflect, top, rings, jobs, input, ciphertext):
+    """
+    Searches for the rotor order, start positions and ring settings of a ciphertext, without plugs.  Candidate keys are
+    ranked by the index of coincidence of their decryption, and listed as they improve.
+    """
+
+    from enigma import crack as key_search
+    from enigma import enigma_machine
+
+    if ciphertext is None:
+        if input is None:
+            click.echo("Error: No ciphertext given")
+            return
+        ciphertext = input.read()
+
+    if model == "M4" and static is None:
+        click.echo("Error: M4 model requires static rotor")
+        return
+
+    if static is not None:
+        static = [int(x) for x in static.split(",")]
+
+    reflectors = None
+    if reflect is not None:
+        reflectors = [reflect]
+
+    try:
+        candidates = []
+        for candidates in key_search.search_iter(ciphertext, model, reflectors=reflectors, static=static, top=top,
+                                                 refine=rings, jobs=jobs):
+            click.echo()
+            for candidate in candidates:
+                click.echo(_candidate_options(candidate))
+
+    except ValueError as error:
+        click.echo("Error: %s" % error)
+        return
+    except (enigma_exception.InvalidRotor, enigma_exception.InvalidRotorFour):
+        click.echo("Error: Invalid static rotor specified")
+        return
+    except enigma_exception.InvalidReflector:
+        click.echo("Error: Invalid reflector specified, check model compatibility")
+        return
+
+    click.echo("\nBest decryption (without plugs):\n")
+    click.echo(key_search.decrypt(enigma_machine._INVALID.sub("", ciphertext.upper()), candidates[0], model, static))
+
+
+def _candidate_options(candidate):
+    """
+    Formats a candidate key with its index of coincidence, as encrypt options
+    :return (str):
+    """
+
+    rotors = ["-r%d %d,%d,%d" % (r + 1, candidate.rotors[r], candidate.positions[r], candidate.rings[r])
+              for r in range(0, 3)]
+    return "%.4f  %s -r %s" % (candidate.ioc, " ".join(rotors), candidate.reflector)
+
+
+@cli.command()
+@click.option('--length', '-n', type=click.IntRange(1, 5), default=4, help="Number of letters per n-gram (4 for quadgrams)")
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), required=True, help="Path to table file")
+@click.option('--floor', type=click.FloatRange(0, min_open=True), default=0.01, help="Count given to missing n-grams")
+@click.argument('corpus', type=click.Path(exists=True, dir_okay=False), nargs=-1, required=True)
+def ngrams(length, output, floor, corpus):
+    """
+    Counts the n-grams of text files and saves their log probabilities in a binary table, which is memory-mapped when
+    scoring decryptions.
+    """
+
+    from enigma import ngram
+
+    counter = ngram.NgramCounter(length)
+    for path in corpus:
+        counter.update_file(path)
+
+    try:
+        counter.scorer(floor).save(output)
+    except ValueError as error:
+        click.echo("Error: %s" % error)
+        return
+
+    click.echo("Counted %d %d-grams, table saved to %s" % (counter.total, length, output))
+
+
+@cli.command()
+@click.option('--suite', type=click.Path(exists=True, file_okay=False), help="Directory of bench_*.py modules (the suite of the package if omitted)")
+@click.option('--filter', '-k', 'pattern', default='*', help="Run benchmarks matching a pattern (e.g. \"encrypt/*\")")
+@click.option('--repeat', type=click.IntRange(1), default=5, help="Number of timings of each benchmark (the best is kept)")
+@click.option('--history', type=click.Path(dir_okay=False), help="Path to JSON history file (bench-history.json in the user's data directory if omitted)")
+@click.option('--baseline', '-b', help="Label of the run compared with (the last run if omitted)")
+@click.option('--label', '-l', help="Label of this run in the history")
+@click.option('--threshold', type=click.FloatRange(0, 1), default=0.1, help="Fraction of throughput lost flagged as a regression")
+@click.option('--save/--no-save', default=True, help="Append this run to the history")
+@click.pass_context
+def bench(ctx, suite, pattern, repeat, history, baseline, label, threshold, save):
+    """
+    Times the benchmark suite and compares the throughput with a baseline run from the history.  Exits with status 1 if
+    a benchmark regressed.
+    """
+
+    from enigma import bench as benchmark
+
+    suite = suite or benchmark.SUITE
+    history = history or benchmark.HISTORY
+
+    cases = benchmark.load(suite)
+    previous = benchmark.baseline(benchmark.read_history(history), baseline)
+    if baseline is not None and previous is None:
+        click.echo("Error: No run labelled %s in the history" % baseline)
+        ctx.exit(2)
+
+    def report(result):
+        click.echo("%-36s %14.0f %s/s" % (result.name, result.rate, result.unit))
+
+    results = benchmark.run(cases, pattern, repeat, callback=report)
+    if not results:
+        click.echo("Error: No benchmark matches %s" % pattern)
+        ctx.exit(2)
+
+    if save:
+        benchmark.save_run(history, results, label)
+
+    if previous is None:
+        return
+
+    click.echo("\nCompared with %s (%s):\n" % (previous["label"] or "last run", previous["time"]))
+    changes = benchmark.compare(results, previous, threshold)
+    for change in changes:
+        click.echo("%-36s %+7.1f%%%s" % (change.name, 100 * (change.ratio - 1),
+                                         "  REGRESSION" if change.regression else ""))
+
+    if any(change.regression for change in changes):
+        ctx.exit(1)
+
+
+@cli.command()
+@click.option('--input', '-f', type=click.File('r'), default='-', help="Path to JSON lines input file (standard input if omitted)")
+@click.option('--output', '-o', type=click.File('w'), default='-', help="Path to JSON lines output file (standard output if omitted)")
+@click.option('--jobs', '-j', type=click.IntRange(1), help="Number of processes used to encrypt (all CPUs if omitted)")
+def batch(input, output, jobs):
+    """
+    Encrypts JSON lines records, each a message with a configuration and/or machine settings of its own, writing a JSON
+    line of result for each record in the same order.  Rotor positions are not remembered.
+    """
+
+    from enigma import batch as batch_encryption
+
+    if not read_config():
+        click.echo("\nError: Config file, \"config.ini\", not found\n", err=True)
+        return
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    for line in batch_encryption.encrypt_lines(input, _config_machine, jobs):
+        output.write(line + "\n")
 
 
 @cli.command()
@@ -225,7 +403,7 @@ def delete(configuration):
     can not be deleted
     """
 
-    if len(config.read(user_configs)) == 0:
+    if not read_config():
         click.echo("\nError: Config file, \"config.ini\", not found\n")
         return
 
@@ -258,8 +436,7 @@ def delete(configuration):
                 # update config preference to be User config
                 config["Preferences"]["select"] = "User"
 
-            with open(user_configs, 'w') as configfile:
-                config.write(configfile)
+            save_config()
     else:
         click.echo("\nError: Cannot delete \"Default\" or \"User\" configurations\n")
 
@@ -271,7 +448,7 @@ def reset(configuration):
     Resets specified configuration to \"Default\" settings.
     """
 
-    if len(config.read(user_configs)) == 0:
+    if not read_config():
         click.echo("\nError: Config file, \"config.ini\", not found\n")
         return
 
@@ -295,8 +472,7 @@ def reset(configuration):
             config[configuration] = {}
             for x in config.options('Default'):
                 config[configuration][x] = config['Default'][x]
-            with open(user_configs, 'w') as configfile:
-                config.write(configfile)
+            save_config()
 
     else:
         click.echo("\nError: Cannot reset \"Default\" configuration\n")
@@ -321,18 +497,21 @@ def reset(configuration):
 @click.option('--update', '-u', is_flag=True, help='Overwrite config file with invoked preferences, and options')
 @click.option('--remember', '-k', type=click.Choice(['True', 'False']), help='Remember machine state after encryption')
 # input/output options
-@click.option('--input', '-f', type=click.File('r'), required=False, help="Path to input file")
+@click.option('--input', '-f', type=click.File('r'), required=False, help="Path to input file (UTF-8)")
 @click.option('--output', '-o', type=click.File('w'), required=False, help="Path to output file")
+@click.option('--mmap', 'use_mmap', is_flag=True, help="Memory-map input and output files (UTF-8)")
+@click.option('--jobs', '-j', type=click.IntRange(1), default=1, help="Number of processes used to encrypt")
+@click.option('--stats', 'show_stats', is_flag=True, help="Print letters per second and the time spent on I/O, filtering and encryption")
 # arguments
 @click.argument('message', type=click.STRING, required=False)
-def encrypt(spaces, group, model, fast, middle, slow, static, reflect, plugs, select, update, remember, message, input, output, space_detect, newlines):
+def encrypt(spaces, group, model, fast, middle, slow, static, reflect, plugs, select, update, remember, message, input, output, space_detect, newlines, jobs, use_mmap, show_stats):
     """
     Encrypts text input with Enigma Machine.  All input is converted to uppercase and non-alphabetic characters (with the exception
     of spaces and newline characters) are removed.  
     """
 
     # get user configurations
-    if len(config.read(user_configs)) == 0:
+    if not read_config():
         click.echo("\nError: Config file, \"config.ini\", not found\n")
         return
 
@@ -379,6 +558,9 @@ def encrypt(spaces, group, model, fast, middle, slow, static, reflect, plugs, se
     except enigma_exception.MaxPlugsReached:
         click.echo("Error: More plugs than allowed have been specified")
         return
+    except enigma_exception.InvalidCharacter:
+        click.echo("Error: Plugs must connect two letters (A-Z)")
+        return
     except enigma_exception.DuplicateRotor:
         click.echo("Error: Duplicate rotors are not allowed")
         return
@@ -410,16 +592,42 @@ def encrypt(spaces, group, model, fast, middle, slow, static, reflect, plugs, se
     newlines = str_to_bool(newlines)
     progress = str_to_bool(progress)
 
-    # if input file used, overwrite message
-    if message is None and input is not None:
-        message = input.read()
+    # count and time the letters encrypted
+    if show_stats:
+        from enigma import stats
+        enigma.stats = stats.Stats()
+        started = time.perf_counter()
+
+    # memory-map input and output files
+    if use_mmap:
+        if (message is not None or input is None or output is None or
+                not os.path.isfile(input.name) or not _is_path(output)):
+            click.echo("Error: --mmap requires input and output files")
+            return
+
+        with _replacing(output.name) as destination:
+            _encrypt_mmap(enigma, input.name, destination, spaces, space_detect, group, newlines, progress, jobs)
 
-        # if newlines is True, treat newlines as spaces
-        if not newlines:
-            message = message.replace('\n', ' ')          
+    # if input file used, stream it through the machine piece by piece (without progress between pieces printed)
+    elif message is None and input is not None:
+        if output is None:
+            for piece in _encrypt_stream(enigma, input, spaces, space_detect, group, newlines, False, jobs):
+                click.echo(piece, nl=False)
+            click.echo()
+
+        elif not _is_path(output):
+            for piece in _encrypt_stream(enigma, input, spaces, space_detect, group, newlines, False, jobs):
+                output.write(piece)
+
+        # the output file is only replaced once the input has been read, so it may be the input file
+        else:
+            with _replacing(output.name) as destination, open(destination, 'w') as file:
+                for piece in _encrypt_stream(enigma, input, spaces, space_detect, group, newlines, progress, jobs):
+                    file.write(piece)
 
     # encrypt message
-    ciphertext = _encrypt(enigma, message, spaces, space_detect, group, progress)
+    else:
+        ciphertext = _encrypt(enigma, message, spaces, space_detect, group, newlines, progress, jobs)
 
     # save state of machine for next use, if requested
     if str_to_bool(remember):
@@ -435,139 +643,360 @@ def encrypt(spaces, group, model, fast, middle, slow, static, reflect, plugs, se
         config[select]["r3_p"] = str(r3_p)
 
         # write changes
-        with open(user_configs, 'w') as configfile:
-            config.write(configfile)
+        save_config()
+
+    # print cipher (already written if streamed)
+    if use_mmap or (message is None and input is not None):
+        pass
 
-    # print cipher
-    if output is not None:
+    elif output is not None:
         output.write(ciphertext)
 
     else:
         click.echo(ciphertext)
 
+    if show_stats:
+        _print_stats(enigma.stats, time.perf_counter() - started)
+
+
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), help="Path to Unix socket (a per-user socket in $XDG_RUNTIME_DIR or a private temporary directory if omitted)")
+@click.option('--port', type=click.IntRange(0, 65535), help="Listen on a localhost TCP port instead of a Unix socket")
+@click.option('--persist', type=click.FloatRange(0.1), default=5.0, help="Seconds between saves of remembered rotor positions")
+@click.option('--batch', type=click.IntRange(1), default=64, help="Most requests encrypted in one pass")
+def serve(socket_path, port, persist, batch):
+    """
+    Runs an encryption server keeping the machines of the configurations assembled.  Remembered rotor positions are kept
+    in memory and saved every few seconds, and when the server stops.  Messages are sent with the send command.
+    """
+
+    from enigma import server
+    import signal
+
+    try:
+        address = _server_address(socket_path, port)
+    except OSError as error:
+        click.echo("Error: %s" % error)
+        return
+
+    daemon = server.EncryptionServer(_config_machine, _serve_persist, persist, batch)
+
+    # stop cleanly (saving remembered positions) when terminated
+    def terminate(signum, frame):
+        threading.Thread(target=daemon.shutdown).start()
+    signal.signal(signal.SIGTERM, terminate)
+
+    click.echo("Serving on %s" % (address if isinstance(address, str) else "%s:%d" % address), err=True)
+    try:
+        daemon.serve(address)
+    except KeyboardInterrupt:
+        pass
+    except OSError as error:
+        click.echo("Error: %s" % error)
+
+
+@cli.command()
+# formatting options
+@click.option('--spaces', '-s', type=click.Choice(['remove', 'X', 'keep']), help='Set space handling preference')
+@click.option('--newlines', '-n', type=click.Choice(['True', 'False']), help='Include newline characters')
+@click.option('--space-detect', '-d', type=click.Choice(['True', 'False']), help='Convert decrypted Xs to spaces')
+@click.option('--group', '-g', help='Set output letter grouping')
+# enigma setting options
+@click.option('--model', '-m', type=click.STRING, help='Enigma machine model')
+@click.option('--fast', '-r1', type=click.STRING, help='Fast rotor config: id (1-8) , position (1-26), and ring setting (1-26)')
+@click.option('--middle', '-r2', type=click.STRING, help='Middle rotor config: id (1-8) , position (1-26), and ring setting (1-26)')
+@click.option('--slow', '-r3', type=click.STRING, help='Slow rotor config: id (1-8) , position (1-26), and ring setting (1-26)')
+@click.option('--static', '-r4', type=click.STRING, help='Static rotor config: (9 for beta, 10 for gamma), position (1-26), and ring setting (1-26)')
+@click.option('--reflect', '-r', type=click.Choice(['UKW-A', 'UKW-B', 'UKW-C', 'UKW-B_THIN', 'UKW-C_THIN']), help='Enigma reflector')
+@click.option('--plugs', '-p', type=click.STRING, help='Plugs inserted in plugboard (e.g. "AB,XY")')
+# config management options
+@click.option('--select', '-c', help='Select enigma machine configuration')
+@click.option('--remember', '-k', type=click.Choice(['True', 'False']), help='Remember machine state after encryption')
+# input/output options
+@click.option('--input', '-f', type=click.File('r'), required=False, help="Path to input file")
+@click.option('--output', '-o', type=click.File('w'), required=False, help="Path to output file")
+# server options
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), help="Path to the server's Unix socket")
+@click.option('--port', type=click.IntRange(1, 65535), help="Localhost TCP port of the server")
+@click.option('--metrics', is_flag=True, help="Print the server's metrics instead of encrypting")
+@click.argument('message', type=click.STRING, required=False)
+def send(spaces, newlines, space_detect, group, model, fast, middle, slow, static, reflect, plugs, select, remember, input, output, socket_path, port, metrics, message):
+    """
+    Encrypts text input with a running encryption server (see serve), taking the same options as encrypt.
+    """
+
+    from enigma import server
+
+    try:
+        address = _server_address(socket_path, port)
+    except OSError as error:
+        click.echo("Error: %s" % error)
+        return
+
+    if metrics:
+        payload = {"op": "metrics"}
+    else:
+        if message is None:
+            if input is None:
+                click.echo("Error: No message given")
+                return
+            message = input.read()
+
+        options = {'model': model, 'fast': fast, 'middle': middle, 'slow': slow, 'static': static,
+                   'reflect': reflect, 'plugs': plugs}
+        preferences = {'spaces': spaces, 'group': group, 'remember': remember, 'space_detect': space_detect,
+                       'newlines': newlines}
+        payload = {"message": message, "config": select,
+                   "options": {k: v for k, v in options.items() if v is not None},
+                   "preferences": {k: v for k, v in preferences.items() if v is not None}}
+
+    try:
+        response = server.request(address, payload)
+    except OSError as error:
+        click.echo("Error: Cannot reach the encryption server (%s)" % error)
+        return
+
+    if "error" in response:
+        click.echo("Error: %s" % response["error"])
+    elif metrics:
+        for key, value in sorted(response["metrics"].items()):
+            click.echo("%s: %s" % (key, value))
+    elif output is not None:
+        output.write(response["ciphertext"])
+    else:
+        click.echo(response["ciphertext"])
+
 
 ##################################
 #      Local Helper Methods      #
 ##################################
 
 
-def _encrypt(enigma, message, spaces, space_detect, group, progress):
+def _server_address(socket_path, port):
+    """
+    Chooses the address of the encryption server: a localhost port, the given Unix socket, or a per-user socket (see
+    server.default_socket)
+    :return (str/tuple): socket path or (host, port)
+    """
+
+    from enigma import server
+
+    if port is not None:
+        return ("127.0.0.1", port)
+    if socket_path is not None:
+        return socket_path
+
+    return server.default_socket()
+
+
+def _config_machine(select, options):
     """
-    Encrypts input and directs output appropriately, with standard-out as
-    the default. It also controls output format.  By default, characters
-    are encrypted in groups of 5.  If spaces are not previously filtered out,
-    output will not group characters but instead encrypt with spacing in its
-    natural state.  All input must be upper case, or it will not be encrypted.
+    Assembles the machine of a configuration for the encryption server and batch encryption
+    :param select (str): configuration name, None for the selected configuration
+    :param options (dict): machine settings overriding the configuration, as taken by update_config
+    :return (tuple): enigma machine, preferences (dict) and configuration name
+    """
+
+    if not read_config():
+        raise ValueError("Config file, \"config.ini\", not found")
+
+    preferences = load_config("Preferences")
+    if select is None:
+        select = preferences["select"]
+
+    try:
+        local_config = load_config(select)
+    except configparser.NoSectionError:
+        raise ValueError("Configuration %s could not be found" % select)
+
+    local_config = update_config(local_config, options)
+    return assemble_enigma(local_config), preferences, select
+
+
+def _serve_persist(positions):
+    """
+    Saves the rotor positions remembered by the encryption server
+    :param positions (dict): configuration name to positions of rotors 1-3
+    :return:
+    """
+
+    read_config()
+    for select, (r1_p, r2_p, r3_p) in positions.items():
+        if config.has_section(select):
+            config[select]["r1_p"] = str(r1_p)
+            config[select]["r2_p"] = str(r2_p)
+            config[select]["r3_p"] = str(r3_p)
+    save_config()
+
+
+def _print_stats(machine_stats, total):
+    """
+    Prints letters per second and the time split between I/O, filtering and encryption on standard error.  Filtering
+    (and formatting) is timed including the encryption it calls, and I/O is what remains of the total.
     :return:
     """
 
-    # if space_detect, remove all spaces for processing
-    if space_detect:
-        group = 0
-        spaces = "remove"
+    encryption = machine_stats.seconds("encrypt")
+    filtering = max(0.0, machine_stats.seconds("filter") - encryption)
+    io = max(0.0, total - filtering - encryption)
+    rate = machine_stats.letters / total if total else 0.0
+
+    click.echo("\nLetters encrypted: %d (%.0f letters/s, %.0f letters/s encrypting)"
+               % (machine_stats.letters, rate, machine_stats.rate), err=True)
+    click.echo("Rotor steps: %d, turnovers: %d, double steps: %d"
+               % (machine_stats.steps, machine_stats.turnovers, machine_stats.double_steps), err=True)
+    for name, seconds in [("I/O", io), ("Filtering", filtering), ("Encryption", encryption)]:
+        share = 100 * seconds / total if total else 0.0
+        click.echo("%-11s %9.4f s %5.1f%%" % (name + ":", seconds, share), err=True)
+
+
+def _encrypt(enigma, message, spaces, space_detect, group, newlines, progress, jobs):
+    """
+    Encrypts a message with the text pipeline of the library (see enigma.stream): characters are filtered with translation
+    tables, the letters encrypted in bulk and the output formatted in one pass, a large piece of the message at a time
+    :return (str): formatted ciphertext
+    """
+
+    from enigma import stream
 
     if message is None:
-        return
+        return ""
+
+    # encrypted as UTF-8, so that progress counts bytes (characters not encoded are not letters)
+    data = message.encode('utf-8', 'ignore')
 
-    plaintext = message.upper()
-    ciphertext = ""
-    count = 0
+    # short messages are encrypted at once by the machine itself, without a process pool or NumPy
+    if len(data) <= stream.LONG_MESSAGE:
+        encryptor = stream.message_encryptor(enigma, len(data), spaces=spaces, space_detect=space_detect, group=group,
+                                             newlines=newlines)
+        return encryptor.encrypt(message)
 
+    with _engine(jobs) as (engine, size), _progress(progress, len(data)) as bar:
+        chunks = stream.utf8_pieces(data, size)
+        return "".join(stream.encrypt_stream(enigma, chunks, bar, spaces=spaces, space_detect=space_detect,
+                                             group=group, newlines=newlines, engine=engine))
 
-    if progress:
 
-        with click.progressbar(plaintext, label="Encrypting", length = len(plaintext)) as bar:
-            for c in bar:
+def _encrypt_stream(enigma, input, spaces, space_detect, group, newlines, progress, jobs):
+    """
+    Encrypts file input in bounded pieces, yielding formatted output as soon as
+    each piece is encrypted.  Memory use does not depend on the input size.
+    :return (generator): formatted output pieces
+    """
 
-            # for c in plaintext:
+    from enigma import stream
 
-                # if character is a space
-                if ord(c) == 32:
+    # size of pipes is unknown
+    try:
+        length = os.fstat(input.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        length = 0
+
+    with _engine(jobs) as (engine, size), _progress(progress, length) as bar:
+        # files are read as UTF-8 bytes (as with --mmap), so that progress counts bytes like the file size
+        if hasattr(input, 'buffer'):
+            chunks = stream.read_utf8_chunks(input.buffer, size)
+        else:
+            chunks = stream.read_chunks(input, size)
+        yield from stream.encrypt_stream(enigma, chunks, bar, spaces=spaces, space_detect=space_detect, group=group,
+                                         newlines=newlines, engine=engine)
 
-                    # and option is set to remove
-                    if spaces.lower() == 'remove':
-                        # do nothing (will not be entered into enigma)
-                        pass
 
-                    # and option is set to 'X
-                    elif spaces.lower() == 'x':
-                        # replace the space with the character 'X' and encrypt
-                        ciphertext += enigma.encrypt('X')
+def _encrypt_mmap(enigma, source, destination, spaces, space_detect, group, newlines, progress, jobs):
+    """
+    Encrypts input file into output file through memory maps, in bounded pieces
+    :return:
+    """
 
-                    # otherwise, the space will be evident in the cipher text
-                    else:
-                        ciphertext += " "
+    from enigma import stream
 
-                # if new line, keep it (if newlines undesired, it should have been replaced with space already)
-                elif ord(c) == 10:
-                    ciphertext += '\n'
+    with _engine(jobs) as (engine, size), _progress(progress, os.path.getsize(source)) as bar:
+        options = {'spaces': spaces, 'space_detect': space_detect, 'group': group, 'newlines': newlines,
+                   'engine': engine}
+        stream.encrypt_file(enigma, source, destination, size, progress=bar, **options)
 
-                # if character is illegal, remove it
-                elif ord(c) < 65 or ord(c) > 90:
-                    # do nothing (will not be entered into enigma)
-                    pass
 
-                # otherwise character is legal, encrypt it
-                else:
-                    e = enigma.encrypt(c)
-                    # if space detect enabled, replaces Xs with spaces
-                    if space_detect and e == 'X':
-                        ciphertext += " "
-                    else:
-                        ciphertext += e
-                    if group != 0:
-                        count = (count + 1) % group
-                        # if not keeping/replacing spaces, group characters for readability
-                        if spaces.lower() == 'remove' and count == 0:
-                            ciphertext += " "
+@contextlib.contextmanager
+def _engine(jobs):
+    """
+    Selects how letters are encrypted, and how much input to encrypt at once.  Several jobs share one process pool for
+    all the pieces of the input, stopped when the context exits.
+    :return (tuple): engine function (None for the default) and piece size
+    """
 
-    else:
+    from enigma import stream
 
-        for c in plaintext:
+    if jobs < 2:
+        yield None, stream.CHUNK_SIZE
+        return
 
-            # if character is a space
-            if ord(c) == 32:
+    from enigma import parallel
 
-                # and option is set to remove
-                if spaces.lower() == 'remove':
-                    # do nothing (will not be entered into enigma)
-                    pass
+    # pieces large enough to keep every process busy
+    with parallel.ParallelEncryptor(jobs) as encryptor:
+        yield encryptor.encrypt_codes, 8 * jobs * parallel.MIN_CHUNK
 
-                # and option is set to 'X
-                elif spaces.lower() == 'x':
-                    # replace the space with the character 'X' and encrypt
-                    ciphertext += enigma.encrypt('X')
 
-                # otherwise, the space will be evident in the cipher text
-                else:
-                    ciphertext += " "
+def _progress(show, length):
+    """
+    Creates the progress line of an encryption, updated once per piece of input and redrawn a few times per second on
+    standard error.  It is only shown if enabled in the preferences and standard output and error are terminals.
+    :param show (bool): progress preference
+    :param length (int): size of the input, 0 if unknown
+    :return (Progress):
+    """
 
-            # if new line, keep it (if newlines undesired, it should have been replaced with space already)
-            elif ord(c) == 10:
-                ciphertext += '\n'
+    from enigma import progress
 
-            # if character is illegal, remove it
-            elif ord(c) < 65 or ord(c) > 90:
-                # do nothing (will not be entered into enigma)
-                pass
+    return progress.Progress(length, enabled=show and progress.interactive())
 
 
-            # otherwise character is legal, encrypt it
-            else:
-                e = enigma.encrypt(c)
-                # if space detect enabled, replaces Xs with spaces
-                if space_detect and e == 'X':
-                    ciphertext += " "
-                else:
-                    ciphertext += e
-                if group != 0:
-                    count = (count + 1) % group
-                    # if not keeping/replacing spaces, group characters for readability
-                    if spaces.lower() == 'remove' and count == 0:
-                        ciphertext += " "
+def _is_path(file):
+    """
+    Tells a file option naming a path (opened when first written) from standard output ("-")
+    :return (bool):
+    """
+
+    return isinstance(file, click.utils.LazyFile)
+
+
+@contextlib.contextmanager
+def _replacing(path):
+    """
+    Creates an empty temporary file next to a file to be written, and moves it over the file once written (if no error
+    occurred), so that the file is replaced as a whole and may be read while its replacement is written
+    :param path (str): path of the file to write
+    :return (str): path of the temporary file to write instead
+    """
+
+    import stat
+    import tempfile
+
+    path = os.path.realpath(path)
+    try:
+        handle, temporary = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp',
+                                             dir=os.path.dirname(path))
+    except OSError as error:
+        raise click.FileError(path, hint=error.strerror)
+    os.close(handle)
+
+    try:
+        # keep the permissions of the file replaced, or those of a new file
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(temporary, mode)
 
+        yield temporary
+        os.replace(temporary, path)
 
-    return ciphertext
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temporary)
+        raise
 
 
 def update_config(local_config, changes):
@@ -609,6 +1038,44 @@ def update_config(local_config, changes):
     return local_config
 
 
+def read_config():
+    """
+    Parses config.ini into the shared config parser, unless the file is unchanged (same modification time and size)
+    since it was last read or written by this process
+    :return (bool): False if the config file is missing
+    """
+
+    global _config_stamp
+
+    try:
+        info = os.stat(user_configs)
+    except OSError:
+        return False
+
+    stamp = (info.st_mtime_ns, info.st_size)
+    if stamp != _config_stamp:
+        for section in config.sections():
+            config.remove_section(section)
+        config.read(user_configs)
+        _config_stamp = stamp
+    return True
+
+
+def save_config():
+    """
+    Writes the shared config parser to config.ini
+    :return:
+    """
+
+    global _config_stamp
+
+    with open(user_configs, 'w') as configfile:
+        config.write(configfile)
+
+    info = os.stat(user_configs)
+    _config_stamp = (info.st_mtime_ns, info.st_size)
+
+
 def load_config(config_name):
     """
     Loads the options and values of an existing configurations into a dictionary
@@ -616,8 +1083,8 @@ def load_config(config_name):
     :return (dict/bool) : dictionary of components
     """
 
-    config.read(user_configs)
-        
+    read_config()
+
     components = {}
 
     # load all components and convert rotor parameters to integer
@@ -665,9 +1132,7 @@ def write_config(config_name, local_config):
             config[config_name][component[0]] = str(component[1])
 
     # write the changes
-    with open(user_configs, 'w') as configfile:
-
-        config.write(configfile)
+    save_config()
 
 
 def assemble_enigma(components):
@@ -676,6 +1141,9 @@ def assemble_enigma(components):
     :param components (dict): local config file.  key = component, value = setting
     :return (enigma_machine):
     """
+
+    from enigma import enigma_machine
+
     # assemble rotors from config file
     r1 = [components['r1_id'], components['r1_p'], components['r1_rs']]
     r2 = [components['r2_id'], components['r2_p'], components['r2_rs']]
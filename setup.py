@@ -37,10 +37,15 @@ setup(
     'License :: OSI Approved :: MIT License',
 
     # Not compatible with Python2
-    'Programming Language :: Python :: 3.4',
-    'Programming Language :: Python :: 3.5',
+    'Programming Language :: Python :: 3',
+    'Programming Language :: Python :: 3 :: Only',
+    'Programming Language :: Python :: 3.8',
     ],
 
+    # bytes.isascii() (memory-mapped encryption), asyncio.get_running_loop()
+    # and unittest.IsolatedAsyncioTestCase (asyncio helpers and their tests)
+    python_requires='>=3.8',
+
     description="German Cipher Machine Command-Line Tool",
 
     long_description=open("README.rst").read(),
@@ -53,7 +58,7 @@ setup(
     # Required config files
     # data_files=[('', ['engima/model.ini'])],
     
-    package_data={'enigma': ['*.ini']},
+    package_data={'enigma': ['*.ini', 'benchmarks/*.py']},
 
     # Executable information
     entry_points='''